@@ -0,0 +1,47 @@
+r"""Compare render telemetry records outside of Blender.
+
+Usage:
+
+    python benchmarks/compare_telemetry.py path/to/b4b_telemetry.jsonl [--window 5] [--threshold 0.1]
+    python benchmarks/compare_telemetry.py path/to/b4b_telemetry.jsonl --runs -2 -1
+
+By default, the latest completed run is compared against the median of the previous
+runs of the same .blend file and scene. With `--runs A B`, run B is compared
+against run A (indices into the file, negative values count from the end).
+Exits with status 1 if any step got slower by more than the threshold.
+"""
+import argparse
+import importlib.util
+import sys
+from pathlib import Path
+
+_spec = importlib.util.spec_from_file_location("b4b_telemetry", Path(__file__).resolve().parent.parent / "source" / "Telemetry.py")
+Telemetry = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(Telemetry)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Compare BAT4Blender render telemetry runs.")
+    parser.add_argument('file', help="telemetry file (b4b_telemetry.jsonl)")
+    parser.add_argument('--runs', type=int, nargs=2, metavar=('REFERENCE', 'CURRENT'), help="compare two runs by index")
+    parser.add_argument('--window', type=int, default=5, help="number of previous runs for the rolling median")
+    parser.add_argument('--threshold', type=float, default=0.10, help="relative slowdown reported as regression")
+    args = parser.parse_args(argv)
+
+    records = Telemetry.load_records(args.file)
+    if args.runs is not None:
+        reference, current = (records[i] for i in args.runs)
+        print(f"Comparing run {current['timestamp']} with run {reference['timestamp']}:")
+        rows = Telemetry.compare(current, [reference], args.threshold)
+    else:
+        rows, num_references = Telemetry.compare_latest(records, window=args.window, threshold=args.threshold)
+        if not rows:
+            print("No previous runs of the same scene to compare with.")
+            return 0
+        print(f"Comparing run {records[Telemetry.latest_completed(records)]['timestamp']} with the median of {num_references} previous runs:")
+    print(Telemetry.format_comparison(rows, args.threshold))
+    return 1 if any(row[4] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,281 @@
+r"""Headless benchmarks of the BAT4Blender hot paths.
+
+Run from the repository root with:
+
+    blender --background --factory-startup --python benchmarks/run.py -- --output bench_output.json --baseline benchmarks/baseline.json
+
+The scenes are generated procedurally (N box objects, LODs with M faces,
+canvases from 1×1 to 16×16 tiles at zoom 5). Each hot path is timed
+separately, followed by a full `export_lods_only` run and a low-sample
+Cycles render on the CPU. The results are written as JSON and compared
+against the baseline, if it exists.
+"""
+import argparse
+import importlib.util
+import json
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+import bpy
+import bmesh
+
+ROOT = Path(__file__).resolve().parent.parent
+_PX_PER_M_ZOOM5 = 146 / 16  # horizontal extent of a 16×16 cell at zoom 5
+
+
+@dataclass
+class Case:
+    name: str
+    objects: int  # number of box objects in the scene
+    lod_faces: int  # number of faces of each LOD, rounded to a subdivided cube
+    tiles: int  # targeted number of canvas tiles per row/column at zoom 5
+
+    def footprint_m(self) -> float:
+        # diagonal view of a square footprint, so the canvas is about √2 times as wide
+        return self.tiles * 256 / (_PX_PER_M_ZOOM5 * 2**0.5)
+
+
+CASES = [
+    Case("small", objects=10, lod_faces=6, tiles=1),
+    Case("medium", objects=100, lod_faces=384, tiles=4),
+    Case("large", objects=400, lod_faces=6144, tiles=16),
+]
+QUICK_CASES = CASES[:2]
+
+
+def load_addon():
+    r"""Import the `source` folder as the `BAT4Blender` package and register it."""
+    spec = importlib.util.spec_from_file_location(
+            "BAT4Blender", ROOT / "source" / "__init__.py", submodule_search_locations=[str(ROOT / "source")])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["BAT4Blender"] = module
+    spec.loader.exec_module(module)
+    module.register()
+    return module
+
+
+def timed(label: str, f, *, repeat: int, setup=None, teardown=None) -> dict:
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        start = time.perf_counter()
+        result = f(arg) if setup is not None else f()
+        times.append(time.perf_counter() - start)
+        if teardown is not None:
+            teardown(result)
+    r = {'median_s': statistics.median(times), 'min_s': min(times), 'runs': len(times)}
+    print(f"  {label:<40} median {1000 * r['median_s']:9.2f} ms   min {1000 * r['min_s']:9.2f} ms")
+    return r
+
+
+def clear_scene():
+    from BAT4Blender import Utils, DayNight
+    bpy.data.batch_remove(list(bpy.data.objects) + list(bpy.data.meshes) + list(bpy.data.cameras) +
+                          list(bpy.data.lights) + list(bpy.data.collections) + list(bpy.data.images))
+    Utils.invalidate_handles()
+    DayNight.invalidate()
+
+
+def _cube_mesh(name: str, cuts: int, size: float = 1.0) -> bpy.types.Mesh:
+    bm = bmesh.new()
+    bmesh.ops.create_cube(bm, size=size)
+    if cuts > 0:
+        bmesh.ops.subdivide_edges(bm, edges=bm.edges[:], cuts=cuts, use_grid_fill=True)
+    mesh = bpy.data.meshes.new(name)
+    bm.to_mesh(mesh)
+    bm.free()
+    return mesh
+
+
+def build_scene(case: Case, seed: int = 0):
+    r"""Scatter box objects on the footprint and replace the LOD meshes by
+    subdivided cubes with about the requested face count.
+    """
+    import random
+    from BAT4Blender.Config import LODZ_NAME
+    from BAT4Blender.Enums import Zoom
+    from BAT4Blender.Rig import Rig
+    from BAT4Blender.Utils import b4b_collection, find_object
+    clear_scene()
+    scene = bpy.context.scene
+    rnd = random.Random(seed)
+    size = case.footprint_m()
+    box = _cube_mesh("bench_box", cuts=0)
+    for i in range(case.objects):
+        obj = bpy.data.objects.new(f"bench_obj_{i}", box)
+        h = rnd.uniform(2, 4 + size / 8)
+        obj.scale = (rnd.uniform(1, size / 8), rnd.uniform(1, size / 8), h)
+        obj.location = (rnd.uniform(-size / 2, size / 2), rnd.uniform(-size / 2, size / 2), h / 2)
+        scene.collection.objects.link(obj)
+    bpy.context.view_layer.update()
+
+    Rig.lods_add()
+    cuts = max(0, round((case.lod_faces / 6) ** 0.5) - 1)
+    coll = b4b_collection()
+    for z in Zoom:
+        lod = find_object(coll, LODZ_NAME[z.value])
+        old_mesh = lod.data
+        lod.data = _cube_mesh(LODZ_NAME[z.value], cuts=cuts, size=2.0)  # same extent as `LOD.get_mesh_cube`
+        bpy.data.meshes.remove(old_mesh)
+    bpy.context.view_layer.update()
+
+
+def _write_png(path: str, width: int, height: int):
+    import numpy as np
+    img = bpy.data.images.new("bench_render", width=width, height=height, alpha=True)
+    img.pixels = np.random.default_rng(0).random(width * height * 4, dtype=np.float32)
+    img.filepath_raw = path
+    img.file_format = 'PNG'
+    img.save()
+    bpy.data.images.remove(img)
+
+
+def bench_case(case: Case, repeat: int) -> dict:
+    from BAT4Blender.Camera import Camera
+    from BAT4Blender.Canvas import Canvas
+    from BAT4Blender.Config import LODZ_NAME, CAM_NAME
+    from BAT4Blender.Enums import Zoom, Rotation
+    from BAT4Blender.LOD import LOD
+    from BAT4Blender.Renderer import Renderer, SuperSampling
+    from BAT4Blender.Rig import Rig
+    from BAT4Blender.Utils import b4b_collection, find_object
+
+    print(f"Case {case.name}: {case.objects} objects, {case.lod_faces} LOD faces, ~{case.tiles}×{case.tiles} tiles")
+    build_scene(case)
+    z, v = Zoom.FIVE, Rotation.SOUTH
+    no_supersampling = SuperSampling(enabled=False)
+    Rig.setup(v, z, hd=False)
+    coll = b4b_collection()
+    cam = find_object(coll, CAM_NAME)
+    lod = find_object(coll, LODZ_NAME[z.value])
+    results = {}
+
+    results['camera_manoeuvring'] = timed(
+            "Renderer.camera_manoeuvring", lambda: Renderer.camera_manoeuvring(z, v, hd=False, supersampling=no_supersampling),
+            repeat=repeat)
+    canvas = Renderer.camera_manoeuvring(z, v, hd=False, supersampling=no_supersampling)
+    results['lod_bounds_LRTB'] = timed("Camera.lod_bounds_LRTB", lambda: Camera.lod_bounds_LRTB(cam, lod), repeat=repeat)
+
+    results['sliced'] = timed(
+            f"LOD.sliced ({canvas.num_columns}×{canvas.num_rows} tiles)", lambda: LOD.sliced(lod, cam, canvas),
+            repeat=repeat)
+    results['sliced']['canvas_tiles'] = [canvas.num_columns, canvas.num_rows]
+
+    render_canvas = Canvas(width_px=case.tiles * 256, height_px=case.tiles * 256)
+    tiles = list(render_canvas.tiles())
+    tmp_png = str(Path(bpy.data.filepath).with_name("bench_render.tmp.png"))
+
+    def render_post_setup():
+        _write_png(tmp_png, render_canvas.width_px, render_canvas.height_px)
+    results['render_post'] = timed(
+            f"Renderer.render_post ({case.tiles}×{case.tiles} tiles)",
+            lambda _: list(Renderer.render_post(z, v, bpy.context.scene.b4b.group_id, render_canvas, tiles, tmp_png, None, no_supersampling)),
+            repeat=repeat, setup=render_post_setup)
+    return results
+
+
+def bench_operators(repeat: int) -> dict:
+    scene = bpy.context.scene
+    build_scene(CASES[0])
+    results = {}
+    b4b = scene.b4b
+    b4b.postproc_enabled = False  # the add-on preferences are not available without installing the add-on
+    b4b.render_current_view_only = False
+    b4b.export_lods_only = True
+    results['export_lods_only'] = timed(
+            "export_lods_only (20 views)", lambda: bpy.ops.object.b4b_render('EXEC_DEFAULT'), repeat=repeat)
+
+    scene.render.engine = 'CYCLES'
+    scene.cycles.device = 'CPU'
+    scene.cycles.samples = 1
+    scene.cycles.use_denoising = False
+    b4b.export_lods_only = False
+    b4b.render_current_view_only = True
+    b4b.zoom = 'THREE'
+    results['render_low_samples'] = timed(
+            "render (Zoom 3, 1 sample)", lambda: bpy.ops.object.b4b_render('EXEC_DEFAULT'), repeat=repeat)
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    r"""Print the change of each median against the baseline and return the regressions exceeding the threshold."""
+    regressions = []
+    print(f"Comparison against baseline (threshold {100 * threshold:.0f}%):")
+    for key, r in results['results'].items():
+        b = baseline.get('results', {}).get(key)
+        if b is None:
+            print(f"  {key:<40} (new)")
+            continue
+        ratio = r['median_s'] / b['median_s'] if b['median_s'] > 0 else float('inf')
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        elif ratio < 1 - threshold:
+            flag = "  improved"
+        print(f"  {key:<40} {1000 * b['median_s']:9.2f} ms -> {1000 * r['median_s']:9.2f} ms  ({100 * (ratio - 1):+.1f}%){flag}")
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="blender --background --factory-startup --python benchmarks/run.py --")
+    parser.add_argument('--output', default="bench_output.json", help="JSON file for the results")
+    parser.add_argument('--baseline', default=str(ROOT / "benchmarks" / "baseline.json"), help="JSON file of earlier results to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="store the results as new baseline")
+    parser.add_argument('--repeat', type=int, default=5, help="number of runs of each hot path")
+    parser.add_argument('--threshold', type=float, default=0.10, help="relative slowdown reported as regression")
+    parser.add_argument('--quick', action='store_true', help="skip the large case")
+    parser.add_argument('--fail-on-regression', action='store_true', help="exit with status 1 if a regression is found")
+    args = parser.parse_args(argv)
+
+    addon = load_addon()
+    workdir = Path(tempfile.mkdtemp(prefix="b4b_bench_"))
+    try:
+        bpy.ops.wm.save_as_mainfile(filepath=str(workdir / "bench.blend"))  # outputs are written next to the .blend file
+        results = {}
+        for case in (QUICK_CASES if args.quick else CASES):
+            for key, r in bench_case(case, repeat=args.repeat).items():
+                results[f"{case.name}/{key}"] = r
+        results.update(bench_operators(repeat=max(1, args.repeat // 2)))
+    finally:
+        addon.unregister()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = {
+        'meta': {
+            'blender': bpy.app.version_string,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'repeat': args.repeat,
+            'cases': [asdict(c) for c in (QUICK_CASES if args.quick else CASES)],
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(output, f, indent=2)
+    print(f"Saved benchmark results: {args.output}")
+
+    regressions = []
+    baseline_path = Path(args.baseline)
+    if baseline_path.is_file():
+        with open(baseline_path, encoding='utf-8') as f:
+            regressions = compare(output, json.load(f), args.threshold)
+    else:
+        print(f"No baseline found at '{baseline_path}'")
+    if args.save_baseline:
+        shutil.copyfile(args.output, baseline_path)
+        print(f"Saved baseline: {baseline_path}")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else [])
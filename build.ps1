@@ -1,4 +1,4 @@
 Remove-Item -Path .\out\* -Recurse
 New-Item -Path 'out\BAT4Blender' -ItemType Directory
-Copy-Item .\source\* .\out\BAT4Blender\
+Copy-Item .\source\* .\out\BAT4Blender\ -Recurse -Exclude __pycache__
 Compress-Archive -Path .\out\BAT4Blender\ -DestinationPath .\out\BAT4Blender.zip
\ No newline at end of file
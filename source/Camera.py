@@ -1,27 +1,18 @@
+from __future__ import annotations
+
 import bpy
 import bpy_extras
-from math import radians, sin, cos
 from .Config import CAM_NAME
 from .Enums import Zoom, Rotation
-from .Utils import b4b_collection, find_object
-
-camera_range = 190  # (initial) distance of camera from origin
-angle_zoom = [radians(60), radians(55), radians(50), radians(45)]
-angle_rotation = [radians(-67.5), radians(22.5), radians(112.5), radians(202.5)]
+from .Utils import b4b_collection, find_object, set_if_changed
+from .core.Camera import (camera_range, angle_zoom, angle_rotation, zoom_sizes, zoom_sizes_hd, extra_camera_offset,  # noqa: F401
+                          CameraSolution, location_and_rotation, solve_views)
 
 
 class Camera:
     @staticmethod
     def get_location_and_rotation(rotation, zoom):
-        pitch = angle_zoom[min(zoom.value, len(angle_zoom) - 1)]  # zoom 4, 5 & 6 all use the same camera angle
-        yaw = angle_rotation[rotation.value]
-
-        x = camera_range * sin(pitch) * cos(yaw)
-        y = camera_range * sin(pitch) * sin(yaw)
-        z = camera_range * cos(pitch)
-        loc = (x, y, z)
-        rot = (pitch, 0, yaw + radians(90))  # need to add 90 for proper camera location in scene
-        return [loc, rot]
+        return list(location_and_rotation(rotation, zoom))
 
     @staticmethod
     def set_camera(location, angles):
@@ -40,10 +31,16 @@ class Camera:
     def update(rotation, zoom):
         (loc, rot) = Camera.get_location_and_rotation(rotation, zoom)
         cam = find_object(b4b_collection(), CAM_NAME)
-        cam.location = loc
-        cam.rotation_euler = rot
+        set_if_changed(cam, 'location', loc)
+        set_if_changed(cam, 'rotation_euler', rot)
         bpy.context.view_layer.update()
 
+    @staticmethod
+    def matrix_of(solution: CameraSolution):
+        r"""The world matrix of the camera placed by a `CameraSolution`, without moving the camera."""
+        from mathutils import Euler, Matrix
+        return Matrix.Translation(solution.location) @ Euler(solution.rotation_euler, 'XYZ').to_matrix().to_4x4()
+
     @staticmethod
     def add_to_scene():
         if find_object(b4b_collection(), CAM_NAME) is None:
@@ -90,3 +87,8 @@ class Camera:
         r"""If negative, the camera needs to be moved back to fully put the LOD in view."""
         uvw_coords = Camera._lod_in_cam_coords(cam, lod)
         return min(c[2] for c in uvw_coords)
+
+    @staticmethod
+    def solve_views(lod_vertices: dict, hd: bool, margin: int, rotations=tuple(Rotation)) -> dict:
+        r"""See `core.Camera.solve_views`."""
+        return solve_views(lod_vertices, hd=hd, margin=margin, rotations=rotations)
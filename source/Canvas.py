@@ -1,29 +1,15 @@
 from __future__ import annotations
 
 import bpy
-from collections.abc import Iterator
 from dataclasses import dataclass
-from math import ceil
 from mathutils import Vector
+from .core import Canvas as _core
 
-_MAX_TILE_SIZE_PX = 256
-_MIN_TILE_SIZE_PX = 4
 
-
-class Canvas:
+class Canvas(_core.Canvas):
     r"""A 2D rendering canvas, divided into tiles of size at most 256 px.
+    The tiling arithmetic is implemented in `core.Canvas`; this adds the parts depending on the scene and camera.
     """
-    width_px: int
-    height_px: int
-    num_columns: int
-    num_rows: int
-
-    def __init__(self, width_px: int, height_px: int):
-        assert width_px % _MIN_TILE_SIZE_PX == 0 and height_px % _MIN_TILE_SIZE_PX == 0, "FSH dimensions must be multiple of 4"
-        self.width_px = width_px
-        self.height_px = height_px
-        self.num_columns = ceil(width_px / _MAX_TILE_SIZE_PX)
-        self.num_rows = ceil(height_px / _MAX_TILE_SIZE_PX)
 
     @staticmethod
     def create(cam, lod, dim_lod: float, margin: int) -> Canvas:
@@ -42,41 +28,6 @@ class Canvas:
         h = Canvas._round_up_to_fsh_chunk(dim_v + 2 * margin)
         return Canvas(width_px=w, height_px=h)
 
-    @staticmethod
-    def _round_up_to_fsh_chunk(f) -> int:
-        cnt, rem = divmod(ceil(f), _MAX_TILE_SIZE_PX)
-        result = cnt * _MAX_TILE_SIZE_PX + (0 if rem == 0 else
-                                            8 if rem <= 8 else
-                                            16 if rem <= 16 else
-                                            32 if rem <= 32 else
-                                            64 if rem <= 64 else
-                                            128 if rem <= 128 else
-                                            _MAX_TILE_SIZE_PX)
-        return result
-
-    def tile_dimensions_px(self, row: int, col: int) -> (int, int):
-        assert 0 <= row and row < self.num_rows
-        assert 0 <= col and col < self.num_columns
-        w = self.width_px - col * _MAX_TILE_SIZE_PX if col == self.num_columns - 1 else _MAX_TILE_SIZE_PX
-        h = self.height_px - row * _MAX_TILE_SIZE_PX if row == self.num_rows - 1 else _MAX_TILE_SIZE_PX
-        return w, h
-
-    def tiles(self) -> Iterator[(int, int)]:
-        for row in range(self.num_rows):
-            for col in range(self.num_columns):
-                yield row, col
-
-    def tile_border_px_LRTB(self, row: int, col: int) -> (int, int, int, int):
-        l = col * _MAX_TILE_SIZE_PX
-        r = min((col + 1) * _MAX_TILE_SIZE_PX, self.width_px)
-        t = row * _MAX_TILE_SIZE_PX
-        b = min((row + 1) * _MAX_TILE_SIZE_PX, self.height_px)
-        return l, r, t, b
-
-    def tile_border_fractional_LRTB(self, row: int, col: int) -> (float, float, float, float):
-        l, r, t, b = self.tile_border_px_LRTB(row=row, col=col)
-        return l / self.width_px, r / self.width_px, t / self.height_px, b / self.height_px
-
     @staticmethod
     def find_view3d():
         for area in bpy.context.window.screen.areas:
@@ -93,8 +44,9 @@ class Canvas:
         assert vertices, "vertices list must not be empty"
         return sum(vertices[1:], vertices[0]) / len(vertices)
 
-    def grid(self, cam) -> CanvasGrid:
-        frame = CanvasFrame(cam)
+    def grid(self, cam=None, frame: CanvasFrame | None = None) -> CanvasGrid:
+        r"""The tile grid in the camera frame of `cam`, or in the given `frame`."""
+        frame = frame if frame is not None else CanvasFrame(cam)
         column_coords = [frame.weighted(self.tile_border_fractional_LRTB(row=0, col=col)[0], 0) for col in range(self.num_columns)] + [frame.top_r]
         row_coords = [frame.weighted(0, self.tile_border_fractional_LRTB(row=row, col=0)[2]) for row in range(self.num_rows)] + [frame.bot_l]
         return CanvasGrid(frame=frame,
@@ -108,8 +60,9 @@ class CanvasFrame:
     top_l: Vector
     top_r: Vector
 
-    def __init__(self, cam):
-        cam_verts = cam.data.view_frame(scene=bpy.context.scene)  # with scene keyword, this shrinks shorter dimension to fit resolution
+    def __init__(self, cam=None, cam_verts: list[Vector] | None = None):
+        if cam_verts is None:
+            cam_verts = cam.data.view_frame(scene=bpy.context.scene)  # with scene keyword, this shrinks shorter dimension to fit resolution
         cam_center = Canvas._mean(cam_verts)
         assert len(cam_verts) == 4
         self.bot_l, = [v for v in cam_verts if v[0] < cam_center[0] and v[1] < cam_center[1]]
@@ -117,9 +70,19 @@ class CanvasFrame:
         self.top_l, = [v for v in cam_verts if v[0] < cam_center[0] and v[1] > cam_center[1]]
         self.top_r, = [v for v in cam_verts if v[0] > cam_center[0] and v[1] > cam_center[1]]
 
+    @staticmethod
+    def of_solution(solution, resolution_x: int, resolution_y: int) -> CanvasFrame:
+        r"""The frame of the orthographic camera placed by a `CameraSolution`, as
+        returned by `view_frame` at the given render resolution, without moving the camera.
+        """
+        dim = max(resolution_x, resolution_y)
+        half_x = solution.ortho_scale / 2 * resolution_x / dim
+        half_y = solution.ortho_scale / 2 * resolution_y / dim
+        shift_x, shift_y = solution.shift_x * solution.ortho_scale, solution.shift_y * solution.ortho_scale
+        return CanvasFrame(cam_verts=[Vector((shift_x + sx * half_x, shift_y + sy * half_y, -1.0)) for sx, sy in [(1, 1), (1, -1), (-1, -1), (-1, 1)]])
+
     def weighted(self, sx, sy) -> Vector:
-        return ((self.top_l * (1-sy) + self.bot_l * sy) * (1-sx) +
-                (self.top_r * (1-sy) + self.bot_r * sy) * sx)
+        return Vector(_core.bilinear(self.top_l, self.top_r, self.bot_l, self.bot_r, sx, sy))
 
     def tile_border_absolute_LRTB(self, canvas: Canvas, row: int, col: int) -> (float, float, float, float):
         l, r, t, b = canvas.tile_border_fractional_LRTB(row=row, col=col)
@@ -139,3 +102,12 @@ class CanvasGrid:
         x0, x1 = [c[0] for c in self.column_coords[col:col+2]]
         y0, y1 = [c[1] for c in self.row_coords[row:row+2]]
         return x0 <= v[0] and v[0] <= x1 and y0 >= v[1] and v[1] >= y1
+
+    def tile_of_point(self, v: Vector) -> tuple[int, int] | None:
+        r"""The (row, col) of the tile containing the point in cam coordinates, or None if it is outside of the canvas."""
+        import bisect
+        col = bisect.bisect_right([c[0] for c in self.column_coords], v[0]) - 1
+        row = bisect.bisect_right([-c[1] for c in self.row_coords], -v[1]) - 1  # rows go from top to bottom
+        col = min(max(col, 0), len(self.column_coords) - 2)  # a point on the last grid line belongs to the last tile
+        row = min(max(row, 0), len(self.row_coords) - 2)
+        return (row, col) if self.is_point_in_tile(v, row=row, col=col) else None
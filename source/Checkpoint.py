@@ -0,0 +1,152 @@
+r"""On-disk checkpoints of the completed render steps, for resuming interrupted renderings.
+
+After each step, its output files are recorded with their SHA-256 checksums in a
+manifest next to the outputs. When resuming, the steps whose files still exist
+with matching checksums are skipped. The manifest is only valid for unchanged
+render settings, LODs and rendered objects, and it is removed once the outputs are finalized.
+"""
+import hashlib
+import json
+import os
+from .Config import LODZ_NAME
+from .Utils import get_relative_path_for, b4b_collection, find_object
+
+MANIFEST_VERSION = 1
+
+
+def manifest_path(gid: str) -> str:
+    return get_relative_path_for(f"b4b_checkpoint_{gid}.json")
+
+
+def step_key(z, v, nightmode) -> str:
+    return f"Z{z.value+1}{v.compass_name()}_{nightmode.label()}"
+
+
+def sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _render_settings(scene) -> tuple:
+    r"""The render engine, sampling, color management and world settings."""
+    render = scene.render
+    cycles = getattr(scene, 'cycles', None)
+    sampling = None if cycles is None else tuple(getattr(cycles, attr, None) for attr in (
+        'samples', 'use_adaptive_sampling', 'adaptive_threshold', 'adaptive_min_samples', 'time_limit',
+        'use_denoising', 'denoiser', 'max_bounces', 'seed', 'use_animated_seed'))
+    eevee = getattr(scene, 'eevee', None)
+    view = scene.view_settings
+    world = scene.world
+    world_inputs = None
+    if world is not None and world.node_tree is not None:
+        world_inputs = tuple((node.name, i.identifier, repr(tuple(i.default_value) if hasattr(i.default_value, '__len__') else i.default_value))
+                             for node in world.node_tree.nodes for i in node.inputs
+                             if not i.is_linked and hasattr(i, 'default_value'))
+    return (render.engine, sampling, getattr(eevee, 'taa_render_samples', None), render.filter_size,
+            view.view_transform, view.look, view.exposure, view.gamma, scene.display_settings.display_device,
+            None if world is None else world.name, world_inputs)
+
+
+def _rendered_objects_bytes(context) -> bytes:
+    r"""The names, transforms, geometry, materials and light settings of the objects
+    that are rendered, apart from the camera (which moves for each view) and hidden
+    objects such as the LODs.
+    """
+    from .LOD import LOD
+    parts = []
+    for obj in sorted(context.view_layer.objects, key=lambda o: o.name):
+        if obj.hide_render or obj.type == 'CAMERA':
+            continue
+        parts.append(repr((obj.name, obj.type, [tuple(row) for row in obj.matrix_world],
+                           [(m.type, m.show_render) for m in obj.modifiers],
+                           [slot.material.name if slot.material is not None else None for slot in obj.material_slots])).encode())
+        if obj.type == 'MESH':
+            parts.append(LOD.geometry_bytes(obj))
+        elif obj.type == 'LIGHT':
+            light = obj.data
+            parts.append(repr((light.type, light.energy, tuple(light.color), getattr(light, 'angle', None))).encode())
+    return b''.join(parts)
+
+
+def fingerprint(context) -> str:
+    r"""A digest of the settings, LODs and rendered objects that the outputs of the steps depend on."""
+    from .LOD import LOD
+    scene = context.scene
+    b4b = scene.b4b
+    h = hashlib.sha256(repr((b4b.group_id, b4b.hd, b4b.supersampling_enabled, tuple(b4b.supersampling_factors), b4b.downsampling_filter, b4b.export_lods_only,
+                                 b4b.night_delta_enabled, tuple(b4b.night_tint), b4b.night_delta_color_tolerance, b4b.night_delta_alpha_tolerance,
+                                 b4b.auto_samples_enabled, b4b.auto_samples_noise_target, b4b.auto_samples_prepass, b4b.auto_samples_max,
+                                 _render_settings(scene))).encode())
+    coll = b4b_collection()
+    for name in LODZ_NAME:
+        lod = find_object(coll, name)
+        h.update(LOD.geometry_bytes(lod) if lod is not None else b'')
+    h.update(_rendered_objects_bytes(context))
+    return h.hexdigest()
+
+
+class Checkpoint:
+    def __init__(self, path: str, fingerprint: str, steps: dict | None = None):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.steps = steps if steps is not None else {}  # maps step key to list of {'path', 'sha256'}
+
+    @staticmethod
+    def create(context) -> 'Checkpoint':
+        r"""Start a new checkpoint, discarding an earlier one."""
+        checkpoint = Checkpoint(manifest_path(context.scene.b4b.group_id), fingerprint(context))
+        checkpoint.remove()
+        return checkpoint
+
+    @staticmethod
+    def resume(context) -> 'Checkpoint':
+        r"""Load the checkpoint of an interrupted rendering, keeping only the
+        steps whose output files are unchanged.
+        """
+        path = manifest_path(context.scene.b4b.group_id)
+        checkpoint = Checkpoint(path, fingerprint(context))
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            print(f"No checkpoint found at '{path}', starting from the beginning")
+            return checkpoint
+        except (OSError, ValueError) as err:
+            print(f"Ignoring unreadable checkpoint '{path}': {err}")
+            return checkpoint
+        if data.get('version') != MANIFEST_VERSION or data.get('fingerprint') != checkpoint.fingerprint:
+            print("Ignoring checkpoint, as the render settings or LODs changed since it was written")
+            return checkpoint
+        folder = os.path.dirname(path)
+        for key, files in data.get('steps', {}).items():
+            if all(os.path.isfile(os.path.join(folder, f['path'])) and sha256(os.path.join(folder, f['path'])) == f['sha256'] for f in files):
+                checkpoint.steps[key] = files
+            else:
+                print(f"Checkpoint: outputs of step {key} are missing or modified, so it is rendered again")
+        return checkpoint
+
+    def completed(self, key: str) -> list[str] | None:
+        r"""The output files of a completed step, or None if the step still needs to be rendered."""
+        files = self.steps.get(key)
+        if files is None:
+            return None
+        folder = os.path.dirname(self.path)
+        return [os.path.join(folder, f['path']) for f in files]
+
+    def record(self, key: str, files: list[str]):
+        r"""Add a completed step and write the manifest, replacing the previous one atomically."""
+        folder = os.path.dirname(self.path)
+        self.steps[key] = [{'path': os.path.relpath(f, folder), 'sha256': sha256(f)} for f in files]
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'fingerprint': self.fingerprint, 'steps': self.steps}, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,89 @@
+import bpy
+from bpy.app.handlers import persistent
+
+_registry = None  # (day collection names, night collection names), or None if it needs to be rebuilt
+avoided_updates = 0  # number of property writes skipped as the value did not change (each would have triggered a depsgraph update)
+
+
+def _matches(name: str, prefix: str) -> bool:
+    return name == prefix or name.startswith(f"{prefix}.")
+
+
+def invalidate():
+    global _registry
+    _registry = None
+
+
+def _scan():
+    global _registry
+    day, night = [], []
+    for coll in bpy.data.collections:
+        if _matches(coll.name, 'Night'):
+            night.append(coll.name)
+        elif _matches(coll.name, 'Day'):
+            day.append(coll.name)
+    _registry = (day, night)
+    return _registry
+
+
+def _set_if_changed(coll, attr: str, value) -> None:
+    global avoided_updates
+    if getattr(coll, attr) != value:
+        setattr(coll, attr, value)
+    else:
+        avoided_updates += 1
+
+
+def _resolve(names: list[str]):
+    colls = [bpy.data.collections.get(name) for name in names]
+    return None if any(c is None for c in colls) else colls
+
+
+def apply(is_night: bool):
+    r"""Show the `Night` collections and hide the `Day` collections, or vice versa.
+    Only properties whose values actually change are written.
+    """
+    day, night = _registry or _scan()
+    day_colls, night_colls = _resolve(day), _resolve(night)
+    if day_colls is None or night_colls is None:  # a collection was deleted or renamed in the meantime
+        day, night = _scan()
+        day_colls, night_colls = _resolve(day), _resolve(night)
+    for colls, hidden in [(night_colls, not is_night), (day_colls, is_night)]:
+        for coll in colls:
+            _set_if_changed(coll, 'hide_render', hidden)
+            _set_if_changed(coll, 'hide_viewport', hidden)
+            if coll.color_tag == 'NONE':
+                coll.color_tag = 'COLOR_06'  # purple
+
+
+@persistent
+def _depsgraph_update_post(scene, depsgraph):
+    if _registry is None or not depsgraph.id_type_updated('COLLECTION'):
+        return
+    known = set(_registry[0]) | set(_registry[1])
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Collection) and update.id.original.name not in known:
+            invalidate()  # a collection might have been added or renamed
+            return
+
+
+@persistent
+def _load_post(*args):
+    invalidate()
+
+
+def register():
+    bpy.app.handlers.depsgraph_update_post.append(_depsgraph_update_post)
+    bpy.app.handlers.load_post.append(_load_post)
+    bpy.app.handlers.undo_post.append(_load_post)
+    bpy.app.handlers.redo_post.append(_load_post)
+
+
+def unregister():
+    for handlers, f in [(bpy.app.handlers.depsgraph_update_post, _depsgraph_update_post),
+                        (bpy.app.handlers.load_post, _load_post),
+                        (bpy.app.handlers.undo_post, _load_post),
+                        (bpy.app.handlers.redo_post, _load_post)]:
+        if f in handlers:
+            handlers.remove(f)
+    invalidate()
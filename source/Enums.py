@@ -1,10 +1,13 @@
 from enum import Enum
+from .core.Enums import Rotation, Zoom, NightMode  # noqa: F401
 
 
 class Operators(Enum):
     PREVIEW = "object.b4b_preview",
     PREVIEW_DOWNSAMPLING = "object.b4b_preview_downsampling",
     RENDER = "object.b4b_render",
+    RENDER_PLAN = "object.b4b_render_plan",
+    TELEMETRY_COMPARE = "object.b4b_telemetry_compare",
     LOD_FIT_ZOOM = "object.b4b_lod_fit_zoom",
     LOD_ADD = "object.b4b_lod_add",
     LOD_CUSTOM = "object.b4b_lod_custom",
@@ -14,33 +17,9 @@ class Operators(Enum):
     WORLD_SETUP = "object.b4b_world_setup",
     COMPOSITING_SETUP = "object.b4b_compositing_setup",
     GID_RANDOMIZE = "object.b4b_gid_randomize",
-
-
-class Rotation(Enum):
-    SOUTH = 0
-    EAST = 1
-    NORTH = 2
-    WEST = 3
-
-    def compass_name(self) -> str:
-        return self.name[0]
-
-
-class Zoom(Enum):
-    ONE = 0
-    TWO = 1
-    THREE = 2
-    FOUR = 3
-    FIVE = 4
-
-
-class NightMode(Enum):
-    DAY = 0
-    MAXIS_NIGHT = 1
-    DARK_NIGHT = 2
-
-    def label(self) -> str:
-        match self:
-            case NightMode.DAY: return "Day"
-            case NightMode.MAXIS_NIGHT: return "MN"
-            case NightMode.DARK_NIGHT: return "DN"
+    QUEUE_ADD = "object.b4b_queue_add",
+    QUEUE_REMOVE = "object.b4b_queue_remove",
+    QUEUE_MOVE = "object.b4b_queue_move",
+    QUEUE_CLEAR = "object.b4b_queue_clear",
+    QUEUE_RUN = "object.b4b_queue_run",
+    QUEUE_CANCEL = "object.b4b_queue_cancel",
@@ -2,9 +2,12 @@ import bpy
 from .Enums import Operators, Rotation, Zoom, NightMode
 from .GUI_ops import B4BRender
 from . import Sun
+from . import DayNight
 from .Config import WORLD_NAME, COMPOSITING_NAME, CAM_NAME
-from .Utils import b4b_collection, find_object
+from .Utils import b4b_collection, find_object, handle_stats
+from . import Checkpoint
 import math
+import os
 
 
 class MainPanel(bpy.types.Panel):
@@ -35,6 +38,8 @@ class MainPanel(bpy.types.Panel):
         z = Zoom[context.scene.b4b.zoom]
         lod.operator(Operators.LOD_FIT_ZOOM.value[0], text=f"Fit Z{z.value+1}")
         lod.operator(Operators.LOD_DELETE.value[0], text="Delete")
+        lod_fit = layout.row()
+        lod_fit.prop(context.scene.b4b, 'lod_fit_method', expand=True)
         # lod.operator(Operators.LOD_EXPORT.value[0], text="Export .OBJ")  # LODs are exported during rendering
 
         layout.label(text="Setup")
@@ -68,6 +73,8 @@ class MainPanel(bpy.types.Panel):
                 case _:
                     text = B4BRender.bl_label
             self.layout.operator(Operators.RENDER.value[0], text=text)
+            if context.scene.b4b.group_id and os.path.isfile(Checkpoint.manifest_path(context.scene.b4b.group_id)):
+                self.layout.operator(Operators.RENDER.value[0], text="Resume interrupted rendering", icon='RECOVER_LAST').resume = True
         else:
             progress_bar = layout.row(align=True)
             # progress_bar.enabled = False
@@ -93,6 +100,9 @@ class SuperSamplingPanel(bpy.types.Panel):
 
     def draw(self, context):
         layout = self.layout
+        factors = layout.row(align=True)
+        factors.prop(context.scene.b4b, 'supersampling_factors')
+        factors.enabled = context.scene.b4b.supersampling_enabled
         downsampling = layout.row()
         downsampling.prop(context.scene.b4b, 'downsampling_filter', expand=False)
         downsampling.enabled = context.scene.b4b.supersampling_enabled
@@ -145,10 +155,124 @@ class AdvancedPanel(bpy.types.Panel):
         layout = self.layout
         layout.prop(context.scene.b4b, 'render_current_view_only')
         layout.prop(context.scene.b4b, 'export_lods_only')
+        layout.prop(context.scene.b4b, 'render_order')
+        layout.prop(context.scene.b4b, 'submodel_grid')
+        layout.prop(context.scene.b4b, 'banded_rendering')
+        bands = layout.column(align=True)
+        bands.prop(context.scene.b4b, 'band_rows')
+        bands.prop(context.scene.b4b, 'band_overlap')
+        bands.enabled = context.scene.b4b.banded_rendering
+        layout.prop(context.scene.b4b, 'persistent_data')
+        layout.prop(context.scene.b4b, 'auto_samples_enabled')
+        auto_samples = layout.column(align=True)
+        auto_samples.prop(context.scene.b4b, 'auto_samples_noise_target')
+        auto_samples.prop(context.scene.b4b, 'auto_samples_prepass')
+        auto_samples.prop(context.scene.b4b, 'auto_samples_max')
+        auto_samples.enabled = context.scene.b4b.auto_samples_enabled
+        layout.prop(context.scene.b4b, 'night_delta_enabled')
+        night_delta = layout.column(align=True)
+        night_delta.prop(context.scene.b4b, 'night_tint')
+        night_delta.prop(context.scene.b4b, 'night_delta_color_tolerance')
+        night_delta.prop(context.scene.b4b, 'night_delta_alpha_tolerance')
+        night_delta.enabled = context.scene.b4b.night_delta_enabled
+        layout.operator(Operators.RENDER_PLAN.value[0], text="Dry run (print render plan)")
+        layout.prop(context.scene.b4b, 'lod_occlusion_culling')
+        budget = layout.column()
+        budget.prop(context.scene.b4b, 'lod_triangle_budget')
+        budget.enabled = context.scene.b4b.lod_fit_method == 'HULL'
+        layout.prop(context.scene.b4b, 'profiling_enabled')
+        layout.prop(context.scene.b4b, 'leak_check')
+        if context.preferences.addons[__package__].preferences.telemetry_enabled:
+            layout.operator(Operators.TELEMETRY_COMPARE.value[0], text="Compare with previous renders")
         if context.scene.b4b.debug_mode:
             z = Zoom[context.scene.b4b.zoom]
             text = f"Slice LOD of Zoom {z.value+1} {Rotation[context.scene.b4b.rotation].compass_name()}  (for debugging)"
             self.layout.operator(Operators.LOD_SLICE.value[0], text=text)
+            stats = layout.row()
+            stats.active = False
+            stats.label(text=f"Skipped Day/Night collection updates: {DayNight.avoided_updates}")
+            stats = layout.row()
+            stats.active = False
+            stats.label(text=f"Object lookups: {handle_stats['hits']} cached, {handle_stats['misses']} searched")
+
+
+class RenderQueuePanel(bpy.types.Panel):
+    """A subpanel for BAT4Blender scene context of the properties editor"""
+    bl_label = "Render Queue"
+    bl_idname = 'SCENE_PT_b4b_queue'
+    bl_space_type = 'PROPERTIES'
+    bl_region_type = 'WINDOW'
+    bl_context = 'scene'
+    bl_parent_id = 'SCENE_PT_b4b_layout'
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw(self, context):
+        layout = self.layout
+        wm = context.window_manager
+        row = layout.row()
+        row.template_list(B4B_UL_RenderQueue.__name__, "", wm.b4b, 'queue', wm.b4b, 'queue_index', rows=4)
+        buttons = row.column(align=True)
+        buttons.operator(Operators.QUEUE_ADD.value[0], text='', icon='ADD')
+        buttons.operator(Operators.QUEUE_REMOVE.value[0], text='', icon='REMOVE')
+        buttons.separator()
+        buttons.operator(Operators.QUEUE_MOVE.value[0], text='', icon='TRIA_UP').direction = 'UP'
+        buttons.operator(Operators.QUEUE_MOVE.value[0], text='', icon='TRIA_DOWN').direction = 'DOWN'
+        buttons.separator()
+        buttons.operator(Operators.QUEUE_CLEAR.value[0], text='', icon='X')
+        if 0 <= wm.b4b.queue_index < len(wm.b4b.queue):
+            layout.prop(wm.b4b.queue[wm.b4b.queue_index], 'current_view_only')
+        if wm.b4b.queue_running:
+            layout.operator(Operators.QUEUE_CANCEL.value[0], text="Stop after current entry", icon='CANCEL')
+        else:
+            layout.operator(Operators.QUEUE_RUN.value[0], text="Render queue", icon='RENDER_ANIMATION')
+
+
+class B4B_UL_RenderQueue(bpy.types.UIList):
+    _status_icons = {'QUEUED': 'TIME', 'RENDERING': 'RENDER_STILL', 'FINISHED': 'CHECKMARK', 'CANCELLED': 'CANCEL', 'FAILED': 'ERROR'}
+
+    def draw_item(self, context, layout, data, item, icon, active_data, active_propname, index):
+        row = layout.row(align=True)
+        row.label(text=item.scene.name if item.scene is not None else "(missing scene)", icon='SCENE_DATA')
+        row.label(text="current view" if item.current_view_only else "all views")
+        if item.submodel >= 0:
+            row.label(text=f"sub-model {item.submodel}")
+        status = row.row()
+        status.alignment = 'RIGHT'
+        text = f"{item.progress:.0f} %" if item.status == 'RENDERING' else layout.enum_item_name(item, 'status', item.status)
+        status.label(text=text, icon=self._status_icons[item.status])
+
+
+class B4BQueueEntry(bpy.types.PropertyGroup):
+    r"""A scene to render as part of the render queue."""
+    scene: bpy.props.PointerProperty(type=bpy.types.Scene, name="Scene")
+    current_view_only: bpy.props.BoolProperty(
+        default=False,
+        name="Current view only",
+        description="Only render the current Zoom, Rotation and Day/Night mode of the scene",
+    )
+    submodel: bpy.props.IntProperty(
+        default=-1,
+        min=-1,
+        name="Sub-Model",
+        description="The sub-model to render if the model is split into sub-models (-1 renders the whole model)",
+    )
+    resume: bpy.props.BoolProperty(
+        default=False,
+        name="Resume",
+        description="Skip the steps completed by an interrupted rendering",
+    )
+    status: bpy.props.EnumProperty(
+        items=[
+            ('QUEUED', "Queued", "Waiting to be rendered", '', 0),
+            ('RENDERING', "Rendering", "Rendering in progress", '', 1),
+            ('FINISHED', "Finished", "Rendering finished", '', 2),
+            ('CANCELLED', "Cancelled", "Rendering was cancelled", '', 3),
+            ('FAILED', "Failed", "Rendering failed (see console output)", '', 4),
+        ],
+        default='QUEUED',
+        name="Status",
+    )
+    progress: bpy.props.FloatProperty(name="Progress", subtype='PERCENTAGE', min=0, max=100, precision=0)
 
 
 class B4BWmProps(bpy.types.PropertyGroup):
@@ -157,6 +281,11 @@ class B4BWmProps(bpy.types.PropertyGroup):
     is_rendering: bpy.props.BoolProperty(default=False, name="Render In Progress")
     progress: bpy.props.FloatProperty(name="Progress", subtype='PERCENTAGE', soft_min=0, soft_max=100, precision=0)
     progress_label: bpy.props.StringProperty()
+    last_render_result: bpy.props.StringProperty()  # FINISHED, CANCELLED or FAILED, set when a non-blocking rendering ends
+    queue: bpy.props.CollectionProperty(type=B4BQueueEntry, name="Render Queue")
+    queue_index: bpy.props.IntProperty(name="Active Queue Entry")
+    queue_running: bpy.props.BoolProperty(default=False, name="Render Queue In Progress")
+    queue_stop_requested: bpy.props.BoolProperty(default=False)
 
 
 class B4BSceneProps(bpy.types.PropertyGroup):
@@ -212,19 +341,7 @@ class B4BSceneProps(bpy.types.PropertyGroup):
     def _update_night(self, context):
         import threading
         assert threading.current_thread() is threading.main_thread(), "BAT4Blender expects `night` property to be updated only from main thread"  # as a precaution, since in general properties might be updated from other threads
-        nightmode = NightMode[self.night]
-        is_night = nightmode != NightMode.DAY
-        for coll in bpy.data.collections:
-            if coll.name == 'Night' or coll.name.startswith('Night.'):
-                coll.hide_render = not is_night
-                coll.hide_viewport = not is_night
-                if coll.color_tag == 'NONE':
-                    coll.color_tag = 'COLOR_06'  # purple
-            elif coll.name == 'Day' or coll.name.startswith('Day.'):
-                coll.hide_render = is_night
-                coll.hide_viewport = is_night
-                if coll.color_tag == 'NONE':
-                    coll.color_tag = 'COLOR_06'  # purple
+        DayNight.apply(is_night=NightMode[self.night] != NightMode.DAY)
 
     night: bpy.props.EnumProperty(
         items=[
@@ -255,13 +372,25 @@ class B4BSceneProps(bpy.types.PropertyGroup):
     supersampling_enabled: bpy.props.BoolProperty(
         default=True,
         name="Super-Sampling",
-        description="When enabled, render at 2× resolution for sharper results. In turn, you may reduce the Max Samples down to 25 % or increase the Noise Threshold",
+        description="When enabled, render at a higher resolution for sharper results. In turn, you may reduce the Max Samples (at 2×, down to 25 %) or increase the Noise Threshold",
+    )
+
+    supersampling_factors: bpy.props.FloatVectorProperty(
+        default=(2.0, 2.0, 2.0, 2.0, 2.0),
+        size=5,
+        min=1.0,
+        max=4.0,
+        step=25,
+        precision=2,
+        name="Factor per Zoom",
+        description=("Super-sampling factor of zooms 1 to 5, rounded to multiples of 0.25 (1 disables super-sampling for the zoom). "
+                     "Small zooms are cheap to render at 3× or 4×, whereas zoom 5 (especially HD) benefits from lower factors"),
     )
 
     supersampling_preview: bpy.props.EnumProperty(
         items=[
             ('no_supersampling', "1× resolution (no super-sampling)", "Disable super-sampling for Preview renders", '', 0),
-            ('no_downsampling', "keep 2× resolution (no down-sampling)", "Keep the super-sampled Preview rendendering", '', 1),
+            ('no_downsampling', "keep super-sampled resolution (no down-sampling)", "Keep the super-sampled Preview rendendering", '', 1),
         ],
         default='no_supersampling',
         name="Preview",
@@ -296,6 +425,158 @@ class B4BSceneProps(bpy.types.PropertyGroup):
         description="When enabled, skip rendering, but only export the LODs",
     )
 
+    banded_rendering: bpy.props.BoolProperty(
+        default=False,
+        name="Banded Rendering",
+        description=("Render large canvases in horizontal bands of whole tile rows and stitch them afterwards, "
+                     "so that the render memory is bounded by the band height instead of the canvas size"),
+    )
+
+    band_rows: bpy.props.IntProperty(
+        default=4,
+        min=1,
+        soft_max=16,
+        name="Tile Rows per Band",
+        description="Height of each band in rows of 256 px tiles",
+    )
+
+    band_overlap: bpy.props.IntProperty(
+        default=32,
+        min=0,
+        max=256,
+        subtype='PIXEL',
+        name="Band Overlap",
+        description="Additional rows rendered above and below each band as context for the denoiser, which are discarded when stitching",
+    )
+
+    persistent_data: bpy.props.BoolProperty(
+        default=True,
+        name="Persistent Data",
+        description=("Keep the Cycles scene data and BVH in memory between the render steps, as only the camera moves between the views of a nightmode "
+                     "(uses more memory; the console reports any render step for which the BVH had to be rebuilt)"),
+    )
+
+    auto_samples_enabled: bpy.props.BoolProperty(
+        default=False,
+        name="Automatic Sample Budget",
+        description=("Before rendering each view, estimate the noise of the stored tiles from two quick low-sample pre-passes "
+                     "and choose the samples and adaptive threshold that reach the target noise (Cycles only)"),
+    )
+
+    auto_samples_noise_target: bpy.props.FloatProperty(
+        default=0.02,
+        min=0.001,
+        max=0.5,
+        precision=3,
+        name="Target Noise",
+        description="Noise level (standard deviation of the pixel values) to reach, also used as adaptive threshold. Higher values are acceptable with denoising",
+    )
+
+    auto_samples_prepass: bpy.props.IntProperty(
+        default=8,
+        min=2,
+        soft_max=64,
+        name="Pre-Pass Samples",
+        description="Samples of each pre-pass, which is rendered at half resolution (lower with Banded Rendering) without denoising or compositing. This is also the minimum number of samples",
+    )
+
+    auto_samples_max: bpy.props.IntProperty(
+        default=1024,
+        min=1,
+        soft_max=8192,
+        name="Max Samples",
+        description="Upper bound of the samples chosen for a view",
+    )
+
+    night_delta_enabled: bpy.props.BoolProperty(
+        default=False,
+        name="Night Deltas",
+        description=("Only store night tiles that differ from the Day tiles with the night tint applied, such as tiles with lit windows. "
+                     "For the other tiles, the game uses the Day texture with its own night tint, which reduces the size of the SC4Model files"),
+    )
+
+    night_tint: bpy.props.FloatVectorProperty(
+        default=(0.4, 0.4, 0.55),
+        size=3,
+        min=0.0,
+        max=1.0,
+        subtype='COLOR',
+        name="Night Tint",
+        description="Approximation of the tint that the game applies to Day textures at night",
+    )
+
+    night_delta_color_tolerance: bpy.props.FloatProperty(
+        default=0.05,
+        min=0.0,
+        max=1.0,
+        name="Color Tolerance",
+        description="Maximum difference of a pixel color between a night tile and the tinted Day tile for the night tile to be omitted",
+    )
+
+    night_delta_alpha_tolerance: bpy.props.FloatProperty(
+        default=0.02,
+        min=0.0,
+        max=1.0,
+        name="Alpha Tolerance",
+        description="Maximum difference of a pixel alpha between a night tile and the Day tile for the night tile to be omitted",
+    )
+
+    submodel_grid: bpy.props.IntProperty(
+        default=0,
+        min=0,
+        soft_max=8,
+        name="Sub-Model Grid",
+        description=("Split the model along the X and Y axes into this many parts each, which are rendered as separate models with their own Group IDs. "
+                     "If 0, models are only split automatically when a view exceeds 1024 slices"),
+    )
+
+    render_order: bpy.props.EnumProperty(
+        items=[
+            ('DEFAULT', "Default", "Render zooms and rotations in order", '', 0),
+            ('LARGEST_FIRST', "Largest first", "Render the most expensive views first (according to the render plan)", '', 1),
+        ],
+        default='DEFAULT',
+        name="Order",
+        description="Order of the render steps within each Day/Night mode",
+    )
+
+    lod_fit_method: bpy.props.EnumProperty(
+        items=[
+            ('BOX', "Box", "Fit LODs as axis-aligned box around all rendered meshes", '', 0),
+            ('HULL', "Hull", "Fit LODs as simplified convex hull around all rendered meshes, limited by the triangle budget of each zoom", '', 1),
+        ],
+        default='BOX',
+        name="LOD Fit",
+        description="Shape of newly fitted LODs",
+    )
+
+    lod_triangle_budget: bpy.props.IntVectorProperty(
+        size=5,
+        default=(12, 12, 24, 48, 96),
+        min=12,
+        soft_max=1000,
+        name="LOD Triangle Budget",
+        description="Maximum number of triangles of fitted hull LODs for zoom 1 to 5",
+    )
+
+    lod_occlusion_culling: bpy.props.BoolProperty(
+        default=True,
+        name="LOD Occlusion Culling",
+        description="When enabled, LOD faces that are completely hidden behind other LOD faces in the camera view are removed before slicing and export",
+    )
+
+    profiling_enabled: bpy.props.BoolProperty(
+        default=False,
+        name="Profiling",
+        description="Print a table of the time spent in each phase of the render pipeline after rendering. With Debug Mode, the steps are also profiled with cProfile",
+    )
+
+    leak_check: bpy.props.BoolProperty(
+        default=False,
+        name="Leak Check",
+        description="Report datablocks and Python memory left behind by each render step (slows down rendering)",
+    )
+
     debug_mode: bpy.props.BoolProperty(
         default=False,
         name="Debug Mode",
@@ -320,6 +601,25 @@ class B4BPreferences(bpy.types.AddonPreferences):
         subtype='FILE_PATH',
     )
 
+    telemetry_enabled: bpy.props.BoolProperty(
+        default=False,
+        name="Render Telemetry",
+        description="Append the timings, pixel counts and memory usage of each render to a JSON-lines file, to detect performance regressions between runs",
+    )
+
+    telemetry_dir: bpy.props.StringProperty(
+        name="Telemetry folder",
+        description="Folder of the telemetry file; if empty, the file is written next to the rendered outputs",
+        subtype='DIR_PATH',
+    )
+
+    scratch_dir: bpy.props.StringProperty(
+        name="Scratch folder",
+        description=("Folder for intermediate files such as full renderings, for example on a fast local disk. "
+                     "Finished outputs are moved next to the .blend file. If empty, a subfolder next to the .blend file is used"),
+        subtype='DIR_PATH',
+    )
+
     def draw(self, context):
         layout = self.layout
         desc = self.__annotations__['imagemagick_path'].keywords['description']
@@ -328,6 +628,11 @@ class B4BPreferences(bpy.types.AddonPreferences):
         desc = self.__annotations__['fshgen_path'].keywords['description']
         layout.label(text=f"{desc}.")
         layout.prop(self, 'fshgen_path')
+        layout.prop(self, 'telemetry_enabled')
+        row = layout.row()
+        row.enabled = self.telemetry_enabled
+        row.prop(self, 'telemetry_dir')
+        layout.prop(self, 'scratch_dir')
 
 
 class DayNightSelectMenu(bpy.types.Menu):
@@ -1,17 +1,16 @@
 import bpy
 from .Enums import Operators, Rotation, Zoom, NightMode
-from .Rig import Rig
-from . import World
 from .Config import LODZ_NAME, CAM_NAME
-from .Camera import Camera
-from .Renderer import Renderer, SuperSampling
-from .Utils import blend_file_name, BAT4BlenderUserError, b4b_collection, find_object
-from .LOD import LOD
+from .Utils import blend_file_name, BAT4BlenderUserError, b4b_collection, find_object, clear_scratch, set_if_changed
+from . import Profiling
+from . import Telemetry
+from .LeakCheck import LeakCheck
 from bpy.props import StringProperty
 import queue
 import sys
 from pathlib import Path
 import threading
+import time
 
 
 # The OK button in the error dialog
@@ -66,10 +65,24 @@ class _B4BRenderImpl(bpy.types.Operator):
             self._steps = [(z, v, nightmode) for nightmode in self._active_nightmodes for z in Zoom for v in Rotation]
         self._step = 0
         self._output_files = {nightmode: [] for nightmode in self._active_nightmodes}  # is *only* accessed on main thread, so no need for synchronization
+        self._slice_cache = {}  # LOD slicing results shared between the nightmodes of a view
+        self._camera_solutions = {}  # camera placements of all views, computed once at the first step
+        self._render_start = None  # start time of the current non-blocking rendering, for profiling
+        self._telemetry = None
+        self._leak_check = None
+        self._leaks = []
+        self._submodel_activation = None  # replaces LODs and Group ID while rendering a sub-model
+        self._model_suffix = ""
+        self._checkpoint = None  # records the completed steps on disk
+        self._night_tiles_skipped = 0  # night tiles that match their tinted Day tiles
+        self._sample_settings = None  # configured sample settings, while automatic sample budgets are applied
+        self._prepass_running = False
+        self._persistent_data = None
 
     def _finalize_outputs(self, context):
+        from .Renderer import Renderer
         # after last step, create XML and SC4Model
-        model_name = blend_file_name()
+        model_name = self._model_name()
 
         if NightMode.DAY in self._active_nightmodes:  # only export XML together with the LODs during Day render
             Renderer.create_xml(name=model_name, gid=context.scene.b4b.group_id)
@@ -105,33 +118,246 @@ class _B4BRenderImpl(bpy.types.Operator):
                             Path(f).unlink(missing_ok=True)
                         except IOError:
                             pass  # ignored
+        if context.scene.b4b.night_delta_enabled and self._active_nightmodes != [NightMode.DAY]:
+            print(f"Night delta: {self._night_tiles_skipped} night tiles were not stored, as they match the tinted Day tiles")
+        if self._checkpoint is not None:
+            self._checkpoint.remove()  # the outputs are complete, so there is nothing left to resume
+        clear_scratch(context.scene.b4b.group_id)
+        self._stop_instrumentation(cancelled=False)
+        if self._leaks and getattr(self, 'fail_on_leaks', False):
+            raise BAT4BlenderUserError(f"Leak check failed: {len(self._leaks)} leaks found (see console output)")
+
+    def _model_name(self) -> str:
+        return blend_file_name() + self._model_suffix
+
+    def _activate_submodel(self, context, split: 'Split | None', index: int):
+        from .Submodels import Activation
+        if split is None:
+            if index >= 0:
+                raise BAT4BlenderUserError("The model is not split into sub-models, as it does not exceed 1024 slices per view.")
+            return
+        self._submodel_activation = Activation(context, split, index)
+        self._model_suffix = split.name_suffix(index)
+
+    def _deactivate_submodel(self):
+        if self._submodel_activation is not None:
+            self._submodel_activation.restore()
+            self._submodel_activation = None
+
+    def _step_label(self) -> str:
+        z, v, nightmode = self._steps[self._step]
+        return f"Z{z.value+1}{v.compass_name()} {nightmode.label()}"
+
+    def _start_instrumentation(self, context):
+        if context.scene.b4b.profiling_enabled:
+            Profiling.start(cprofile_dir=(str(Path(bpy.app.tempdir) / "b4b_profile") if context.scene.b4b.debug_mode else None))
+        addon = context.preferences.addons.get(__package__)
+        if addon is not None and addon.preferences.telemetry_enabled:
+            self._telemetry = Telemetry.Run(context, Telemetry.log_path(addon.preferences.telemetry_dir))
+        if context.scene.b4b.leak_check or getattr(self, 'fail_on_leaks', False):
+            self._leak_check = LeakCheck()
+        if context.scene.b4b.persistent_data and context.scene.render.engine == 'CYCLES' and not context.scene.b4b.export_lods_only:
+            from .PersistentData import PersistentData
+            self._persistent_data = PersistentData(context, ignore_renderings=lambda: self._prepass_running)
+
+    def _start_checkpoint(self, context, resume: bool):
+        r"""Record the completed steps on disk. When resuming, skip the steps
+        whose outputs were recorded by an interrupted rendering and are unchanged.
+        Intermediate files of earlier renderings are removed in either case.
+        """
+        from .Checkpoint import Checkpoint, step_key
+        clear_scratch(context.scene.b4b.group_id)
+        self._checkpoint = Checkpoint.resume(context) if resume else Checkpoint.create(context)
+        if resume:
+            remaining = []
+            for z, v, nightmode in self._steps:
+                files = self._checkpoint.completed(step_key(z, v, nightmode))
+                if files is None:
+                    remaining.append((z, v, nightmode))
+                else:
+                    self._output_files[nightmode].extend(files)
+            print(f"Resuming: {len(self._steps) - len(remaining)} of {len(self._steps)} steps are already complete")
+            self._steps = remaining
+
+    def _finish_step(self, context, render_post_args, files: list[str], stats: dict):
+        skipped = stats.get('night_tiles_skipped', 0)
+        self._night_tiles_skipped += skipped
+        if self._checkpoint is not None:
+            from .Checkpoint import step_key
+            _, tile_indices_nonempty, _, _, _ = render_post_args
+            expected_pngs = 0 if context.scene.b4b.export_lods_only else len(tile_indices_nonempty)
+            if sum(1 for f in files if f.endswith(".png")) + skipped == expected_pngs:  # otherwise the rendering did not complete
+                self._checkpoint.record(step_key(*self._steps[self._step]), files)
+        if self._telemetry is not None:
+            canvas, tile_indices_nonempty, _, _, supersampling = render_post_args
+            self._telemetry.end_step(self._step_label(), canvas, tile_indices_nonempty,
+                                     supersampling_factor=supersampling.factor, rendered=not context.scene.b4b.export_lods_only)
+        if self._leak_check is not None:
+            self._leak_check.end_step(self._step_label())
+
+    def _stop_instrumentation(self, cancelled: bool):
+        Profiling.stop()
+        if self._telemetry is not None:
+            self._telemetry.finish(cancelled=cancelled)
+        if self._leak_check is not None:
+            self._leak_check.stop()
+            self._leaks = self._leak_check.leaks
+            self._leak_check = None
+        if self._persistent_data is not None:
+            self._persistent_data.stop()
+            self._persistent_data = None
+
+    def _supersampling(self, context, zoom: Zoom) -> 'SuperSampling':
+        from .Renderer import SuperSampling
+        if context.scene.b4b.supersampling_enabled:
+            return SuperSampling(
+                enabled=True,
+                magick_exe=(context.preferences.addons[__package__].preferences.imagemagick_path or "magick"),
+                downsampling_filter=context.scene.b4b.downsampling_filter,
+                factor=SuperSampling.factor_for(context, zoom))
+        else:
+            return SuperSampling(enabled=False)
+
+    def _build_plan(self, context) -> 'RenderPlan':
+        from .RenderPlan import RenderPlan
+        return RenderPlan.build(context, self._steps, supersampling_factors={z: self._supersampling(context, z).factor for z in Zoom})
+
+    def _preflight(self, context, plan: 'RenderPlan | None' = None, report_only: bool = False):
+        r"""Check the whole job before the first step, failing with a single report of all problems.
+        With `report_only`, the problems are only printed (for dry runs).
+        """
+        from . import Preflight
+        plan = plan if plan is not None else self._build_plan(context)
+        supersampling = {z: self._supersampling(context, z) for z in Zoom}
+        if report_only:
+            for problem in Preflight.problems(context, plan, supersampling):
+                print(f"Pre-flight problem: {problem}")
+        else:
+            Preflight.run(context, plan, supersampling)
+
+    def _preflight_submodels(self, context, split: 'Split', report_only: bool = False):
+        r"""Check the jobs of all sub-models before the first one is rendered, failing with a single report of all problems.
+        With `report_only`, the problems are only printed (for dry runs).
+        """
+        from . import Preflight
+        supersampling = {z: self._supersampling(context, z) for z in Zoom}
+        problems = []
+        for index in range(split.count()):
+            try:
+                self._activate_submodel(context, split, index)
+                problems.append(Preflight.problems(context, self._build_plan(context), supersampling))
+            except BAT4BlenderUserError as e:
+                problems.append([str(e)])
+            finally:
+                self._deactivate_submodel()
+        self._model_suffix = ""
+        Preflight.run_submodels(problems, report_only=report_only)
+
+    def _apply_render_order(self, context):
+        order = context.scene.b4b.render_order
+        if order != 'DEFAULT' and len(self._steps) > 1:
+            plan = self._build_plan(context).ordered(order)
+            self._steps = [(s.zoom, s.rotation, s.nightmode) for s in plan.steps]
 
     def _ensure_gid(self, context):
         if context.scene.b4b.group_id in ["default", "", None]:  # GID is only generated once
             bpy.ops.object.b4b_gid_randomize()  # Operators.GID_RANDOMIZE
 
+    def _prepare_scene(self, context):
+        r"""Generate the Group ID and fit missing LODs before rendering (the render plan of a dry run only reports them)."""
+        from .Rig import Rig
+        self._ensure_gid(context)
+        Rig.lods_add()
+
     def _switch_view(self, zoom: Zoom, rotation: Rotation, nightmode: NightMode):
-        bpy.context.scene.b4b.zoom = zoom.name
-        bpy.context.scene.b4b.rotation = rotation.name
-        bpy.context.scene.b4b.night = nightmode.name
+        set_if_changed(bpy.context.scene.b4b, 'zoom', zoom.name)
+        set_if_changed(bpy.context.scene.b4b, 'rotation', rotation.name)
+        set_if_changed(bpy.context.scene.b4b, 'night', nightmode.name)  # only toggles the Day/Night collections when switching the nightmode
 
     def _prepare_render(self, context):
+        from .Rig import Rig
+        from .Renderer import Renderer
         z, v, nightmode = self._steps[self._step]
         print(f"Step ({self._step+1}/{len(self._steps)}): Zoom {z.value+1} {v.name} {nightmode.label()}")
         self._switch_view(z, v, nightmode)
         context.window_manager.b4b.progress = 100 * self._step / len(self._steps)  # TODO consider non-linearity
         context.window_manager.b4b.progress_label = f"({self._step+1}/{len(self._steps)}) Zoom {z.value+1} {v.name} {nightmode.label()}"
-        model_name = blend_file_name()
+        Profiling.begin_step(self._step_label())
+        if self._telemetry is not None:
+            self._telemetry.begin_step()
+        if self._leak_check is not None:
+            self._leak_check.begin_step()
+        model_name = self._model_name()
         hd = context.scene.b4b.hd == 'HD'
-        Rig.setup(v, z, hd=hd)
-        if context.scene.b4b.supersampling_enabled:
-            supersampling = SuperSampling(
-                enabled=True,
-                magick_exe=(context.preferences.addons[__package__].preferences.imagemagick_path or "magick"),
-                downsampling_filter=context.scene.b4b.downsampling_filter)
-        else:
-            supersampling = SuperSampling(enabled=False)
-        return Renderer.render_pre(z, v, context.scene.b4b.group_id, model_name, hd=hd, supersampling=supersampling)
+        with Profiling.span("Rig.setup"):
+            Rig.setup(v, z, hd=hd)
+        supersampling = self._supersampling(context, z)
+        render_post_args = Renderer.render_pre(z, v, context.scene.b4b.group_id, model_name, hd=hd, supersampling=supersampling, slice_cache=self._slice_cache, camera_solutions=self._camera_solutions)
+        if self._persistent_data is not None:  # before the pre-passes, which must not be attributed to the previous step
+            self._persistent_data.before_render(context, self._step_label(), nightmode)
+        if context.scene.b4b.auto_samples_enabled and not context.scene.b4b.export_lods_only:
+            self._budget_samples(context, render_post_args)
+        return render_post_args
+
+    def _budget_samples(self, context, render_post_args):
+        r"""Choose the samples of the current step from the noise of low-sample pre-passes (blocking)."""
+        from . import SampleBudget
+        scene = context.scene
+        if scene.render.engine != 'CYCLES':
+            print("Automatic sample budget is only supported by Cycles, so the configured samples are used")
+            return
+        if self._sample_settings is None:
+            self._sample_settings = SampleBudget.save_settings(scene)
+        canvas, tile_indices_nonempty, _, _, supersampling = render_post_args
+        self._prepass_running = True  # the pre-passes must not trigger the render_post handler of the modal operator
+        try:
+            result = SampleBudget.prepass(scene, canvas, tile_indices_nonempty, scene.b4b.group_id,
+                                          render=lambda: self._do_render(context, blocking=True),
+                                          max_samples=scene.b4b.auto_samples_max,
+                                          supersampling_factor=supersampling.factor,
+                                          cancelled=lambda: self._cancelled,
+                                          percentage=SampleBudget.prepass_percentage(self._band_layout(context, render_post_args)))
+        finally:
+            self._prepass_running = False
+        if result is None:
+            print("Sample budget: pre-pass was cancelled")
+            return
+        budget, seconds_per_sample = result
+        SampleBudget.apply(scene, budget)
+        base_samples = self._sample_settings['samples']
+        print(f"Sample budget: noise {budget.noise:.3f} per sample, so rendering with {budget.samples} samples and adaptive threshold {budget.adaptive_threshold:g} "
+              f"(time saved compared to {base_samples} samples, roughly estimated from the pre-passes: {budget.seconds_saved(seconds_per_sample, base_samples):.1f} s)")
+
+    def _restore_sample_settings(self, context):
+        if self._sample_settings is not None:
+            from . import SampleBudget
+            SampleBudget.restore_settings(context.scene, self._sample_settings)
+            self._sample_settings = None
+
+    def _band_layout(self, context, render_post_args) -> list[tuple[int, int, int, int]] | None:
+        r"""The horizontal bands to render separately if banded rendering is enabled, or None to render the full canvas at once."""
+        b4b = context.scene.b4b
+        if not b4b.banded_rendering or b4b.export_lods_only:
+            return None
+        canvas, _, _, _, supersampling = render_post_args
+        bands = canvas.bands(b4b.band_rows, b4b.band_overlap, scale=supersampling.factor)
+        return bands if len(bands) > 1 else None
+
+    def _render_blocking(self, context, render_post_args):
+        from .Renderer import Renderer
+        bands = self._band_layout(context, render_post_args)
+        if bands is None:
+            self._do_render(context, blocking=True)
+            return
+        tmp_png_path = render_post_args[2]
+        try:
+            for index in range(len(bands)):
+                Renderer.setup_band(bands, index, tmp_png_path)
+                self._do_render(context, blocking=True)
+        except BaseException:
+            Renderer.discard_bands(bands, tmp_png_path)
+            raise
+        Renderer.stitch_bands(bands, tmp_png_path)
 
     def _do_render(self, context, *, blocking: bool):
         layer = context.view_layer  # we choose the active layer for rendering if enabled in 'Use for Rendering', otherwise the default layer
@@ -139,7 +365,12 @@ class _B4BRenderImpl(bpy.types.Operator):
         orig_display_type = context.preferences.view.render_display_type
         try:
             context.preferences.view.render_display_type = 'NONE'  # avoid opening new window for each view (instead use Rendering workspace to see result)
-            bpy.ops.render.render('EXEC_DEFAULT' if blocking else 'INVOKE_DEFAULT', write_still=True, **kwds)
+            if blocking:
+                with Profiling.span("render"):
+                    bpy.ops.render.render('EXEC_DEFAULT', write_still=True, **kwds)
+            else:
+                self._render_start = time.perf_counter()  # the rendering finishes in the render_post handler
+                bpy.ops.render.render('INVOKE_DEFAULT', write_still=True, **kwds)
         finally:
             context.preferences.view.render_display_type = orig_display_type
 
@@ -157,23 +388,72 @@ class B4BRender(_B4BRenderImpl):
     bl_idname = Operators.RENDER.value[0]
     bl_label = "Render all zooms & rotations"
 
+    dry_run: bpy.props.BoolProperty(
+        default=False,
+        name="Dry Run",
+        description="Only print the render plan without rendering",
+        options={'SKIP_SAVE'},
+    )
+
+    fail_on_leaks: bpy.props.BoolProperty(
+        default=False,
+        name="Fail On Leaks",
+        description="Check for datablocks and memory left behind by each step, and fail if any are found (for batch processing)",
+        options={'SKIP_SAVE'},
+    )
+
+    resume: bpy.props.BoolProperty(
+        default=False,
+        name="Resume",
+        description="Skip the steps that an interrupted rendering already completed, according to its checkpoint, and verify their output files",
+        options={'SKIP_SAVE'},
+    )
+
+    submodel: bpy.props.IntProperty(
+        default=-1,
+        min=-1,
+        name="Sub-Model",
+        description=("If the model is split into sub-models because it exceeds 1024 slices per view, render only the sub-model with this index, "
+                     "so that sub-models can be rendered by parallel jobs (-1 renders all sub-models one after the other)"),
+        options={'SKIP_SAVE'},
+    )
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._cancelled = False
+        self._failed = False
         self._finished = False  # is set after last rendering step or after being cancelled
         self._exception = None
         self._interval = 0.5  # seconds
         self._render_post_args = None
+        self._bands = None  # bands of the current step if banded rendering is enabled
+        self._band_index = 0
         self._execution_queue = queue.Queue()
 
     def _post_handler(self, scene, depsgraph):
         r"""Runs after each rendering call.
         """
         # assert threading.current_thread() is not threading.main_thread()
+        if self._prepass_running:
+            return
         def f():
+            from .Renderer import Renderer
             assert threading.current_thread() is threading.main_thread()
+            if self._render_start is not None:
+                Profiling.record("render", time.perf_counter() - self._render_start)
+                self._render_start = None
+            if self._bands is not None:
+                self._band_index += 1
+                if self._band_index < len(self._bands):
+                    self.run_on_main_thread(self._start_render)
+                    return
+                bands, self._bands = self._bands, None
+                Renderer.stitch_bands(bands, self._render_post_args[2])
             z, v, nightmode = self._steps[self._step]
-            self._output_files[nightmode].extend(Renderer.render_post(z, v, scene.b4b.group_id, *self._render_post_args))
+            stats = {}
+            files = list(Renderer.render_post(z, v, scene.b4b.group_id, *self._render_post_args, stats=stats, day_files=self._output_files.get(NightMode.DAY)))
+            self._output_files[nightmode].extend(files)
+            self._finish_step(bpy.context, self._render_post_args, files, stats)
             self._render_post_args = None
             print("-" * 60)
             self._step += 1
@@ -187,6 +467,9 @@ class B4BRender(_B4BRenderImpl):
 
     def _cancel_handler(self, scene, depsgraph):
         print("Rendering was cancelled.")
+        if self._prepass_running:  # the pre-passes are blocking renderings on the main thread, which check this flag in between
+            self._cancelled = True
+            return
         def f():
             self._cancelled = True
         self.run_on_main_thread(f)
@@ -199,10 +482,43 @@ class B4BRender(_B4BRenderImpl):
         """Non-blocking execution of the render operator, so that progress can be displayed in the UI and the operation can be cancelled by pressing ESC."""
         assert threading.current_thread() is threading.main_thread(), "BAT4Blender expected to execute Render operator only on main thread"
         if context.window_manager.b4b.is_rendering:
-            print("A rendering operation is already in progress.")
+            if self.dry_run or self.submodel >= 0:
+                print("A rendering operation is already in progress.")
+                return {'FINISHED'}
+            _enqueue(context, context.scene, current_view_only=context.scene.b4b.render_current_view_only)
+            if not context.window_manager.b4b.queue_running:
+                bpy.ops.object.b4b_queue_run('INVOKE_DEFAULT')  # Operators.QUEUE_RUN, starts once the current rendering finished
+            self.report({'INFO'}, f"A rendering operation is already in progress, so scene \"{context.scene.name}\" was added to the render queue.")
             return {'FINISHED'}
+        if self.dry_run:
+            return self.execute(context)
+        from . import Submodels
+        try:
+            self._prepare_scene(context)
+            split = Submodels.split(context)
+        except BAT4BlenderUserError as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+        if split is not None and self.submodel < 0:
+            return self._enqueue_submodels(context, split)
         context.window_manager.b4b.is_rendering = True
-        self._ensure_gid(context)
+        try:
+            self._activate_submodel(context, split, self.submodel)
+            self._apply_render_order(context)
+            self._preflight(context)
+            self._start_checkpoint(context, resume=self.resume)
+            if not self._steps:  # all steps were completed before
+                self._finalize_outputs(context)
+                self._deactivate_submodel()
+                context.window_manager.b4b.is_rendering = False
+                return {'FINISHED'}
+        except BAT4BlenderUserError as e:
+            self._deactivate_submodel()
+            context.window_manager.b4b.is_rendering = False
+            print(str(e), file=sys.stderr)
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+        self._start_instrumentation(context)
 
         bpy.app.handlers.render_post.append(self._post_handler)
         bpy.app.handlers.render_cancel.append(self._cancel_handler)
@@ -212,6 +528,25 @@ class B4BRender(_B4BRenderImpl):
 
         return {'RUNNING_MODAL'}
 
+    def _enqueue_submodels(self, context, split: 'Split') -> set[str]:
+        r"""Render the sub-models as entries of the render queue, each with its own
+        non-blocking rendering, after checking all of them.
+        """
+        from .Submodels import describe
+        print(describe(split))
+        try:
+            self._preflight_submodels(context, split)
+        except BAT4BlenderUserError as e:
+            print(str(e), file=sys.stderr)
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+        for index in range(split.count()):
+            _enqueue(context, context.scene, current_view_only=context.scene.b4b.render_current_view_only, submodel=index, resume=self.resume)
+        if not context.window_manager.b4b.queue_running:
+            bpy.ops.object.b4b_queue_run('INVOKE_DEFAULT')  # Operators.QUEUE_RUN
+        self.report({'INFO'}, f"Added {split.count()} sub-models to the render queue")
+        return {'FINISHED'}
+
     def _redraw_areas(self, area_types: set[str]):
         for window in bpy.context.window_manager.windows:
             for area in window.screen.areas:
@@ -234,9 +569,17 @@ class B4BRender(_B4BRenderImpl):
             bpy.app.handlers.render_post.remove(self._post_handler)
             bpy.app.handlers.render_cancel.remove(self._cancel_handler)
             print('CANCELLED' if self._cancelled else 'FINISHED')
+            self._stop_instrumentation(cancelled=True)  # no-op unless cancelled, as it is stopped after the last step already
+            if self._bands is not None and self._render_post_args is not None:  # cancelled during banded rendering
+                from .Renderer import Renderer
+                Renderer.discard_bands(self._bands, self._render_post_args[2])
+                self._bands = None
+            self._restore_sample_settings(bpy.context)
+            self._deactivate_submodel()
             self._finished = True
             self._switch_view(self._orig_zoom, self._orig_rotation, self._orig_nightmode)
             bpy.context.window_manager.b4b.is_rendering = False
+            bpy.context.window_manager.b4b.last_render_result = 'FAILED' if self._failed else 'CANCELLED' if self._cancelled else 'FINISHED'
             bpy.context.window_manager.update_tag()  # so that the UI display of drivers depending on e.g. `b4b.rotation` switch back to the original value again
             self._redraw_areas(area_types=set([
                 'PROPERTIES',  # redraw to show Render button instead of progress bar again
@@ -252,38 +595,70 @@ class B4BRender(_B4BRenderImpl):
                 except BAT4BlenderUserError as e:
                     print(str(e), file=sys.stderr)
                     self.report({'ERROR'}, str(e))  # consume user errors by reporting them in the UI
-                    self._cancelled = True
+                    self._cancelled = self._failed = True
                 except Exception as e:
                     self._exception = e  # keep forwarding internal errors (with stack trace)
-                    self._cancelled = True
+                    self._cancelled = self._failed = True
             return self._interval  # calls `execute_queue_loop` again after _interval
 
     def handle_next_step(self):
         assert threading.current_thread() is threading.main_thread()
         context = bpy.context
         self._render_post_args = self._prepare_render(context)
+        if self._cancelled:  # during the sample pre-passes
+            return
+        self._bands = self._band_layout(context, self._render_post_args)
+        self._band_index = 0
 
         # The following render call returns immediately *before* rendering finished,
         # so slicing rendered image is done later in post processing after rendering finished.
         # Likewise, slicing LODs is done in preprocessing.
-        def f():  # executing this delayed seems to be important to avoid deadlocks
-            assert threading.current_thread() is threading.main_thread()
-            self._do_render(bpy.context, blocking=False)
-
         if context.scene.b4b.export_lods_only:
             self._post_handler(scene=context.scene, depsgraph=None)
         else:
-            self.run_on_main_thread(f)
+            self.run_on_main_thread(self._start_render)  # executing this delayed seems to be important to avoid deadlocks
+
+    def _start_render(self):
+        r"""Start the non-blocking rendering of the current step, or of its next band."""
+        from .Renderer import Renderer
+        assert threading.current_thread() is threading.main_thread()
+        if self._bands is not None:
+            Renderer.setup_band(self._bands, self._band_index, self._render_post_args[2])
+        self._do_render(bpy.context, blocking=False)
 
     def execute(self, context):
         """Blocking execution of the render operator, for scripts."""
+        from .Renderer import Renderer
+        from . import Submodels
         try:
-            self._ensure_gid(context)
+            if self.dry_run:
+                plan = self._build_plan(context).ordered(context.scene.b4b.render_order)
+                plan.print_report()
+                split = Submodels.split(context)
+                if split is not None:
+                    print(Submodels.describe(split))
+                    self._preflight_submodels(context, split, report_only=True)
+                else:
+                    self._preflight(context, plan, report_only=True)
+                self.report({'INFO'}, f"Render plan: {plan.summary()}")
+                return {'FINISHED'}
+            self._prepare_scene(context)
+            split = Submodels.split(context)
+            if split is not None and self.submodel < 0:
+                return self._render_submodels(split)
+            self._activate_submodel(context, split, self.submodel)
+            self._apply_render_order(context)
+            self._preflight(context)
+            self._start_checkpoint(context, resume=self.resume)
+            self._start_instrumentation(context)
             for z, v, nightmode in self._steps:
                 render_post_args = self._prepare_render(context)
                 if not context.scene.b4b.export_lods_only:
-                    self._do_render(context, blocking=True)
-                self._output_files[nightmode].extend(Renderer.render_post(z, v, context.scene.b4b.group_id, *render_post_args))
+                    self._render_blocking(context, render_post_args)
+                stats = {}
+                files = list(Renderer.render_post(z, v, context.scene.b4b.group_id, *render_post_args, stats=stats, day_files=self._output_files.get(NightMode.DAY)))
+                self._output_files[nightmode].extend(files)
+                self._finish_step(context, render_post_args, files, stats)
                 print("-" * 60)
                 self._step += 1
             self._finalize_outputs(context)
@@ -292,6 +667,271 @@ class B4BRender(_B4BRenderImpl):
             # print(str(e), file=sys.stderr)
             self.report({'ERROR'}, str(e))
             return {'CANCELLED'}
+        finally:
+            self._stop_instrumentation(cancelled=True)  # no-op unless an error occurred
+            self._restore_sample_settings(context)
+            self._deactivate_submodel()
+
+    def _render_submodels(self, split: 'Split') -> set[str]:
+        from .Submodels import describe
+        print(describe(split))
+        self._preflight_submodels(bpy.context, split)
+        failed = []
+        for index in range(split.count()):
+            print("=" * 60)
+            try:
+                result = bpy.ops.object.b4b_render('EXEC_DEFAULT', submodel=index, resume=self.resume, fail_on_leaks=self.fail_on_leaks)  # Operators.RENDER
+            except RuntimeError as e:  # raised by operators that report an error
+                print(f"Rendering sub-model {index} failed: {e}", file=sys.stderr)
+                result = {'CANCELLED'}
+            if result != {'FINISHED'}:
+                failed.append(index)
+        if failed:
+            self.report({'ERROR'}, f"Rendering sub-models {', '.join(map(str, failed))} of {split.count()} failed (see console output)")
+            return {'CANCELLED'}
+        self.report({'INFO'}, f"Rendered {split.count()} sub-models")
+        return {'FINISHED'}
+
+
+class B4BRenderPlan(_B4BRenderImpl):
+    r"""Compute the render plan without rendering.
+    """
+    bl_description = "Print the canvas sizes, tiles, output files and estimated cost of all render steps without rendering, and optionally export them as JSON"
+    bl_idname = Operators.RENDER_PLAN.value[0]
+    bl_label = "Dry run"
+
+    filepath: bpy.props.StringProperty(
+        name="JSON File",
+        description="If set, export the render plan to this JSON file",
+        subtype='FILE_PATH',
+        options={'SKIP_SAVE'},
+    )
+
+    def execute(self, context):
+        try:
+            from . import Submodels
+            plan = self._build_plan(context).ordered(context.scene.b4b.render_order)
+            plan.print_report()
+            split = Submodels.split(context)
+            if split is not None:
+                print(Submodels.describe(split))
+                self._preflight_submodels(context, split, report_only=True)
+            else:
+                self._preflight(context, plan, report_only=True)
+            if self.filepath:
+                plan.export_json(bpy.path.abspath(self.filepath))
+            self.report({'WARNING'} if plan.errors() else {'INFO'}, f"Render plan: {plan.summary()}")
+            return {'FINISHED'}
+        except BAT4BlenderUserError as e:
+            print(str(e), file=sys.stderr)
+            self.report({'ERROR'}, str(e))  # consume user errors by reporting them in the UI
+            return {'CANCELLED'}
+
+
+def _enqueue(context, scene, current_view_only: bool, submodel: int = -1, resume: bool = False):
+    queue = context.window_manager.b4b.queue
+    entry = queue.add()
+    entry.scene = scene
+    entry.current_view_only = current_view_only
+    entry.submodel = submodel
+    entry.resume = resume
+    context.window_manager.b4b.queue_index = len(queue) - 1
+    print(f"Added scene \"{scene.name}\" to render queue ({len(queue)} entries)")
+
+
+class B4BQueueAdd(bpy.types.Operator):
+    bl_description = "Add the current scene to the render queue"
+    bl_idname = Operators.QUEUE_ADD.value[0]
+    bl_label = "Add to render queue"
+
+    def execute(self, context):
+        _enqueue(context, context.scene, current_view_only=context.scene.b4b.render_current_view_only)
+        return {'FINISHED'}
+
+
+class B4BQueueRemove(bpy.types.Operator):
+    bl_description = "Remove the selected entry from the render queue"
+    bl_idname = Operators.QUEUE_REMOVE.value[0]
+    bl_label = "Remove from render queue"
+
+    @classmethod
+    def poll(cls, context):
+        wm = context.window_manager
+        return 0 <= wm.b4b.queue_index < len(wm.b4b.queue) and wm.b4b.queue[wm.b4b.queue_index].status != 'RENDERING'
+
+    def execute(self, context):
+        wm = context.window_manager
+        wm.b4b.queue.remove(wm.b4b.queue_index)
+        wm.b4b.queue_index = min(wm.b4b.queue_index, len(wm.b4b.queue) - 1)
+        return {'FINISHED'}
+
+
+class B4BQueueMove(bpy.types.Operator):
+    bl_description = "Move the selected entry of the render queue up or down"
+    bl_idname = Operators.QUEUE_MOVE.value[0]
+    bl_label = "Move render queue entry"
+
+    direction: bpy.props.EnumProperty(items=[('UP', "Up", ""), ('DOWN', "Down", "")])
+
+    @classmethod
+    def poll(cls, context):
+        wm = context.window_manager
+        return 0 <= wm.b4b.queue_index < len(wm.b4b.queue)
+
+    def execute(self, context):
+        wm = context.window_manager
+        i = wm.b4b.queue_index
+        j = i - 1 if self.direction == 'UP' else i + 1
+        if 0 <= j < len(wm.b4b.queue):
+            wm.b4b.queue.move(i, j)
+            wm.b4b.queue_index = j
+        return {'FINISHED'}
+
+
+class B4BQueueClear(bpy.types.Operator):
+    bl_description = "Remove all entries from the render queue that are not rendering"
+    bl_idname = Operators.QUEUE_CLEAR.value[0]
+    bl_label = "Clear render queue"
+
+    def execute(self, context):
+        queue = context.window_manager.b4b.queue
+        for i in reversed(range(len(queue))):
+            if queue[i].status != 'RENDERING':
+                queue.remove(i)
+        context.window_manager.b4b.queue_index = len(queue) - 1
+        return {'FINISHED'}
+
+
+class B4BQueueCancel(bpy.types.Operator):
+    bl_description = "Stop the render queue after the current entry (press ESC to cancel the current rendering as well)"
+    bl_idname = Operators.QUEUE_CANCEL.value[0]
+    bl_label = "Stop render queue"
+
+    def execute(self, context):
+        context.window_manager.b4b.queue_stop_requested = True
+        return {'FINISHED'}
+
+
+class B4BQueueRun(bpy.types.Operator):
+    r"""Render the queued scenes back to back.
+    Like the render operator, this runs in a single modal session driven by a
+    timer. Each entry is rendered by invoking the render operator on its
+    scene, and the next entry is started once the previous rendering ended.
+    Cancelling a rendering with ESC also stops the queue.
+    """
+    bl_description = "Render all queued scenes one after the other"
+    bl_idname = Operators.QUEUE_RUN.value[0]
+    bl_label = "Render queue"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._window = None
+        self._orig_scene = None
+        self._orig_view_only = {}  # maps scene name to original `render_current_view_only` setting
+        self._interval = 0.5  # seconds
+        self._finished = False
+
+    @staticmethod
+    def _next_entry(queue):
+        return next((entry for entry in queue if entry.status == 'QUEUED' and entry.scene is not None), None)
+
+    def _begin_entry(self, entry):
+        entry.status = 'RENDERING'
+        entry.progress = 0
+        scene = entry.scene
+        self._orig_view_only.setdefault(scene.name, scene.b4b.render_current_view_only)
+        scene.b4b.render_current_view_only = entry.current_view_only
+        print(f"Render queue: rendering scene \"{scene.name}\"")
+
+    def _end_entry(self, entry, status: str):
+        entry.status = status
+        if status == 'FINISHED':
+            entry.progress = 100
+        scene = entry.scene
+        if scene is not None and scene.name in self._orig_view_only:
+            scene.b4b.render_current_view_only = self._orig_view_only.pop(scene.name)
+
+    def invoke(self, context, event):
+        wm = context.window_manager
+        if wm.b4b.queue_running:
+            return {'FINISHED'}
+        if self._next_entry(wm.b4b.queue) is None:
+            self.report({'INFO'}, "The render queue is empty.")
+            return {'FINISHED'}
+        wm.b4b.queue_running = True
+        wm.b4b.queue_stop_requested = False
+        self._window = context.window
+        self._orig_scene = context.window.scene
+        context.window_manager.modal_handler_add(self)
+        bpy.app.timers.register(self._tick)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        return {'FINISHED'} if self._finished else {'PASS_THROUGH'}
+
+    def _tick(self):
+        assert threading.current_thread() is threading.main_thread()
+        wm = bpy.context.window_manager
+        queue = wm.b4b.queue
+        current = next((entry for entry in queue if entry.status == 'RENDERING'), None)
+        if wm.b4b.is_rendering:
+            if current is not None:
+                current.progress = wm.b4b.progress
+            return self._interval
+        if current is not None:  # the rendering of the current entry ended
+            self._end_entry(current, wm.b4b.last_render_result or 'FAILED')
+            if current.status == 'CANCELLED':
+                wm.b4b.queue_stop_requested = True
+        entry = None if wm.b4b.queue_stop_requested else self._next_entry(queue)
+        if entry is None:
+            print("Render queue: " + ("stopped" if wm.b4b.queue_stop_requested else "finished"))
+            if self._orig_scene is not None and self._window.scene != self._orig_scene:
+                self._window.scene = self._orig_scene
+            wm.b4b.queue_running = False
+            wm.b4b.queue_stop_requested = False
+            self._finished = True
+            return None  # timer finishes and is unregistered
+
+        self._window.scene = entry.scene
+        self._begin_entry(entry)
+        wm.b4b.last_render_result = ''
+        try:
+            with bpy.context.temp_override(window=self._window):
+                result = bpy.ops.object.b4b_render('INVOKE_DEFAULT', submodel=entry.submodel, resume=entry.resume)  # Operators.RENDER
+        except RuntimeError as e:  # raised by operators that report an error
+            print(f"Render queue: rendering scene \"{entry.scene.name}\" failed: {e}", file=sys.stderr)
+            result = {'CANCELLED'}
+        if 'RUNNING_MODAL' not in result:  # finished without non-blocking rendering, e.g. due to an error or for sub-models
+            self._end_entry(entry, 'FINISHED' if result == {'FINISHED'} else 'FAILED')
+        return self._interval
+
+    def execute(self, context):
+        """Blocking execution of the render queue, for scripts."""
+        queue = context.window_manager.b4b.queue
+        orig_scene = context.window.scene if context.window is not None else None
+        try:
+            while (entry := self._next_entry(queue)) is not None:
+                self._begin_entry(entry)
+                try:
+                    if context.window is not None:
+                        context.window.scene = entry.scene
+                        result = bpy.ops.object.b4b_render('EXEC_DEFAULT', submodel=entry.submodel, resume=entry.resume)  # Operators.RENDER
+                    else:  # background mode
+                        with context.temp_override(scene=entry.scene, view_layer=entry.scene.view_layers[0]):
+                            result = bpy.ops.object.b4b_render('EXEC_DEFAULT', submodel=entry.submodel, resume=entry.resume)
+                except RuntimeError as e:  # raised by operators that report an error
+                    print(f"Render queue: rendering scene \"{entry.scene.name}\" failed: {e}", file=sys.stderr)
+                    result = {'CANCELLED'}
+                except BaseException:
+                    self._end_entry(entry, 'FAILED')
+                    raise
+                self._end_entry(entry, 'FINISHED' if result == {'FINISHED'} else 'FAILED')
+        finally:
+            if orig_scene is not None:
+                context.window.scene = orig_scene
+        failed = sum(1 for entry in queue if entry.status == 'FAILED')
+        self.report({'WARNING'} if failed else {'INFO'}, f"Rendered render queue ({failed} failed)" if failed else "Rendered render queue")
+        return {'FINISHED'}
 
 
 class B4BCamSetup(bpy.types.Operator):
@@ -300,12 +940,14 @@ class B4BCamSetup(bpy.types.Operator):
     bl_label = "CamSetup"
 
     def execute(self, context):
+        from .Rig import Rig
+        from .Renderer import Renderer, SuperSampling
         try:
             v = Rotation[context.scene.b4b.rotation]
             z = Zoom[context.scene.b4b.zoom]
             hd = context.scene.b4b.hd == 'HD'
             Rig.setup(v, z, hd=hd)
-            Renderer.camera_manoeuvring(z, hd=hd, supersampling=SuperSampling.for_preview(context))
+            Renderer.camera_manoeuvring(z, v, hd=hd, supersampling=SuperSampling.for_preview(context))
             self.report({'INFO'}, "Successfully positioned Camera.")
             return {'FINISHED'}
         except BAT4BlenderUserError as e:
@@ -320,13 +962,15 @@ class B4BPreview(bpy.types.Operator):
     bl_label = "Preview"
 
     def execute(self, context):
+        from .Rig import Rig
+        from .Renderer import Renderer, SuperSampling
         try:
             v = Rotation[context.scene.b4b.rotation]
             z = Zoom[context.scene.b4b.zoom]
             hd = context.scene.b4b.hd == 'HD'
             Rig.setup(v, z, hd=hd)
             # q: pass the context to the renderer? or just grab it from internals..
-            Renderer.generate_preview(z, hd=hd, supersampling=SuperSampling.for_preview(context))
+            Renderer.generate_preview(z, v, hd=hd, supersampling=SuperSampling.for_preview(context))
             return {'FINISHED'}
         except BAT4BlenderUserError as e:
             print(str(e), file=sys.stderr)
@@ -335,16 +979,18 @@ class B4BPreview(bpy.types.Operator):
 
 
 class B4BPreviewDownSampling(bpy.types.Operator):
-    bl_description = r"""After rendering Preview at 2× resolution, click to down-scale the render result to its final size"""
+    bl_description = r"""After rendering a super-sampled Preview, click to down-scale the render result to its final size"""
     bl_idname = Operators.PREVIEW_DOWNSAMPLING.value[0]
     bl_label = "Down-sample last Preview render"
 
     def execute(self, context):
+        from .Renderer import Renderer, SuperSampling
         try:
             supersampling = SuperSampling(
                 enabled=(context.scene.b4b.supersampling_enabled and context.scene.b4b.supersampling_preview != 'no_supersampling'),
                 magick_exe=(context.preferences.addons[__package__].preferences.imagemagick_path or "magick"),
-                downsampling_filter=context.scene.b4b.downsampling_filter)
+                downsampling_filter=context.scene.b4b.downsampling_filter,
+                factor=SuperSampling.factor_for(context, Zoom[context.scene.b4b.zoom]))
             img = Renderer.downsample_preview(supersampling=supersampling)
             areas = [a for s in bpy.data.screens if s.name != 'Rendering'  # skip Rendering, so that next Preview shows Render Result again instead of outdated downsampled image
                      for a in s.areas if a.type == 'IMAGE_EDITOR' and
@@ -374,6 +1020,7 @@ class B4BLODAdd(bpy.types.Operator):
     bl_label = "LOD add"
 
     def execute(self, context):
+        from .Rig import Rig
         Rig.lods_add()
         return {'FINISHED'}
 
@@ -385,6 +1032,7 @@ class B4BLODFitZoom(bpy.types.Operator):
     bl_label = "LOD fit for zoom"
 
     def execute(self, context):
+        from .Rig import Rig
         z = Zoom[context.scene.b4b.zoom]
         Rig.lod_fit(z)
         return {'FINISHED'}
@@ -396,6 +1044,7 @@ class B4BLODDelete(bpy.types.Operator):
     bl_label = "LODDelete"
 
     def execute(self, context):
+        from .Rig import Rig
         for z in Zoom:
             Rig.lod_delete(z)
         return {'FINISHED'}
@@ -407,20 +1056,23 @@ class B4BLODSlice(bpy.types.Operator):
     bl_label = "LODSlice"
 
     def execute(self, context):
+        from .Rig import Rig
+        from .Renderer import Renderer, SuperSampling
+        from .LOD import LOD
         try:
             v = Rotation[context.scene.b4b.rotation]
             z = Zoom[context.scene.b4b.zoom]
             hd = context.scene.b4b.hd == 'HD'
             Rig.setup(v, z, hd=hd)
-            canvas = Renderer.camera_manoeuvring(z, hd=hd, supersampling=SuperSampling.for_preview(context))
+            canvas = Renderer.camera_manoeuvring(z, v, hd=hd, supersampling=SuperSampling.for_preview(context))
             coll = b4b_collection()
             cam = find_object(coll, CAM_NAME)
             lod = find_object(coll, LODZ_NAME[z.value])
             lod_slices = LOD.sliced(lod, cam, canvas)
-            lod_slices_empty = [lod_slice for lod_slice in lod_slices.values() if len(lod_slice.data.polygons) == 0]
-            for lod_slice in lod_slices_empty:  # remove empty slices
-                bpy.data.meshes.remove(lod_slice.data)
-            self.report({'INFO'}, f"Successfully created sliced copy of visible LOD ({len(lod_slices) - len(lod_slices_empty)} slices).")
+            lod_slices_nonempty = [lod_slice for lod_slice in lod_slices.values() if lod_slice.triangles]
+            for lod_slice in lod_slices_nonempty:
+                LOD.link_slice(lod_slice, name='b4b_lod_slice')
+            self.report({'INFO'}, f"Successfully created sliced copy of visible LOD ({len(lod_slices_nonempty)} slices).")
             return {'FINISHED'}
         except BAT4BlenderUserError as e:
             print(str(e), file=sys.stderr)
@@ -434,6 +1086,7 @@ class B4BWorldSetup(bpy.types.Operator):
     bl_label = "WorldSetup"
 
     def execute(self, context):
+        from . import World
         try:
             World.setup_world(context=context)
             self.report({'INFO'}, "Successfully configured World.")
@@ -449,6 +1102,7 @@ class B4BCompositingSetup(bpy.types.Operator):
     bl_label = "CompositingSetup"
 
     def execute(self, context):
+        from . import World
         try:
             World.setup_compositing(context=context)
             self.report({'INFO'}, "Successfully configured Compositing.")
@@ -458,6 +1112,43 @@ class B4BCompositingSetup(bpy.types.Operator):
         return {'FINISHED'}
 
 
+class B4BTelemetryCompare(bpy.types.Operator):
+    bl_description = "Compare the step timings of the latest render with the median of the previous renders of this scene, and report the steps that got slower"
+    bl_idname = Operators.TELEMETRY_COMPARE.value[0]
+    bl_label = "Compare render telemetry"
+
+    window: bpy.props.IntProperty(
+        default=5,
+        min=1,
+        name="Window",
+        description="Number of previous renders whose median is used as reference",
+    )
+    threshold: bpy.props.FloatProperty(
+        default=0.1,
+        min=0.0,
+        name="Threshold",
+        description="Relative slowdown of a step that is reported",
+    )
+
+    def execute(self, context):
+        path = Telemetry.log_path(context.preferences.addons[__package__].preferences.telemetry_dir)
+        if not Path(path).is_file():
+            self.report({'ERROR'}, f"No render telemetry found at '{path}'")
+            return {'CANCELLED'}
+        rows, num_references = Telemetry.compare_latest(Telemetry.load_records(path), window=self.window, threshold=self.threshold)
+        if not rows:
+            self.report({'WARNING'}, "No previous renders of this scene to compare with")
+            return {'CANCELLED'}
+        print(f"Comparing latest completed render with the median of {num_references} previous renders ({path}):")
+        print(Telemetry.format_comparison(rows, threshold=self.threshold))
+        slower = [row[0] for row in rows if row[4]]
+        if slower:
+            self.report({'WARNING'}, f"{len(slower)} steps got slower by more than {100 * self.threshold:.0f}%: {', '.join(slower)}")
+        else:
+            self.report({'INFO'}, f"No step got slower by more than {100 * self.threshold:.0f}%")
+        return {'FINISHED'}
+
+
 class B4BGidRandomize(bpy.types.Operator):
     bl_description = r"""Generate a new random Group ID"""
     bl_idname = Operators.GID_RANDOMIZE.value[0]
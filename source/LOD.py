@@ -1,18 +1,34 @@
 import bpy
 import bmesh
+from math import radians
 from mathutils import Vector, Matrix
 from typing import List, Any
+from dataclasses import dataclass, field
 from .Config import LODZ_NAME
 from .Utils import b4b_collection, translate, clip, BAT4BlenderUserError
 from .Enums import Rotation, Zoom
 
 
+@dataclass
+class LODSlice:
+    r"""The part of the visible LOD inside a canvas tile, as triangles in world coordinates
+    with uv coordinates per vertex.
+    """
+    vertices: list[tuple[float, float, float]] = field(default_factory=list)
+    uvs: list[tuple[float, float]] = field(default_factory=list)
+    triangles: list[tuple[int, int, int]] = field(default_factory=list)
+
+
 class LOD:
     @staticmethod
     def fit_new(zoom: Zoom):
-        bb = LOD.get_all_bound_boxes()
-        min_max_xyz = LOD.get_min_max_xyz(bb)
-        LOD.create_and_update(zoom, min_max_xyz)
+        b4b = bpy.context.scene.b4b
+        if b4b.lod_fit_method == 'HULL':
+            LOD.fit_hull(zoom, triangle_budget=b4b.lod_triangle_budget[zoom.value])
+        else:
+            bb = LOD.get_all_bound_boxes()
+            min_max_xyz = LOD.get_min_max_xyz(bb)
+            LOD.create_and_update(zoom, min_max_xyz)
 
     @staticmethod
     def get_all_bound_boxes() -> List:
@@ -23,6 +39,23 @@ class LOD:
                 b_boxes.append(LOD.get_obj_bound_box(obj))
         return b_boxes
 
+    @staticmethod
+    def get_all_render_vertices() -> List[Vector]:
+        r"""Collect the world coordinates of all vertices of the evaluated
+        meshes that are visible in the rendering (same filter as for the bounding boxes).
+        """
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+        coords = []
+        for obj in bpy.context.scene.objects:
+            if obj.type == 'MESH' and (not obj.hide_render) and obj.visible_camera:
+                obj_eval = obj.evaluated_get(depsgraph)
+                mesh = obj_eval.to_mesh()
+                try:
+                    coords.extend(obj_eval.matrix_world @ v.co for v in mesh.vertices)
+                finally:
+                    obj_eval.to_mesh_clear()
+        return coords
+
     @staticmethod
     def get_obj_bound_box(obj):
         bbox_corners = [obj.matrix_world @ Vector(corner) for corner in obj.bound_box]
@@ -54,6 +87,52 @@ class LOD:
         min_x, max_x, min_y, max_y, min_z, max_z = LOD.get_min_max_xyz([b_box])
         return max_x - min_x, max_y - min_y, max_z - min_z
 
+    @staticmethod
+    def world_vertices(lod, region=None):
+        r"""The LOD vertices in world coordinates as NumPy array of shape (n, 3),
+        optionally of the LOD clipped to a region (see `clipped_mesh`).
+        """
+        import numpy as np
+        if region is not None:
+            bm = LOD._clipped_bmesh(lod, region)
+            try:
+                return np.array([tuple(lod.matrix_world @ v.co) for v in bm.verts], dtype=np.float64).reshape(-1, 3)
+            finally:
+                bm.free()
+        co = np.empty(len(lod.data.vertices) * 3, dtype=np.float32)
+        lod.data.vertices.foreach_get('co', co)
+        m = np.array(lod.matrix_world, dtype=np.float64)
+        return co.reshape(-1, 3).astype(np.float64) @ m[:3, :3].T + m[:3, 3]
+
+    @staticmethod
+    def world_triangles(lod):
+        r"""The LOD vertices in world coordinates and the vertex indices of its triangles, as NumPy arrays."""
+        import numpy as np
+        mesh = lod.data
+        mesh.calc_loop_triangles()
+        tris = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+        mesh.loop_triangles.foreach_get('vertices', tris)
+        return LOD.world_vertices(lod), tris.reshape(-1, 3).astype(np.int64)
+
+    @staticmethod
+    def version(lod) -> int:
+        r"""A fingerprint of the LOD geometry and transform that changes whenever the LOD is edited."""
+        return hash(LOD.geometry_bytes(lod))
+
+    @staticmethod
+    def geometry_bytes(lod) -> bytes:
+        r"""The raw vertex coordinates, loop indices and transform of the LOD, for
+        fingerprints that must be stable across Blender sessions (unlike `hash`).
+        """
+        import array
+        mesh = lod.data
+        coords = array.array('f', [0.0]) * (len(mesh.vertices) * 3)
+        mesh.vertices.foreach_get('co', coords)
+        indices = array.array('i', [0]) * len(mesh.loops)
+        mesh.loops.foreach_get('vertex_index', indices)
+        transform = array.array('d', [x for row in lod.matrix_world for x in row])
+        return coords.tobytes() + indices.tobytes() + transform.tobytes()
+
     @staticmethod
     def get_mesh_cube(zoom: Zoom) -> object:
         name = LODZ_NAME[zoom.value]
@@ -93,183 +172,255 @@ class LOD:
         bpy.context.view_layer.update()
 
     @staticmethod
-    def assign_material_name(lod_slice, name: str):
-        mat = bpy.data.materials.get(name)
-        if mat is None:
-            mat = bpy.data.materials.new(name=name)
-        if lod_slice.data.materials:
-            lod_slice.data.materials[0] = mat
-        else:
-            lod_slice.data.materials.append(mat)
-        return mat
+    def _triangle_count(bm: bmesh.types.BMesh) -> int:
+        return sum(len(f.verts) - 2 for f in bm.faces)
 
     @staticmethod
-    def export(lod_objects, filepath: str, rotation: Rotation):
-        r"""Export a list of sliced LOD objects as a single .obj file"""
-        if bpy.app.version >= (4, 2, 0):  # Blender 4.2+
-            # Exporting a selection of objects seems to be broken with this operator, so we define a temporary collection instead,
-            # see https://blender.stackexchange.com/questions/317191/exporting-object-with-bpy-ops-wm-obj-export
-            coll = bpy.data.collections.new('b4b_temp_lod_export')
-            try:
-                for ob in lod_objects:
-                    coll.objects.link(ob)
-                bpy.ops.wm.obj_export(
-                    filepath=filepath,
-                    check_existing=False,
-                    up_axis='Y',
-                    forward_axis=(
-                        'NEGATIVE_Z' if rotation == Rotation.SOUTH else
-                        'X' if rotation == Rotation.EAST else
-                        'Z' if rotation == Rotation.NORTH else
-                        'NEGATIVE_X'),
-                    export_materials=True,  # only needed for preserving the material name
-                    export_triangulated_mesh=True,
-                    collection=coll.name,
-                )
-            finally:
-                bpy.data.collections.remove(coll)
-
-        elif bpy.app.version < (4, 0, 0):  # Blender 3.6
-            with bpy.context.temp_override(selected_objects=lod_objects):
-                bpy.ops.export_scene.obj(
-                    filepath=filepath,
-                    check_existing=False,
-                    axis_up='Y',
-                    axis_forward=(
-                        '-Z' if rotation == Rotation.SOUTH else
-                        'X' if rotation == Rotation.EAST else
-                        'Z' if rotation == Rotation.NORTH else
-                        '-X'),  # WEST
-                    use_materials=True,  # only needed for preserving the material name
-                    use_triangles=True,
-                    use_selection=True,
-                )
+    def _cut_off_plane(bm: bmesh.types.BMesh, plane_co: Vector, plane_no: Vector, eps: float = 1e-4) -> bool:
+        r"""Cut off the part of the convex mesh in front of the plane and close
+        the hole with a new face. Returns False if nothing was cut off.
+        """
+        if all((v.co - plane_co).dot(plane_no) <= eps for v in bm.verts):
+            return False
+        result = bmesh.ops.bisect_plane(bm, geom=bm.verts[:] + bm.edges[:] + bm.faces[:], dist=eps,
+                                        plane_co=plane_co, plane_no=plane_no, clear_outer=True)
+        cut_edges = [e for e in result['geom_cut'] if isinstance(e, bmesh.types.BMEdge)]
+        if cut_edges:
+            bmesh.ops.contextual_create(bm, geom=cut_edges)
+        return True
 
-        else:
-            raise BAT4BlenderUserError(f"Unsupported Blender version ({bpy.app.version_string}). Install Blender 3.6 or 4.2+ instead.")
+    @staticmethod
+    def hull_bmesh(coords: List[Vector], triangle_budget: int) -> bmesh.types.BMesh:
+        r"""Create a simplified convex hull around the coordinates that uses at most
+        `triangle_budget` triangles (but at least the 12 triangles of a box).
+
+        If the exact convex hull exceeds the budget, we start from the bounding box
+        and successively cut it with the supporting planes of the largest hull faces.
+        As each of these planes bounds the hull, the result always encloses all
+        coordinates, so no part of the rendering is cropped.
+        """
+        hull = bmesh.new()
+        for co in coords:
+            hull.verts.new(co)
+        result = bmesh.ops.convex_hull(hull, input=hull.verts[:], use_existing_faces=False)
+        bmesh.ops.delete(hull, geom=[v for v in result['geom_interior'] + result['geom_unused'] if isinstance(v, bmesh.types.BMVert)], context='VERTS')
+        bmesh.ops.dissolve_limit(hull, angle_limit=radians(0.1), verts=hull.verts[:], edges=hull.edges[:])
+        if hull.faces and LOD._triangle_count(hull) <= triangle_budget:
+            bmesh.ops.recalc_face_normals(hull, faces=hull.faces[:])
+            return hull
+        planes = sorted(((f.calc_area(), f.calc_center_median(), f.normal.copy()) for f in hull.faces), key=lambda p: p[0], reverse=True)
+        hull.free()
+
+        min_x, max_x, min_y, max_y, min_z, max_z = LOD.get_min_max_xyz([coords])
+        bm = bmesh.new()
+        bmesh.ops.create_cube(bm, size=1.0)
+        bmesh.ops.transform(bm, verts=bm.verts[:],
+                            matrix=(Matrix.Translation(((min_x + max_x) / 2, (min_y + max_y) / 2, (min_z + max_z) / 2)) @
+                                    Matrix.Diagonal((max(max_x - min_x, 1e-3), max(max_y - min_y, 1e-3), max(max_z - min_z, 1e-3), 1.0))))
+        for _, co, no in planes:
+            candidate = bm.copy()
+            if not LOD._cut_off_plane(candidate, co, no):
+                candidate.free()
+                continue
+            if LOD._triangle_count(candidate) > triangle_budget:
+                candidate.free()  # try smaller faces instead, which might require fewer additional triangles
+                continue
+            bm.free()
+            bm = candidate
+        bmesh.ops.recalc_face_normals(bm, faces=bm.faces[:])
+        return bm
 
     @staticmethod
-    def _copy_bmesh_with_face_filter(mesh: bmesh.types.BMesh, name: str, face_filter) -> bpy.types.Mesh:
-        mesh.verts.index_update()  # important if vertices have been added that still have index -1
-
-        faces = [f for f in mesh.faces if face_filter(f)]
-        vertices = list(set(v for f in faces for v in f.verts))
-        vmap = {vert.index: i for i, vert in enumerate(vertices)}  # maps vertex indices of old mesh to new mesh (with fewer vertices)
-        coords = [v.co for v in vertices]
-        polys = [tuple(vmap[v.index] for v in f.verts) for f in faces]
-
-        mesh2 = bpy.data.meshes.new(name=name)
-        mesh2.from_pydata(coords, [], polys)
-        mesh2.update(calc_edges=True)
-        return mesh2
-
-    def copy_visible_faces(lod, cam) -> bpy.types.Object:
-        r"""Create a copy of the LOD containing only faces whose normals point towards the camera.
+    def fit_hull(zoom: Zoom, triangle_budget: int):
+        r"""Create the LOD as simplified convex hull of all rendered meshes,
+        which is tighter than the bounding box for non-box shaped buildings.
         """
-        cam_view_direction = cam.matrix_world @ Vector([0, 0, -1]) - cam.location
+        coords = LOD.get_all_render_vertices()
+        if not coords:
+            raise BAT4BlenderUserError("No visible mesh found to fit the LOD around.")
+        bm = LOD.hull_bmesh(coords, triangle_budget=triangle_budget)
+        name = LODZ_NAME[zoom.value]
+        mesh = bpy.data.meshes.new(name)
+        bm.to_mesh(mesh)
+        bm.free()
+        c = bpy.data.objects.new(name, mesh)
+        c.hide_render = True
+        c.display_type = 'WIRE'
+        b4b_collection().objects.link(c)
+        bpy.context.view_layer.update()
+        print(f"Fitted LOD for zoom {zoom.value+1} with {sum(len(p.vertices) - 2 for p in mesh.polygons)} triangles (budget {triangle_budget})")
+
+    @staticmethod
+    def _clipped_bmesh(lod, region) -> bmesh.types.BMesh:
+        r"""A bmesh of the LOD in object coordinates, clipped to the region (x_min, x_max, y_min, y_max)
+        in world coordinates, with the cut faces closed. The caller is responsible for freeing the bmesh.
+        """
+        x_min, x_max, y_min, y_max = region
         bm = bmesh.new()
-        bm.from_mesh(lod.data)
-        name = 'b4b_lod_visible'
-        lod_rotation = lod.matrix_world.to_3x3()  # ignore LOD translation
-        mesh = LOD._copy_bmesh_with_face_filter(bm, name, lambda f: (lod_rotation @ f.normal).dot(cam_view_direction) < 0)
-        obj = bpy.data.objects.new(name, mesh)
-        obj.location = lod.location
-        obj.scale = lod.scale
-        obj.rotation_euler = lod.rotation_euler
-        obj.hide_render = True
-        bpy.context.scene.collection.objects.link(obj)  # linked to scene collection instead of BAT4Blender collection as the latter might be invisible (which would break the subsequent slice operations)
-        return obj
+        try:
+            bm.from_mesh(lod.data)
+            bm.transform(lod.matrix_world)
+            for bound, co, no in [(x_min, Vector((x_min, 0, 0)), Vector((-1, 0, 0))),
+                                  (x_max, Vector((x_max, 0, 0)), Vector((1, 0, 0))),
+                                  (y_min, Vector((0, y_min, 0)), Vector((0, -1, 0))),
+                                  (y_max, Vector((0, y_max, 0)), Vector((0, 1, 0)))]:
+                if abs(bound) != float('inf'):
+                    LOD._cut_off_plane(bm, co, no)
+            bm.transform(lod.matrix_world.inverted())
+            bmesh.ops.recalc_face_normals(bm, faces=bm.faces[:])
+        except BaseException:
+            bm.free()
+            raise
+        return bm
+
+    @staticmethod
+    def clipped_mesh(lod, region) -> bpy.types.Mesh:
+        r"""Create a copy of the LOD mesh clipped to the region (x_min, x_max, y_min, y_max)
+        in world coordinates, with the cut faces closed, for the LOD of a sub-model.
+        """
+        bm = LOD._clipped_bmesh(lod, region)
+        try:
+            mesh = bpy.data.meshes.new(lod.data.name)
+            bm.to_mesh(mesh)
+        finally:
+            bm.free()
+        return mesh
+
+    @staticmethod
+    def slice_obj_mesh(lod_slice: 'LODSlice', name: str, material: str):
+        r"""The triangulated world-space geometry and uv coordinates of a LOD slice for OBJ export."""
+        from .core.ObjWriter import ObjMesh
+        return ObjMesh(
+            name=name,
+            material=material,
+            vertices=lod_slice.vertices,
+            uvs=lod_slice.uvs,
+            triangles=lod_slice.triangles,
+        )
+
+    @staticmethod
+    def export(obj_meshes, filepath: str, rotation: Rotation):
+        r"""Export a list of sliced LOD meshes as a single .obj file"""
+        from .core.ObjWriter import write_obj
+        write_obj(filepath, obj_meshes, rotation)
 
-    def _get_fixed_context_override():
-        # Workaround for "Context missing active object", see:
-        # https://blender.stackexchange.com/questions/14948/opening-a-blender-file-during-python-script-execution-without-changing-context
-        # This issue happens when switching .blend file using `bpy.ops.wm.open_mainfile` when scripting from within Blender, i.e. without `--background` mode.
-        for window in bpy.context.window_manager.windows:
-            screen = window.screen
-            for area in screen.areas:
-                if area.type == 'VIEW_3D':
-                    for region in area.regions:
-                        if region.type == 'WINDOW':
-                            override = {'window': window, 'screen': screen, 'area': area, 'region': region}
-                            return override
-        return {}
-
-    def sliced(lod, cam, canvas):
+    def _occluded_faces(bm: bmesh.types.BMesh, faces, lod, cam_matrix: Matrix, frame, canvas) -> set:
+        r"""Rasterize the faces in camera view at canvas resolution and return the
+        subset of faces that are completely hidden behind other faces.
+        """
+        from .core.Occlusion import occluded_triangles
+        to_cam = cam_matrix.inverted() @ lod.matrix_world
+        x_min, x_max, y_max, y_min = frame.top_l[0], frame.bot_r[0], frame.top_l[1], frame.bot_r[1]
+        bm.verts.index_update()
+        cam_coords = [to_cam @ v.co for v in bm.verts]
+        xy = [((c[0] - x_min) / (x_max - x_min) * canvas.width_px, (y_max - c[1]) / (y_max - y_min) * canvas.height_px) for c in cam_coords]
+        depth = [-c[2] for c in cam_coords]  # the camera looks along its negative z-axis
+        face_set = set(faces)
+        loop_triangles = [lt for lt in bm.calc_loop_triangles() if lt[0].face in face_set]
+        triangles = [[loop.vert.index for loop in lt] for lt in loop_triangles]
+        if not triangles:
+            return set()
+        eps = 1e-4 * max(1.0, max(depth) - min(depth))
+        occluded = occluded_triangles(xy, depth, triangles, width=canvas.width_px, height=canvas.height_px, eps=eps)
+        visible = {lt[0].face for lt, o in zip(loop_triangles, occluded) if not o}
+        return face_set - visible
+
+    def visible_faces_bmesh(lod, cam_matrix: Matrix, canvas=None, frame=None, region=None) -> bmesh.types.BMesh:
+        r"""Create a bmesh of the LOD in the coordinates of the camera with world matrix `cam_matrix`,
+        containing only faces whose normals point towards the camera.
+        If a canvas and its camera frame are given, faces that are completely
+        occluded by other faces of the LOD are removed as well.
+        If a region is given, the LOD is clipped to it first (see `clipped_mesh`).
+        The caller is responsible for freeing the bmesh.
+        """
+        cam_view_direction = cam_matrix.to_3x3() @ Vector([0, 0, -1])
+        if region is not None:
+            bm = LOD._clipped_bmesh(lod, region)
+        else:
+            bm = bmesh.new()
+            bm.from_mesh(lod.data)
+        try:
+            lod_rotation = lod.matrix_world.to_3x3()  # ignore LOD translation
+            front_faces = [f for f in bm.faces if (lod_rotation @ f.normal).dot(cam_view_direction) < 0]
+            if canvas is not None and frame is not None and bpy.context.scene.b4b.lod_occlusion_culling:
+                occluded = LOD._occluded_faces(bm, front_faces, lod, cam_matrix, frame, canvas)
+                if occluded:
+                    print(f"Occlusion culling removed {len(occluded)} of {len(front_faces)} front-facing LOD faces")
+            else:
+                occluded = set()
+            visible = set(front_faces) - occluded
+            bmesh.ops.delete(bm, geom=[f for f in bm.faces if f not in visible], context='FACES')
+            bm.transform(cam_matrix.inverted() @ lod.matrix_world)
+        except BaseException:
+            bm.free()
+            raise
+        return bm
+
+    def sliced(lod, cam, canvas) -> dict:
         r"""Slice up the visible part of the LOD along the canvas tile grid and
-        return a dictionary of the tile positions and the sliced LOD objects.
+        return a dictionary of the tile positions and the LOD slices.
+        The slicing operates on a bmesh in camera coordinates, so that it does
+        not create or modify any objects of the scene.
+        """
+        bpy.context.view_layer.update()  # this is important to get up-to-date world matrices, as the camera was just positioned
+        return LOD.sliced_in_view(lod, cam.matrix_world.copy(), canvas, canvas.grid(cam))
+
+    def sliced_in_view(lod, cam_matrix: Matrix, canvas, canvas_grid, region=None) -> dict:
+        r"""Like `sliced`, but for a camera with world matrix `cam_matrix` and the tile grid
+        of its frame, so that the slices of a view can be predicted without moving the camera.
+        If a region is given, the LOD is clipped to it first, as for a sub-model.
         """
-        from .Canvas import Canvas
-        canvas_grid = canvas.grid(cam)
-
-        bpy.context.view_layer.update()  # this is important to get up-to-date local coordinates, as tiles were just created/cam was just positioned
-        lod_visible = LOD.copy_visible_faces(lod, cam)  # as the knife_project modifies this object, we create it anew for each tile
-        lod_visible.parent = cam  # for local coordinates (to find vertices inside tile boundary)
-        lod_visible.matrix_parent_inverse = cam.matrix_world.inverted()  # TODO or .matrix_local?
-
-        with bpy.context.temp_override(**LOD._get_fixed_context_override()):
-            if bpy.context.mode != 'OBJECT':
-                bpy.ops.object.mode_set(mode='OBJECT')
-            bpy.ops.object.select_all(action='DESELECT')
-            bpy.context.view_layer.objects.active = lod_visible
-
-            # apply bisect operator along grid (multiple times)
-            bpy.ops.object.mode_set(mode='EDIT')
+        bm = LOD.visible_faces_bmesh(lod, cam_matrix, canvas=canvas, frame=canvas_grid.frame, region=region)
+        try:
             for no, coords in [(Vector([1, 0, 0]), canvas_grid.column_coords),
                                (Vector([0, 1, 0]), canvas_grid.row_coords)]:
                 for co in coords[1:-1]:
-                    bpy.ops.mesh.select_all(action='SELECT')
-                    plane_co = cam.matrix_world @ co - cam.location
-                    plane_no = cam.matrix_world @ no - cam.location
-                    bpy.ops.mesh.bisect(plane_co=plane_co, plane_no=plane_no)
-            bpy.ops.mesh.select_all(action='DESELECT')
-            bpy.ops.object.mode_set(mode='OBJECT')
-
-        bm = bmesh.new()
-        bm.from_mesh(lod_visible.data)
+                    bmesh.ops.bisect_plane(bm, geom=bm.verts[:] + bm.edges[:] + bm.faces[:], dist=1e-4, plane_co=co, plane_no=no)
 
-        def create_slice_obj(row: int, col: int):
-            name = 'b4b_lod_slice'
             # As some or all vertices of a face could lie on the grid, to avoid
             # numerical issues, we check whether the center of the polygon is
             # inside the canvas tile.
-            slice_mesh = LOD._copy_bmesh_with_face_filter(
-                    bm, name,
-                    lambda f: canvas_grid.is_point_in_tile(Canvas._mean([lod_visible.matrix_local @ v.co for v in f.verts]), row=row, col=col))
-
-            slice_obj = bpy.data.objects.new(name, slice_mesh)
-            slice_obj.location = lod_visible.location
-            slice_obj.scale = lod_visible.scale
-            slice_obj.rotation_euler = lod_visible.rotation_euler
-            slice_obj.hide_render = True
-            slice_obj.parent = cam
-            slice_obj.matrix_parent_inverse = cam.matrix_world.inverted()  # TODO or .matrix_local?
-            b4b_collection().objects.link(slice_obj)
-            bpy.context.view_layer.update()  # important so that computation of uv-map sees current coordinates
-
-            # set uv coordinates
-            uv_map = LOD._compute_uv_of_lod_slice(slice_obj, *canvas_grid.frame.tile_border_absolute_LRTB(canvas, row=row, col=col))
-            uv_layer = slice_obj.data.uv_layers.new(name='UVmap')
-            for polygon in slice_obj.data.polygons:
-                for loopindex in polygon.loop_indices:  # loopindex corresponds to a "face vertex"
-                    meshloop = slice_obj.data.loops[loopindex]
-                    meshuvloop = uv_layer.data[loopindex]
-                    meshuvloop.uv.xy = uv_map[meshloop.vertex_index]
-
-            return slice_obj
-
-        slice_objs = {pos: create_slice_obj(*pos) for pos in canvas.tiles()}
-        bm.free()
-        bpy.data.meshes.remove(lod_visible.data, do_unlink=True)
-        return slice_objs
+            face_tiles = {}
+            for f in bm.faces:
+                pos = canvas_grid.tile_of_point(f.calc_center_median())
+                if pos is not None:
+                    face_tiles[f] = pos
 
-    def _compute_uv_of_lod_slice(lod_slice, x_min: float, x_max: float, y_max: float, y_min: float):
+            to_world = cam_matrix
+            slices = {pos: LODSlice() for pos in canvas.tiles()}
+            vertex_maps = {pos: {} for pos in slices}  # maps vertex indices of the bmesh to the vertices of each slice
+            bm.verts.index_update()
+            for loop_triangle in bm.calc_loop_triangles():
+                pos = face_tiles.get(loop_triangle[0].face)
+                if pos is None:
+                    continue  # outside of the canvas
+                lod_slice, vertex_map = slices[pos], vertex_maps[pos]
+                triangle = []
+                for loop in loop_triangle:
+                    i = vertex_map.get(loop.vert.index)
+                    if i is None:
+                        i = vertex_map[loop.vert.index] = len(lod_slice.vertices)
+                        x_min, x_max, y_max, y_min = canvas_grid.frame.tile_border_absolute_LRTB(canvas, *pos)
+                        co = loop.vert.co  # in camera coordinates, so the first two coordinates correspond to u,v (up to stretching)
+                        lod_slice.vertices.append(tuple(to_world @ co))
+                        lod_slice.uvs.append((clip(translate(co[0], x_min, x_max, 0.0, 1.0), 0, 1),
+                                              clip(translate(co[1], y_min, y_max, 0.0, 1.0), 0, 1)))
+                    triangle.append(i)
+                lod_slice.triangles.append(tuple(triangle))
+            return slices
+        finally:
+            bm.free()
 
-        def vert2uv(vert):
-            # the local coordinates are relative to the parent (canvas_tile),
-            # so first two coordinates correspond to u,v (up to stretching)
-            c = lod_slice.matrix_local @ vert.co
-            return (clip(translate(c[0], x_min, x_max, 0.0, 1.0), 0, 1),
-                    clip(translate(c[1], y_min, y_max, 0.0, 1.0), 0, 1))
-
-        uv_map = {v.index: vert2uv(v) for v in lod_slice.data.vertices}
-        return uv_map
+    @staticmethod
+    def link_slice(lod_slice: 'LODSlice', name: str) -> bpy.types.Object:
+        r"""Create an object of a LOD slice in the BAT4Blender collection, for inspecting the slices."""
+        mesh = bpy.data.meshes.new(name)
+        mesh.from_pydata(lod_slice.vertices, [], lod_slice.triangles)
+        mesh.update(calc_edges=True)
+        uv_layer = mesh.uv_layers.new(name='UVmap')
+        for loop in mesh.loops:
+            uv_layer.data[loop.index].uv = lod_slice.uvs[loop.vertex_index]
+        obj = bpy.data.objects.new(name, mesh)
+        obj.hide_render = True
+        b4b_collection().objects.link(obj)
+        return obj
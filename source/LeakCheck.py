@@ -0,0 +1,71 @@
+r"""Detection of datablocks and Python memory left behind by the render steps.
+
+Before and after each step, the sizes of the `bpy.data` collections and a
+`tracemalloc` snapshot are recorded. Datablocks that were created during a step
+and still exist after it are reported, except for the persistent BAT4Blender
+rig (LODs, camera, sun, world, compositing) and Blender's own render result.
+"""
+import bpy
+from .Config import LODZ_NAME, SUN_NAME, CAM_NAME, WORLD_NAME, COMPOSITING_NAME, COMPOSITING_NODETREE_NAME, COLLECTION_NAME
+
+_DATA_COLLECTIONS = ('objects', 'meshes', 'materials', 'images', 'collections', 'cameras', 'lights',
+                     'node_groups', 'textures', 'worlds', 'libraries')
+_PERSISTENT_NAMES = {*LODZ_NAME, SUN_NAME, CAM_NAME, WORLD_NAME, COMPOSITING_NAME, COMPOSITING_NODETREE_NAME, COLLECTION_NAME,
+                     'Render Result', 'Viewer Node'}
+_MEMORY_GROWTH_THRESHOLD = 256 * 1024  # bytes per source line that are reported as Python memory growth
+
+
+def _is_persistent(name: str) -> bool:
+    return name in _PERSISTENT_NAMES or name.split('.')[0] in _PERSISTENT_NAMES
+
+
+def _datablocks() -> dict:
+    return {attr: {id_.name_full for id_ in getattr(bpy.data, attr)} for attr in _DATA_COLLECTIONS if hasattr(bpy.data, attr)}
+
+
+class LeakCheck:
+    def __init__(self):
+        import tracemalloc
+        self._owns_tracing = not tracemalloc.is_tracing()
+        if self._owns_tracing:
+            tracemalloc.start()
+        self._before = None
+        self._memory_before = None
+        self.leaks = []  # messages of all steps
+
+    def begin_step(self):
+        import tracemalloc
+        self._before = _datablocks()
+        self._memory_before = tracemalloc.take_snapshot()
+
+    def end_step(self, label: str) -> list[str]:
+        r"""Compare the current state with the one at the beginning of the step and return the leaks found."""
+        import os
+        import tracemalloc
+        if self._before is None:
+            return []
+        after = _datablocks()
+        leaks = []
+        for attr, names in after.items():
+            new = sorted(n for n in names - self._before.get(attr, set()) if not _is_persistent(n))
+            if new:
+                leaks.append(f"{label}: {len(new)} {attr} left behind ({len(self._before.get(attr, ()))} → {len(names)}): {', '.join(new[:10])}"
+                             + (", …" if len(new) > 10 else ""))
+        package_dir = os.path.dirname(__file__)
+        stats = tracemalloc.take_snapshot().compare_to(self._memory_before, 'lineno')
+        for stat in stats:
+            frame = stat.traceback[0]
+            if stat.size_diff >= _MEMORY_GROWTH_THRESHOLD and frame.filename.startswith(package_dir):
+                leaks.append(f"{label}: Python memory grew by {stat.size_diff / 1024:.0f} KiB at {os.path.basename(frame.filename)}:{frame.lineno}")
+        self._before = None
+        self._memory_before = None
+        for msg in leaks:
+            print(f"Leak check: {msg}")
+        self.leaks.extend(leaks)
+        return leaks
+
+    def stop(self):
+        import tracemalloc
+        if self._owns_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        print(f"Leak check: {len(self.leaks)} leaks found" if self.leaks else "Leak check: no leaks found")
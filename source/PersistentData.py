@@ -0,0 +1,83 @@
+r"""Cycles Persistent Data for the render loop, with a check that it is effective.
+
+With Persistent Data, Cycles keeps its scene data and BVH between renderings,
+unless the geometry changes. Within a nightmode, the render steps only move the
+camera, so the BVH should be reused. Whether Cycles actually builds a BVH is
+detected from its "Building BVH" status message during each rendering. The
+geometry updates recorded by the depsgraph before a rendering name the objects
+that likely caused a rebuild.
+"""
+import bpy
+
+
+class PersistentData:
+    def __init__(self, context, ignore_renderings=lambda: False):
+        r"""Renderings for which `ignore_renderings()` is true, such as sample
+        pre-passes, are not attributed to the steps.
+        """
+        self._scene = context.scene
+        self._original = context.scene.render.use_persistent_data
+        context.scene.render.use_persistent_data = True
+        self._updated = set()  # names of the objects with geometry updates since the previous rendering
+        self._nightmode = None  # of the previous rendering
+        self._pending = None  # (label, names of updated objects) of the previous rendering if it should have reused the BVH
+        self._bvh_built = False  # whether Cycles reported building a BVH since the previous rendering started
+        self._ignore_renderings = ignore_renderings
+        self.reused = 0
+        self.rebuilt = []  # messages of the renderings for which the BVH was rebuilt
+        self._handler = self._depsgraph_update_post
+        self._stats_handler = self._render_stats
+        bpy.app.handlers.depsgraph_update_post.append(self._handler)
+        bpy.app.handlers.render_stats.append(self._stats_handler)
+
+    def _depsgraph_update_post(self, scene, depsgraph):
+        for update in depsgraph.updates:
+            id_ = update.id
+            if not update.is_updated_geometry or not isinstance(id_, bpy.types.Object):
+                continue
+            if id_.type == 'CAMERA' or id_.hide_render:
+                continue  # camera changes and hidden objects such as the LODs do not affect the BVH
+            self._updated.add(id_.name)
+
+    def _render_stats(self, stats: str):
+        if self._ignore_renderings():
+            return
+        if "Building BVH" in stats:  # status of Cycles while building the BVH of geometry, e.g. "Updating Geometry BVH Cube | Building BVH 1/3"
+            self._bvh_built = True
+
+    def _conclude(self):
+        r"""Evaluate the status messages of the previous rendering."""
+        if self._pending is None:
+            return
+        label, names = self._pending
+        self._pending = None
+        if not self._bvh_built:
+            self.reused += 1
+            return
+        if names:
+            msg = f"{label}: BVH rebuilt, likely as the geometry of {', '.join(names[:10])}{', …' if len(names) > 10 else ''} changed"
+        else:
+            msg = f"{label}: BVH rebuilt, although no geometry updates were recorded"
+        print(f"Persistent data: {msg}")
+        self.rebuilt.append(msg)
+
+    def before_render(self, context, label: str, nightmode):
+        r"""Check the previous rendering and record the updates since then, before rendering the step."""
+        self._conclude()
+        context.view_layer.update()  # evaluate pending changes, so that they are passed to the handler
+        if nightmode == self._nightmode:
+            self._pending = (label, sorted(self._updated))
+        self._updated.clear()
+        self._bvh_built = False
+        self._nightmode = nightmode
+
+    def stop(self):
+        self._conclude()
+        if self._handler in bpy.app.handlers.depsgraph_update_post:
+            bpy.app.handlers.depsgraph_update_post.remove(self._handler)
+        if self._stats_handler in bpy.app.handlers.render_stats:
+            bpy.app.handlers.render_stats.remove(self._stats_handler)
+        self._scene.render.use_persistent_data = self._original
+        total = self.reused + len(self.rebuilt)
+        if total:
+            print(f"Persistent data: BVH reused for {self.reused} of {total} renderings within a nightmode")
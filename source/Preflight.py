@@ -0,0 +1,195 @@
+r"""Validation of a render job before the first step.
+
+Problems that would otherwise only surface during the rendering, possibly after
+hours (render settings, LODs, slice limits, compositing, external tools, disk
+space and write permissions), are collected and reported together.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import bpy
+from .Config import COMPOSITING_NAME
+from .Enums import NightMode
+from .Utils import get_relative_path_for, scratch_folder, BAT4BlenderUserError
+
+_TOOL_TIMEOUT = 30  # seconds
+_TILE_BYTES = 256 * 256 * 4  # upper bound of an RGBA tile written as PNG
+_SC4MODEL_BYTES_PER_PX = 0.5  # DXT1
+
+
+def check_render_settings(context) -> list[str]:
+    render = context.scene.render
+    problems = []
+    if render.resolution_percentage != 100:
+        problems.append(f"Unsupported resolution scaling: {render.resolution_percentage}%. Go to the Output tab and set it to 100%.")
+    if render.pixel_aspect_x != 1 or render.pixel_aspect_y != 1:
+        problems.append(f"Unsupported pixel aspect: {render.pixel_aspect_x:g}:{render.pixel_aspect_y:g}. Go to the Output tab and set it to 1:1.")
+    gid = context.scene.b4b.group_id
+    try:
+        valid_gid = len(gid) <= 8 and int(gid, 16) >= 0
+    except ValueError:
+        valid_gid = False
+    if not valid_gid and gid not in ["default", ""]:  # an unset Group ID is reported by the render plan
+        problems.append(f"Invalid Group ID {gid!r}: expected up to 8 hexadecimal digits.")
+    return problems
+
+
+def check_plan(plan) -> list[str]:
+    r"""Missing or empty LODs and views exceeding the instance ID space."""
+    problems = plan.errors()
+    for s in plan.steps:
+        if not s.errors and not s.tiles_nonempty:
+            problems.append(f"{s.label()}: the LOD is empty or not visible, so there is nothing to render")
+    return problems
+
+
+def _compositing_tree(scene):
+    if bpy.app.version >= (5, 0, 0):  # Blender 5.0+
+        return scene.compositing_node_group
+    return scene.node_tree if scene.use_nodes else None
+
+
+def check_compositing(context) -> list[str]:
+    r"""The lightgroup of the World that the BAT4Blender compositing setup depends on."""
+    tree = _compositing_tree(context.scene)
+    if tree is None:
+        return []
+    for node in tree.nodes:
+        if isinstance(node, bpy.types.CompositorNodeGroup) and node.node_tree is not None and node.node_tree.name.startswith(COMPOSITING_NAME):
+            env_light = node.inputs.get('Combined_env_light')
+            if env_light is not None and env_light.is_linked:
+                world = context.scene.world
+                if world is None or world.lightgroup != 'env_light':
+                    return ["World lacks lightgroup 'env_light'. Make sure to load World first."]
+                if 'env_light' not in context.view_layer.lightgroups:
+                    return ["View layer lacks lightgroup 'env_light'. Load the Compositing setup again."]
+    return []
+
+
+def _tool_version(args: list[str]) -> tuple[str | None, str | None]:
+    r"""Run a tool to query its version and return (first line of output, error message)."""
+    try:
+        result = subprocess.run(args, capture_output=True, timeout=_TOOL_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as err:
+        return None, f"{type(err).__name__} {err}"
+    output = (result.stdout or result.stderr).decode(errors='replace').strip()
+    return (output.splitlines()[0] if output else ""), (None if result.returncode == 0 else f"exit code {result.returncode}")
+
+
+def check_tools(context, plan, supersampling: dict) -> list[str]:
+    r"""ImageMagick if any zoom is super-sampled, and fshgen if Post-Processing is enabled."""
+    b4b = context.scene.b4b
+    prefs = context.preferences.addons[__package__].preferences
+    problems = []
+    zooms = set(s.zoom for s in plan.steps)
+    if not b4b.export_lods_only and any(supersampling[z].enabled for z in zooms):
+        magick_exe = prefs.imagemagick_path or "magick"
+        version, err = _tool_version([magick_exe, "-version"])
+        if err is not None:
+            problems.append(f"""Failed to execute ImageMagick "{magick_exe}". Make sure ImageMagick is installed and configured under BAT4Blender Super-Sampling, or disable Super-Sampling. ({err})""")
+        elif "ImageMagick 7" not in version:
+            problems.append(f"""ImageMagick 7 or later is required for Super-Sampling, but "{magick_exe}" is: {version}""")
+        else:
+            print(f"Pre-flight: {version}")
+    if b4b.postproc_enabled:
+        fshgen_script = prefs.fshgen_path or "fshgen"
+        version, err = _tool_version([fshgen_script, "--version"])
+        if version is None:
+            problems.append(f"""Failed to execute "fshgen" ("{fshgen_script}"). Make sure "fshgen" is installed and configured under BAT4Blender Post-Processing, or disable Post-Processing. ({err})""")
+        else:
+            print(f"Pre-flight: fshgen {version or '(unknown version)'}")
+    return problems
+
+
+def estimated_bytes(context, plan) -> tuple[int, int]:
+    r"""Upper bounds of the disk space needed for the outputs and for the intermediate files."""
+    b4b = context.scene.b4b
+    outputs = 0
+    scratch = 0
+    for s in plan.steps:
+        tiles = sum(1 for p in s.output_paths if p.endswith(".png"))
+        outputs += tiles * _TILE_BYTES
+        if b4b.postproc_enabled:
+            outputs += int(tiles * 256 * 256 * _SC4MODEL_BYTES_PER_PX)
+        if s.nightmode == NightMode.DAY:
+            outputs += 1 << 20  # LOD export
+        scratch = max(scratch, s.rendered_pixels * 4 * 2 + tiles * _TILE_BYTES)  # full rendering, its down-sampled copy and the tiles of the step
+    return outputs, scratch
+
+
+def _is_writable(folder: str) -> bool:
+    try:
+        with tempfile.TemporaryFile(dir=folder):
+            pass
+        return True
+    except OSError:
+        return False
+
+
+def check_disk(context, plan) -> list[str]:
+    r"""Write permissions and free space in the output and scratch folders."""
+    problems = []
+    output_folder = os.path.dirname(get_relative_path_for("x")) or os.getcwd()
+    scratch = scratch_folder(context.scene.b4b.group_id)
+    scratch_root = os.path.dirname(scratch) or os.getcwd()
+    outputs_bytes, scratch_bytes = estimated_bytes(context, plan)
+    needed = {}  # maps device to (folder, bytes)
+    for folder, label, size in [(output_folder, "Output folder", outputs_bytes), (scratch_root, "Scratch folder", scratch_bytes)]:
+        if not os.path.isdir(folder):
+            problems.append(f"{label} {folder!r} does not exist.")
+            continue
+        if not _is_writable(folder):
+            problems.append(f"{label} {folder!r} is not writable.")
+            continue
+        device = os.stat(folder).st_dev
+        prev_folder, prev_size = needed.get(device, (folder, 0))
+        needed[device] = (prev_folder, prev_size + size)
+    for folder, size in needed.values():
+        free = shutil.disk_usage(folder).free
+        print(f"Pre-flight: about {size / 2**20:.0f} MiB needed on the disk of {folder!r}, {free / 2**20:.0f} MiB free")
+        if size > free:
+            problems.append(f"Not enough free disk space in {folder!r}: about {size / 2**20:.0f} MiB needed, but only {free / 2**20:.0f} MiB free.")
+    return problems
+
+
+def problems(context, plan, supersampling: dict) -> list[str]:
+    r"""Collect all problems of the render job described by the render plan,
+    where `supersampling` maps each zoom to its `SuperSampling` settings.
+    """
+    found = check_render_settings(context) + check_plan(plan) + check_disk(context, plan)
+    if not context.scene.b4b.export_lods_only:
+        found += check_compositing(context)
+    found += check_tools(context, plan, supersampling)
+    return found
+
+
+def _fail_or_pass(found: list[str]):
+    if found:
+        raise BAT4BlenderUserError(f"Pre-flight check found {len(found)} problem{'s' if len(found) > 1 else ''}:\n" + "\n".join(f"- {p}" for p in found))
+    print("Pre-flight check passed")
+
+
+def run(context, plan, supersampling: dict):
+    r"""Fail with a single report of all problems, before anything is rendered."""
+    _fail_or_pass(problems(context, plan, supersampling))
+
+
+def run_submodels(problems_of_submodels: list[list[str]], report_only: bool = False):
+    r"""Fail with a single report of the problems of all sub-models of a split
+    model, before the first sub-model is rendered. Problems shared by all
+    sub-models, such as missing tools, are only listed once.
+    With `report_only`, the problems are only printed (for dry runs).
+    """
+    found = {}  # maps problem to indices of the sub-models
+    for index, problems_of_submodel in enumerate(problems_of_submodels):
+        for p in problems_of_submodel:
+            found.setdefault(p, []).append(index)
+    count = len(problems_of_submodels)
+    found = [p if len(indices) == count else f"Sub-model{'s' if len(indices) > 1 else ''} {', '.join(map(str, indices))}: {p}"
+             for p, indices in found.items()]
+    if report_only:
+        for p in found:
+            print(f"Pre-flight problem: {p}")
+    else:
+        _fail_or_pass(found)
@@ -0,0 +1,117 @@
+r"""Named timing spans for the phases of the render pipeline.
+
+Profiling is off unless a session is started, in which case `span` returns a
+shared no-op context manager, so the instrumented code paths only pay for a
+global lookup and a function call.
+"""
+import time
+
+_session = None  # the active `Session`, or None if profiling is disabled
+
+
+class Session:
+    def __init__(self, cprofile_dir: str | None = None):
+        self.start = time.perf_counter()
+        self.totals = {}  # maps span name to (count, total seconds)
+        self.cprofile_dir = cprofile_dir  # if set, each step is profiled with cProfile and dumped into this folder
+        self.profile_files = []
+        self._step_label = None
+        self._profile = None
+
+    def record(self, name: str, duration: float):
+        count, total = self.totals.get(name, (0, 0.0))
+        self.totals[name] = (count + 1, total + duration)
+
+    def begin_step(self, label: str):
+        self.end_step()
+        self._step_label = label
+        if self.cprofile_dir is not None:
+            import cProfile
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def end_step(self):
+        if self._profile is not None:
+            from pathlib import Path
+            self._profile.disable()
+            path = Path(self.cprofile_dir) / f"b4b_step{len(self.profile_files)+1:02}_{self._step_label.replace(' ', '_')}.prof"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._profile.dump_stats(str(path))
+            self.profile_files.append(str(path))
+            self._profile = None
+
+    def summary(self) -> str:
+        wall = time.perf_counter() - self.start
+        lines = [f"{'Phase':<28} {'Count':>6} {'Total [s]':>10} {'Mean [ms]':>10} {'Share':>7}"]
+        for name, (count, total) in sorted(self.totals.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name:<28} {count:>6} {total:>10.3f} {1000 * total / count:>10.1f} {100 * total / wall:>6.1f}%")
+        lines.append(f"{'Wall time':<28} {'':>6} {wall:>10.3f}")
+        if self.profile_files:
+            lines.append(f"cProfile output of {len(self.profile_files)} steps: {self.cprofile_dir}")
+        return "\n".join(lines)
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if _session is not None:
+            _session.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str):
+    r"""Time the enclosed block under the given name, if profiling is enabled."""
+    return _NULL_SPAN if _session is None else _Span(name)
+
+
+def record(name: str, duration: float):
+    r"""Record a duration that was measured across several calls, such as a non-blocking rendering."""
+    if _session is not None:
+        _session.record(name, duration)
+
+
+def enabled() -> bool:
+    return _session is not None
+
+
+def start(cprofile_dir: str | None = None):
+    global _session
+    _session = Session(cprofile_dir=cprofile_dir)
+
+
+def begin_step(label: str):
+    if _session is not None:
+        _session.begin_step(label)
+
+
+def stop(print_summary: bool = True) -> Session | None:
+    r"""End the profiling session and print the summary table of all spans."""
+    global _session
+    session, _session = _session, None
+    if session is not None:
+        session.end_step()
+        if print_summary:
+            print("Profiling summary:")
+            print(session.summary())
+    return session
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field, asdict
+from .Config import LODZ_NAME
+from .Enums import Zoom, Rotation, NightMode
+from .Utils import tgi_formatter, get_relative_path_for, instance_id, b4b_collection, find_object
+
+
+@dataclass
+class PlanStep:
+    r"""The predicted outcome of rendering a single view."""
+    zoom: Zoom
+    rotation: Rotation
+    nightmode: NightMode
+    width_px: int
+    height_px: int
+    num_columns: int
+    num_rows: int
+    tiles_nonempty: list[tuple[int, int]]
+    instance_ids: list[int]
+    output_paths: list[str]
+    rendered_pixels: int  # including super-sampling
+    cost: float  # estimated number of pixel samples
+    errors: list[str] = field(default_factory=list)
+
+    def label(self) -> str:
+        return f"Zoom {self.zoom.value+1} {self.rotation.compass_name()} {self.nightmode.label()}"
+
+    def to_json(self) -> dict:
+        d = asdict(self)
+        d.update(zoom=self.zoom.value + 1, rotation=self.rotation.compass_name(), nightmode=self.nightmode.label(),
+                 tiles_nonempty=[list(t) for t in self.tiles_nonempty],
+                 instance_ids=[f"0x{iid:08x}" for iid in self.instance_ids])
+        return d
+
+
+@dataclass
+class RenderPlan:
+    r"""All steps of a render job with their canvas sizes, tiles and output files, computed before rendering."""
+    steps: list[PlanStep]
+    general_errors: list[str] = field(default_factory=list)  # problems of the job that do not belong to a single step
+
+    @staticmethod
+    def build(context, steps: list[tuple[Zoom, Rotation, NightMode]], supersampling_factors: dict[Zoom, float] | None = None,
+              region: tuple[float, float, float, float] | None = None) -> RenderPlan:
+        r"""Predict the render steps from the LODs, using the same camera
+        solution as the renderer. The non-empty tiles are those that receive
+        LOD slices when slicing the LOD like the renderer, but in the frame of
+        the computed camera placement, so the camera is not moved.
+        The scene is not modified: missing LODs and a missing Group ID are reported as errors.
+        If a region is given, the plan is that of the sub-model with the LODs clipped to the region.
+        """
+        from .Camera import Camera
+        from .Canvas import Canvas, CanvasFrame
+        from .LOD import LOD
+        from .Renderer import _SLOP
+        gid = context.scene.b4b.group_id
+        hd = context.scene.b4b.hd == 'HD'
+        coll = b4b_collection()
+        lods = {z: find_object(coll, LODZ_NAME[z.value]) for z in set(z for z, _, _ in steps)}
+        lods = {z: lod for z, lod in lods.items() if lod is not None}
+        vertices = {z: LOD.world_vertices(lod, region) for z, lod in lods.items()}
+        empty = {z for z, verts in vertices.items() if not len(verts)}  # LODs outside of the region of a sub-model
+        lods = {z: lod for z, lod in lods.items() if z not in empty}
+        solutions = Camera.solve_views({z: vertices[z] for z in lods}, hd=hd, margin=_SLOP) if lods else {}
+        samples = context.scene.cycles.samples if context.scene.render.engine == 'CYCLES' else 1
+        general_errors = []
+        if gid in ["default", "", None]:
+            general_errors.append("The Group ID is not set yet (the rendering generates a random one), so the output file names are not final")
+        view_tiles = {}  # non-empty tiles of each view, which are the same for all nightmodes
+
+        plan_steps = []
+        for z, v, nightmode in steps:
+            if z not in lods:
+                error = (f"LOD {LODZ_NAME[z.value]} is empty in this sub-model" if z in empty else
+                         f"LOD {LODZ_NAME[z.value]} is missing (the rendering fits missing LODs automatically)")
+                plan_steps.append(PlanStep(z, v, nightmode, 0, 0, 0, 0, [], [], [], 0, 0.0, errors=[error]))
+                continue
+            solution = solutions[(z, v)]
+            canvas = Canvas(width_px=solution.width_px, height_px=solution.height_px)
+            factor = supersampling_factors.get(z, 1) if supersampling_factors is not None else 1
+            if (z, v) not in view_tiles:
+                frame = CanvasFrame.of_solution(solution, round(canvas.width_px * factor), round(canvas.height_px * factor))  # at the render resolution
+                slices = LOD.sliced_in_view(lods[z], Camera.matrix_of(solution), canvas, canvas.grid(frame=frame), region=region)
+                view_tiles[(z, v)] = [pos for pos in canvas.tiles() if slices[pos].triangles]
+            tiles_nonempty = view_tiles[(z, v)]
+
+            errors = []
+            is_night = nightmode != NightMode.DAY
+            if len(tiles_nonempty) >= 1 << 10:
+                errors.append(f"{len(tiles_nonempty)} slices exceed the instance ID space of 1024 slices per view (large models are split into sub-models, see Sub-Model Grid)")
+                instance_ids = []
+            else:
+                instance_ids = [instance_id(z.value, v.value, count, is_night=is_night) for count in range(len(tiles_nonempty))]
+            output_paths = []
+            if not is_night:
+                output_paths.append(get_relative_path_for(f"{tgi_formatter(gid, z.value, v.value, 0, is_model=True)}.obj"))
+            if not context.scene.b4b.export_lods_only:
+                output_paths.extend(get_relative_path_for(f"{tgi_formatter(gid, z.value, v.value, count, is_night=is_night)}_{nightmode.label()}.png")
+                                    for count in range(len(instance_ids)))
+            rendered_pixels = 0 if context.scene.b4b.export_lods_only else round(canvas.width_px * factor) * round(canvas.height_px * factor)
+            plan_steps.append(PlanStep(
+                zoom=z, rotation=v, nightmode=nightmode,
+                width_px=canvas.width_px, height_px=canvas.height_px,
+                num_columns=canvas.num_columns, num_rows=canvas.num_rows,
+                tiles_nonempty=tiles_nonempty,
+                instance_ids=instance_ids,
+                output_paths=output_paths,
+                rendered_pixels=rendered_pixels,
+                cost=float(rendered_pixels * samples),
+                errors=errors,
+            ))
+        return RenderPlan(steps=plan_steps, general_errors=general_errors)
+
+    def errors(self) -> list[str]:
+        return self.general_errors + [f"{s.label()}: {e}" for s in self.steps for e in s.errors]
+
+    def ordered(self, order: str) -> RenderPlan:
+        r"""Reorder the steps within each nightmode, as the night steps reuse the LOD slices of the day steps."""
+        if order == 'LARGEST_FIRST':
+            nightmodes = list(dict.fromkeys(s.nightmode for s in self.steps))
+            return RenderPlan(steps=sorted(self.steps, key=lambda s: (nightmodes.index(s.nightmode), -s.cost)), general_errors=self.general_errors)
+        return self
+
+    def to_json(self) -> dict:
+        return {
+            'steps': [s.to_json() for s in self.steps],
+            'total_rendered_pixels': sum(s.rendered_pixels for s in self.steps),
+            'total_slices': sum(len(s.tiles_nonempty) for s in self.steps),
+            'total_output_files': sum(len(s.output_paths) for s in self.steps),
+            'total_cost': sum(s.cost for s in self.steps),
+            'errors': self.errors(),
+        }
+
+    def export_json(self, filepath: str):
+        import json
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(self.to_json(), f, indent=2)
+        print(f"Exported render plan: {filepath}")
+
+    def print_report(self):
+        print(f"Render plan ({len(self.steps)} steps):")
+        for e in self.general_errors:
+            print(f"  ERROR: {e}")
+        for s in self.steps:
+            print(f"  {s.label():<16} {s.width_px:>5}×{s.height_px:<5} {s.num_columns}×{s.num_rows} tiles, "
+                  f"{len(s.tiles_nonempty):>4} non-empty, {len(s.output_paths):>4} files, {s.rendered_pixels:>10} px, cost {s.cost:.3g}"
+                  + "".join(f"\n    ERROR: {e}" for e in s.errors))
+        totals = self.to_json()
+        print(f"  Total: {totals['total_slices']} slices, {totals['total_output_files']} files, "
+              f"{totals['total_rendered_pixels']} px, cost {totals['total_cost']:.3g}")
+
+    def summary(self) -> str:
+        totals = self.to_json()
+        return (f"{len(self.steps)} steps, {totals['total_slices']} slices, {totals['total_output_files']} files, "
+                f"{totals['total_rendered_pixels'] / 1e6:.1f} Mpx" + (f", {len(totals['errors'])} errors" if totals['errors'] else ""))
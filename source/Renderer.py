@@ -1,18 +1,17 @@
 from __future__ import annotations
 
+import os
 import bpy
 from mathutils import Vector
 from pathlib import Path
-from dataclasses import dataclass, field
+from dataclasses import dataclass
 from .Config import LODZ_NAME, CAM_NAME
-from .Utils import tgi_formatter, get_relative_path_for, translate, instance_id, b4b_collection, find_object, BAT4BlenderUserError
+from .Utils import tgi_formatter, get_relative_path_for, scratch_path_for, commit_output, set_if_changed, translate, instance_id, b4b_collection, find_object, BAT4BlenderUserError
 from .Enums import Zoom, Rotation, NightMode
 from .Canvas import Canvas
 from .LOD import LOD
-
-# sd default
-zoom_sizes = [8, 16, 32, 73, 146]  # from SFCameraRigHD.ms (horizontal extent of 16×16 cell in pixels)
-zoom_sizes_hd = [8, 16, 32, 73, 292]
+from .Camera import Camera, CameraSolution, zoom_sizes, zoom_sizes_hd, extra_camera_offset
+from . import Profiling
 
 _SLOP = 3
 
@@ -20,67 +19,85 @@ _SLOP = 3
 class Renderer:
 
     @staticmethod
-    def render_pre(z: Zoom, v: Rotation, gid, model_name: str, hd: bool, supersampling: SuperSampling):
+    def render_pre(z: Zoom, v: Rotation, gid, model_name: str, hd: bool, supersampling: SuperSampling, slice_cache: dict | None = None, camera_solutions: dict | None = None):
         r"""This function is invoked by the modal operator before the rendering of this view started.
         We do some setup such as slicing and exporting the LODs.
+        If a `slice_cache` is passed, the slicing results are reused by later
+        steps of the same view, such as the night renderings.
         """
-        bpy.context.scene.render.image_settings.file_format = 'PNG'
-        bpy.context.scene.render.image_settings.color_mode = 'RGBA'
-        bpy.context.scene.render.film_transparent = True
-        # First, position the camera for the current zoom and rotation. TODO Why does this not use v?
-        canvas = Renderer.camera_manoeuvring(z, hd=hd, supersampling=supersampling)
+        set_if_changed(bpy.context.scene.render.image_settings, 'file_format', 'PNG')
+        set_if_changed(bpy.context.scene.render.image_settings, 'color_mode', 'RGBA')
+        set_if_changed(bpy.context.scene.render, 'film_transparent', True)
+        # First, position the camera for the current zoom and rotation.
+        with Profiling.span("camera_manoeuvring"):
+            canvas = Renderer.camera_manoeuvring(z, v, hd=hd, supersampling=supersampling, solutions=camera_solutions)
         coll = b4b_collection()
         cam = find_object(coll, CAM_NAME)
         lod = find_object(coll, LODZ_NAME[z.value])
 
-        # The LODs must not depend on nightmode, so temporarily switch to day and only export when day
         nightmode = NightMode[bpy.context.scene.b4b.night]
-        bpy.context.scene.b4b.night = NightMode.DAY.name
         should_export = nightmode == NightMode.DAY
+        key = (z, v, LOD.version(lod), Renderer._camera_solution(cam, canvas))
+        result = slice_cache.get(key) if slice_cache is not None else None
+        if result is None or (should_export and (result.obj_path is None or not Path(result.obj_path).is_file())):
+            result = Renderer._slice_and_export(z, v, gid, model_name, lod, cam, canvas, should_export=should_export)
+            if slice_cache is not None:
+                slice_cache[key] = result
+        else:
+            print(f"Reusing {len(result.tile_indices_nonempty)} LOD slices of Zoom {z.value+1} {v.name}")
+        tile_indices_nonempty = result.tile_indices_nonempty
+        obj_path = result.obj_path if should_export else None
+
+        # Render the full image to a temporary location
+        set_if_changed(bpy.context.scene.render, 'use_border', False)  # always render the full frame
+        tmp_png_path = scratch_path_for(f"{tgi_formatter(gid, z.value, v.value, 0, is_night=(nightmode != NightMode.DAY))}_{nightmode.label()}.tmp.png", gid)
+        set_if_changed(bpy.context.scene.render, 'filepath', tmp_png_path)
+        msg = f"Rendering image ({bpy.context.scene.render.resolution_x}×{bpy.context.scene.render.resolution_y}, supersampling={supersampling.factor:g}×, nightmode={nightmode.label()})"
+        print(msg if not bpy.context.scene.b4b.export_lods_only else f"Skipping: {msg}")
+        return canvas, tile_indices_nonempty, tmp_png_path, obj_path, supersampling
+
+    @staticmethod
+    def _camera_solution(cam, canvas: Canvas) -> tuple:
+        return (cam.data.ortho_scale, cam.data.shift_x, cam.data.shift_y,
+                tuple(cam.location), tuple(cam.rotation_euler),
+                canvas.width_px, canvas.height_px)
 
-        # Next, slice the LOD and export it.
+    @staticmethod
+    def _slice_and_export(z: Zoom, v: Rotation, gid, model_name: str, lod, cam, canvas: Canvas, should_export: bool) -> SliceResult:
+        r"""Slice the LOD and export it. The slicing does not touch the scene
+        (in particular, it does not depend on the nightmode), so that Cycles can
+        keep its scene data between the renderings.
+        """
         tile_indices = list(canvas.tiles())
-        lod_slices = LOD.sliced(lod, cam, canvas)
-        tile_indices_nonempty = [pos for pos in tile_indices if len(lod_slices[pos].data.polygons) > 0]
+        with Profiling.span("LOD.sliced"):
+            lod_slices = LOD.sliced(lod, cam, canvas)
+        tile_indices_nonempty = [pos for pos in tile_indices if lod_slices[pos].triangles]
         assert tile_indices_nonempty, "LOD must not be completely empty, but should contain at least 1 polygon"
-        materials = []
+        instance_ids = [instance_id(z.value, v.value, count, is_night=False) for count in range(len(tile_indices_nonempty))]
         obj_path = None
         if should_export:
-            for count, pos in enumerate(tile_indices_nonempty):
-                iid = instance_id(z.value, v.value, count, is_night=False)
+            obj_meshes = []
+            for count, (pos, iid) in enumerate(zip(tile_indices_nonempty, instance_ids)):
                 mesh_name = f"{model_name}_UserModel_Z{z.value+1}{v.compass_name()}_{count}"
                 mat_name = f"{iid:08X}_{model_name}_UserModel_Z{z.value+1}{v.compass_name()}"
-                lod_slices[pos].name = lod_slices[pos].data.name = mesh_name  # keep object and data names in sync
-                materials.append(LOD.assign_material_name(lod_slices[pos], mat_name))
+                obj_meshes.append(LOD.slice_obj_mesh(lod_slices[pos], name=mesh_name, material=mat_name))
             stem = tgi_formatter(gid, z.value, v.value, 0, is_model=True, is_night=False)
-            obj_path = get_relative_path_for(f"{stem}.obj")
-            mtl_path = get_relative_path_for(f"{stem}.mtl")
-            LOD.export([lod_slices[pos] for pos in tile_indices_nonempty], obj_path, v)
-            try:
-                # .obj export creates .mtl material files that are not needed
-                Path(mtl_path).unlink(missing_ok=True)
-            except IOError:
-                pass  # ignored
-        # after export, we can discard LOD slices, as we only need tile indices.
-        for lod_slice in lod_slices.values():
-            bpy.data.meshes.remove(lod_slice.data)
-        for mat in materials:
-            bpy.data.materials.remove(mat)
-        bpy.context.scene.b4b.night = nightmode.name
-
-        # Render the full image to a temporary location
-        bpy.context.scene.render.use_border = False  # always render the full frame
-        tmp_png_path = get_relative_path_for(f"{tgi_formatter(gid, z.value, v.value, 0, is_night=(nightmode != NightMode.DAY))}_{nightmode.label()}.tmp.png")
-        bpy.context.scene.render.filepath = tmp_png_path
-        msg = f"Rendering image ({bpy.context.scene.render.resolution_x}×{bpy.context.scene.render.resolution_y}, supersampling={supersampling.enabled}, nightmode={nightmode.label()})"
-        print(msg if not bpy.context.scene.b4b.export_lods_only else f"Skipping: {msg}")
-        return canvas, tile_indices_nonempty, tmp_png_path, obj_path, supersampling
+            scratch_obj_path = scratch_path_for(f"{stem}.obj", gid)
+            with Profiling.span("LOD.export"):
+                LOD.export(obj_meshes, scratch_obj_path, v)
+            obj_path = commit_output(scratch_obj_path, get_relative_path_for(f"{stem}.obj"))
+        return SliceResult(tile_indices_nonempty=tile_indices_nonempty, instance_ids=instance_ids, obj_path=obj_path)
 
     @staticmethod
-    def render_post(z: Zoom, v: Rotation, gid, canvas: Canvas, tile_indices_nonempty: list[(int, int)], tmp_png_path: str, obj_path: str | None, supersampling: SuperSampling):
+    def render_post(z: Zoom, v: Rotation, gid, canvas: Canvas, tile_indices_nonempty: list[(int, int)], tmp_png_path: str, obj_path: str | None, supersampling: SuperSampling,
+                    stats: dict | None = None, day_files: list[str] | None = None):
         r"""This function is invoked by the modal operator after the rendering of this view finished,
         and yields the generated output files.
         We slice the rendered image here.
+        If night deltas are enabled, night tiles that match their tinted Day tiles
+        are not stored, and their number is added to `stats['night_tiles_skipped']`.
+        Only the Day tiles in `day_files`, which were written or verified in this
+        run, are compared, not files left over from earlier renderings.
         """
         import numpy as np
         from pathlib import Path
@@ -90,10 +107,12 @@ class Renderer:
             return  # this can happen when rendering was cancelled or if export_lods_only
         nightmode = NightMode[bpy.context.scene.b4b.night]
         if supersampling.enabled:
-            downsampled_tmp_png_path = get_relative_path_for(f"{tgi_formatter(gid, z.value, v.value, 0, is_night=(nightmode != NightMode.DAY))}_{nightmode.label()}_downsampled.tmp.png")
+            downsampled_tmp_png_path = scratch_path_for(f"{tgi_formatter(gid, z.value, v.value, 0, is_night=(nightmode != NightMode.DAY))}_{nightmode.label()}_downsampled.tmp.png", gid)
             assert supersampling.magick_exe, """Location for "magick" executable not set"""
             assert supersampling.downsampling_filter, "Down-sampling filter not set"
-            Renderer.downsample_image(supersampling.magick_exe, tmp_png_path, downsampled_tmp_png_path, filter_name=supersampling.downsampling_filter)
+            with Profiling.span("downsample_image"):
+                Renderer.downsample_image(supersampling.magick_exe, tmp_png_path, downsampled_tmp_png_path, filter_name=supersampling.downsampling_filter,
+                                          width=canvas.width_px, height=canvas.height_px)
         else:
             downsampled_tmp_png_path = None
         img = bpy.data.images.load(downsampled_tmp_png_path if supersampling.enabled else tmp_png_path)
@@ -105,19 +124,41 @@ class Renderer:
             # Slice the image into 256×256 tiles.
             # Slicing *after* rendering (as opposed to rendering individual 256×256 regions) has advantages when a denoising filter is applied.
             # Otherwise, the denoising filter would lead to visible artifacts at the borders of the 256×256 tiles, preventing a seamless appearance.
+            tile_paths = []  # scratch and destination paths of the written tiles
+            b4b = bpy.context.scene.b4b
+            night_delta = nightmode != NightMode.DAY and b4b.night_delta_enabled
+            day_paths = {os.path.abspath(p) for p in day_files or ()}
+            if night_delta and not day_paths:
+                print(f"Night delta: no Day tiles were rendered in this run, so all {nightmode.label()} tiles are stored")
+                night_delta = False
+            skipped = 0
             for count, (row, col) in enumerate(tile_indices_nonempty):
                 left, right, top0, bottom0 = canvas.tile_border_px_LRTB(row, col)
                 top = canvas.height_px - top0
                 bottom = canvas.height_px - bottom0
+                fn = f"{tgi_formatter(gid, z.value, v.value, count, is_night=(nightmode != NightMode.DAY))}_{nightmode.label()}.png"
+                if night_delta and Renderer._is_unlit_night_tile(arr[bottom:top, left:right, :], gid, z, v, count, day_paths):
+                    skipped += 1  # the game falls back to the Day tile with its own night tint
+                    Path(get_relative_path_for(fn)).unlink(missing_ok=True)  # from an earlier rendering
+                    continue
                 img_tile = bpy.data.images.new("b4b_canvas_tile", width=(right-left), height=(top-bottom), alpha=(img.channels >= 4))
-                img_tile.file_format
-                img_tile.file_format = 'PNG'
-                img_tile.filepath = get_relative_path_for(f"{tgi_formatter(gid, z.value, v.value, count, is_night=(nightmode != NightMode.DAY))}_{nightmode.label()}.png")
-                img_tile.pixels = arr[bottom:top, left:right, :].ravel()
-                img_tile.save()
-                print(f"Saved: '{img_tile.filepath}'")
-                yield img_tile.filepath
-                bpy.data.images.remove(img_tile)
+                try:
+                    scratch_path = scratch_path_for(fn, gid)
+                    img_tile.file_format = 'PNG'
+                    img_tile.filepath = scratch_path
+                    with Profiling.span("tile writes"):
+                        img_tile.pixels = arr[bottom:top, left:right, :].ravel()
+                        img_tile.save()
+                    tile_paths.append((scratch_path, get_relative_path_for(fn)))
+                finally:
+                    bpy.data.images.remove(img_tile)  # also if saving failed
+            if night_delta:
+                print(f"Night delta: skipped {skipped} of {len(tile_indices_nonempty)} {nightmode.label()} tiles that match the tinted Day tiles")
+                if stats is not None:
+                    stats['night_tiles_skipped'] = stats.get('night_tiles_skipped', 0) + skipped
+            for scratch_path, path in tile_paths:  # only commit the tiles once all of them have been written
+                yield commit_output(scratch_path, path)
+                print(f"Saved: '{path}'")
 
         finally:
             bpy.data.images.remove(img)
@@ -128,47 +169,165 @@ class Renderer:
                     except IOError:
                         pass  # ignored
 
-    _tmp_png_path_preview = Path(bpy.app.tempdir) / "b4b_preview.tmp.png"
-    _tmp_png_path_preview_downsampled = Path(bpy.app.tempdir) / "b4b_preview_downsampled.tmp.png"
+    @staticmethod
+    def _is_unlit_night_tile(tile, gid, z: Zoom, v: Rotation, count: int, day_paths: set[str]) -> bool:
+        r"""Compare a night tile with the Day tile of the same instance, if that has been rendered in this run."""
+        import numpy as np
+        from .core.NightDelta import is_unlit
+        day_path = get_relative_path_for(f"{tgi_formatter(gid, z.value, v.value, count, is_night=False)}_{NightMode.DAY.label()}.png")
+        if os.path.abspath(day_path) not in day_paths or not Path(day_path).is_file():
+            return False
+        b4b = bpy.context.scene.b4b
+        img = bpy.data.images.load(day_path)
+        try:
+            if img.channels != tile.shape[2]:
+                return False
+            day = np.empty(img.size[0] * img.size[1] * img.channels, dtype=np.float32)
+            img.pixels.foreach_get(day)
+            day = day.reshape((img.size[1], img.size[0], img.channels))
+        finally:
+            bpy.data.images.remove(img)
+        return is_unlit(tile, day, tint=tuple(b4b.night_tint), color_tolerance=b4b.night_delta_color_tolerance, alpha_tolerance=b4b.night_delta_alpha_tolerance)
 
     @staticmethod
-    def generate_preview(zoom: Zoom, hd: bool, supersampling: SuperSampling):
-        Renderer.camera_manoeuvring(zoom, hd=hd, supersampling=supersampling)
+    def _band_png_path(tmp_png_path: str, index: int) -> str:
+        return tmp_png_path.removesuffix(".tmp.png") + f"_band{index}.tmp.png"
+
+    @staticmethod
+    def _band_border(top: int, bottom: int, height: int) -> tuple[float, float]:
+        r"""The vertical border of a band, measured from the bottom. Blender
+        truncates `border * height` to whole rows, so each edge is placed half a
+        pixel inside its row to be robust against rounding of the float values.
+        """
+        return (height - bottom + 0.5) / height, min(1.0, (height - top + 0.5) / height)
+
+    @staticmethod
+    def _band_rows(top: int, bottom: int, height: int) -> tuple[int, int]:
+        r"""The rows (top, bottom) that Blender actually renders for the border of the band."""
+        import numpy as np
+        min_y, max_y = (np.float32(f) for f in Renderer._band_border(top, bottom, height))  # stored as float by Blender
+        return height - int(max_y * np.float32(height)), height - int(min_y * np.float32(height))
+
+    @staticmethod
+    def setup_band(bands: list[tuple[int, int, int, int]], index: int, tmp_png_path: str):
+        r"""Restrict the next rendering to the rows of a band using border
+        rendering, so that the render buffers only hold this band.
+        """
+        render = bpy.context.scene.render
+        height = bands[-1][1]
+        top, bottom, _, _ = bands[index]
+        render.use_border = True
+        render.use_crop_to_border = True
+        render.border_min_x, render.border_max_x = 0.0, 1.0
+        render.border_min_y, render.border_max_y = Renderer._band_border(top, bottom, height)
+        render.filepath = Renderer._band_png_path(tmp_png_path, index)
+        print(f"Rendering band {index+1}/{len(bands)} (rows {top}–{bottom})")
+
+    @staticmethod
+    def stitch_bands(bands: list[tuple[int, int, int, int]], tmp_png_path: str):
+        r"""Combine the rendered bands into the full image at `tmp_png_path`,
+        dropping the overlaps, and delete the band images.
+        The image is written row by row at the color depth of the output
+        settings, so only a single band is held in memory at a time.
+        """
+        import numpy as np
+        from .core.Png import PngWriter
+        render = bpy.context.scene.render
+        render.use_border = False
+        render.filepath = tmp_png_path
+        height = bands[-1][1]
+        bit_depth = 16 if render.image_settings.color_depth == '16' else 8
+        max_value = (1 << bit_depth) - 1
+        paths = [Renderer._band_png_path(tmp_png_path, index) for index in range(len(bands))]
+        writer = None
+        try:
+            with Profiling.span("stitch_bands"):
+                for (top, bottom, keep_top, keep_bottom), path in zip(bands, paths):  # from top to bottom
+                    img = bpy.data.images.load(path)
+                    try:
+                        img.colorspace_settings.name = 'Non-Color'  # read the stored values without color or alpha conversion
+                        img.alpha_mode = 'CHANNEL_PACKED'
+                        width, h = img.size
+                        actual_top, actual_bottom = Renderer._band_rows(top, bottom, height)
+                        if h != actual_bottom - actual_top or not (actual_top <= keep_top and keep_bottom <= actual_bottom):
+                            raise BAT4BlenderUserError(f"Rendered band {path!r} does not cover the expected rows {keep_top}–{keep_bottom} "
+                                                       f"(height {h}, expected rows {actual_top}–{actual_bottom}). Disable Banded Rendering and try again.")
+                        band = np.empty(width * h * img.channels, dtype=np.float32)
+                        img.pixels.foreach_get(band)
+                        band = band.reshape((h, width, img.channels))
+                        if writer is None:
+                            writer = PngWriter(tmp_png_path, width, height, img.channels, bit_depth)
+                        rows = band[actual_bottom - keep_bottom:actual_bottom - keep_top][::-1]  # pixel rows are stored bottom-up
+                        writer.write_rows(np.rint(np.clip(rows, 0, 1) * max_value))
+                    finally:
+                        bpy.data.images.remove(img)
+                writer.close()
+                writer = None
+        finally:
+            if writer is not None:  # failed before all rows were written
+                writer.abort()
+                Path(tmp_png_path).unlink(missing_ok=True)
+            Renderer.discard_bands(bands, tmp_png_path)
+
+    @staticmethod
+    def discard_bands(bands: list[tuple[int, int, int, int]], tmp_png_path: str):
+        bpy.context.scene.render.use_border = False
+        for index in range(len(bands)):
+            try:
+                Path(Renderer._band_png_path(tmp_png_path, index)).unlink(missing_ok=True)
+            except IOError:
+                pass  # ignored
+
+    @staticmethod
+    def _tmp_png_path_preview() -> Path:
+        return Path(bpy.app.tempdir) / "b4b_preview.tmp.png"
+
+    @staticmethod
+    def _tmp_png_path_preview_downsampled() -> Path:
+        return Path(bpy.app.tempdir) / "b4b_preview_downsampled.tmp.png"
+
+    @staticmethod
+    def generate_preview(zoom: Zoom, rotation: Rotation, hd: bool, supersampling: SuperSampling):
+        Renderer.camera_manoeuvring(zoom, rotation, hd=hd, supersampling=supersampling)
         #  reset camera border in case a large view has been rendered.. may want to do this after rendering instead
         bpy.context.scene.render.border_min_x = 0.0
         bpy.context.scene.render.border_max_x = 1.0
         bpy.context.scene.render.border_min_y = 0.0
         bpy.context.scene.render.border_max_y = 1.0
         bpy.context.scene.render.film_transparent = True
-        print(f"Rendering image ({bpy.context.scene.render.resolution_x}×{bpy.context.scene.render.resolution_y}, supersampling={supersampling.enabled})")
+        print(f"Rendering image ({bpy.context.scene.render.resolution_x}×{bpy.context.scene.render.resolution_y}, supersampling={supersampling.factor:g}×)")
         if not supersampling.enabled:
             bpy.ops.render.render('INVOKE_DEFAULT', write_still=False)
         else:
-            bpy.context.scene.render.filepath = str(Renderer._tmp_png_path_preview)
+            bpy.context.scene.render.filepath = str(Renderer._tmp_png_path_preview())
             bpy.ops.render.render('INVOKE_DEFAULT', write_still=True)
 
     @staticmethod
     def downsample_preview(supersampling: SuperSampling):
-        if not Renderer._tmp_png_path_preview.exists():
-            raise BAT4BlenderUserError("Preview rendering does not exist yet. Render a preview at 2× resolution first.")
+        if not Renderer._tmp_png_path_preview().exists():
+            raise BAT4BlenderUserError("Preview rendering does not exist yet. Render a super-sampled preview first.")
         else:
-            Renderer.downsample_image(supersampling.magick_exe, Renderer._tmp_png_path_preview, Renderer._tmp_png_path_preview_downsampled, filter_name=supersampling.downsampling_filter)
+            render = bpy.context.scene.render
+            Renderer.downsample_image(supersampling.magick_exe, Renderer._tmp_png_path_preview(), Renderer._tmp_png_path_preview_downsampled(), filter_name=supersampling.downsampling_filter,
+                                      width=round(render.resolution_x / supersampling.factor), height=round(render.resolution_y / supersampling.factor))
             name = 'b4b_preview_downsampled'
             if name in bpy.data.images:
                 img = bpy.data.images[name]
-                img.filepath = str(Renderer._tmp_png_path_preview_downsampled)
+                img.filepath = str(Renderer._tmp_png_path_preview_downsampled())
                 img.reload()
             else:
-                img = bpy.data.images.load(str(Renderer._tmp_png_path_preview_downsampled))
+                img = bpy.data.images.load(str(Renderer._tmp_png_path_preview_downsampled()))
                 img.name = name
             return img
 
     @staticmethod
-    def camera_manoeuvring(zoom: Zoom, hd: bool, supersampling: SuperSampling) -> Canvas:
+    def camera_manoeuvring(zoom: Zoom, rotation: Rotation, hd: bool, supersampling: SuperSampling, solutions: dict | None = None) -> Canvas:
         r"""Adjust the offset, orthographic scale and resolution of the current
         camera so that the LOD fits into view, including a margin, and such
         that the orthographic scale results in a pixel-perfect display of the
         rendered image at the given zoom level.
+        The camera placement is computed analytically by `Camera.solve_views`.
+        If a `solutions` dictionary is passed, all views are solved on first use and stored in it.
         """
         if bpy.context.scene.render.resolution_percentage != 100:
             raise BAT4BlenderUserError(f"Unsupported resolution scaling: {bpy.context.scene.render.resolution_percentage}%. Go to the Output tab and set it to 100%.")
@@ -176,11 +335,48 @@ class Renderer:
             raise BAT4BlenderUserError(f"Unsupported pixel aspect: {bpy.context.scene.render.pixel_aspect_x:g}:{bpy.context.scene.render.pixel_aspect_y:g}. Go to the Output tab and set it to 1:1.")
         coll = b4b_collection()
         cam = find_object(coll, CAM_NAME)
+        if bpy.context.scene.camera != cam:
+            bpy.context.scene.camera = cam  # apparently invoke default also checks if the scene has a camera..?
+
+        if solutions is None:
+            lod = find_object(coll, LODZ_NAME[zoom.value])
+            solution = Camera.solve_views({zoom: LOD.world_vertices(lod)}, hd=hd, margin=_SLOP, rotations=[rotation])[(zoom, rotation)]
+        else:
+            if (zoom, rotation) not in solutions:
+                lods = {z: find_object(coll, LODZ_NAME[z.value]) for z in Zoom}
+                solutions.update(Camera.solve_views({z: LOD.world_vertices(lod) for z, lod in lods.items() if lod is not None}, hd=hd, margin=_SLOP))
+            solution = solutions[(zoom, rotation)]
+
+        if bpy.context.scene.b4b.debug_mode:
+            Renderer._verify_camera_solution(zoom, hd, solution)
+        return Renderer.apply_camera_solution(cam, solution, supersampling)
+
+    @staticmethod
+    def apply_camera_solution(cam, solution: CameraSolution, supersampling: SuperSampling) -> Canvas:
+        set_if_changed(cam, 'location', solution.location)
+        set_if_changed(cam, 'rotation_euler', solution.rotation_euler)
+        set_if_changed(cam.data, 'ortho_scale', solution.ortho_scale)
+        set_if_changed(cam.data, 'shift_x', solution.shift_x)
+        set_if_changed(cam.data, 'shift_y', solution.shift_y)
+        set_if_changed(bpy.context.scene.render, 'resolution_x', supersampling.scaled(solution.width_px))
+        set_if_changed(bpy.context.scene.render, 'resolution_y', supersampling.scaled(solution.height_px))
+        print(f"Output dimensions are {solution.width_px}×{solution.height_px}")
+        return Canvas(width_px=solution.width_px, height_px=solution.height_px)
+
+    @staticmethod
+    def _verify_camera_solution(zoom: Zoom, hd: bool, solution: CameraSolution):
+        r"""Compare the analytic camera solution with fitting the camera via the depsgraph (for debugging).
+        This moves the camera, so the solution needs to be applied afterwards.
+        """
+        coll = b4b_collection()
+        cam = find_object(coll, CAM_NAME)
         lod = find_object(coll, LODZ_NAME[zoom.value])
+        cam.location, cam.rotation_euler = solution.location, solution.rotation_euler
+        cam.data.shift_x = cam.data.shift_y = 0.0
         bpy.context.scene.render.resolution_x = 256  # temporary for computation of os_reference
         bpy.context.scene.render.resolution_y = 256
+        bpy.context.view_layer.update()
         depsgraph = bpy.context.evaluated_depsgraph_get()
-        bpy.context.scene.camera = cam  # apparently invoke default also checks if the scene has a camera..?
 
         # We use a 16m × 16m cell centered at origin as reference.
         # Its rendered (horizontal) dimension is zoom_sizes[zoom.value] in pixels.
@@ -195,12 +391,20 @@ class Renderer:
 
         # Adjustment of the orthographic scale to account for the added slop margin and the rounding to integer resolutions:
         cam.data.ortho_scale *= max(canvas.width_px, canvas.height_px) / dim_lod
-        bpy.context.scene.render.resolution_x = canvas.width_px * supersampling.factor
-        bpy.context.scene.render.resolution_y = canvas.height_px * supersampling.factor
+        bpy.context.scene.render.resolution_x = canvas.width_px
+        bpy.context.scene.render.resolution_y = canvas.height_px
         Renderer.offset_camera(cam, lod, canvas.width_px, canvas.height_px, margin=_SLOP)
 
-        print(f"Output dimensions are {canvas.width_px}×{canvas.height_px}")
-        return canvas
+        dim = max(canvas.width_px, canvas.height_px)
+        deviation_px = max(
+            abs(cam.data.ortho_scale - solution.ortho_scale) / solution.ortho_scale * dim,
+            abs(cam.data.shift_x - solution.shift_x) * dim,
+            abs(cam.data.shift_y - solution.shift_y) * dim,
+        )
+        if (canvas.width_px, canvas.height_px) != (solution.width_px, solution.height_px) or deviation_px >= 0.5:
+            print(f"Warning: analytic camera solution deviates from depsgraph fit: canvas {solution.width_px}×{solution.height_px} vs. {canvas.width_px}×{canvas.height_px}, {deviation_px:.3f} px")
+        else:
+            print(f"Analytic camera solution matches depsgraph fit (deviation {deviation_px:.4f} px)")
 
     @staticmethod
     def offset_camera(cam, lod, dim_x, dim_y, margin: int):
@@ -208,7 +412,6 @@ class Renderer:
         left edges of the rendered image, accounting for the slop margin.
         Also move the camera further away from the origin to put the whole LOD into view.
         """
-        from .Camera import Camera
         cam.data.shift_x = 0.0
         cam.data.shift_y = 0.0
         # get the 2d camera view coordinates for the LOD... is this a correct assumption?
@@ -225,7 +428,6 @@ class Renderer:
         cam.data.shift_y = y_d
 
         distance = Camera.distance_from_lod(cam, lod)
-        extra_camera_offset = 80  # distance to keep between camera and lod
         cam.location = cam.location * ((cam.location.length - distance + extra_camera_offset) / cam.location.length)
 
     @staticmethod
@@ -258,39 +460,45 @@ rf"""<?xml version="1.0" encoding="UTF-8"?>
         xml_tgi = tgi_formatter(gid, 0, 0, 0, is_xml=True, prefix=False)
         xml_path = get_relative_path_for(f"{xml_tgi}.xml")
         print(f"Exporting XML file: {xml_path}")
-        with open(xml_path, 'w') as f:
+        scratch_path = scratch_path_for(f"{xml_tgi}.xml", gid)
+        with open(scratch_path, 'w') as f:
             f.write(text)
+        commit_output(scratch_path, xml_path)
 
     @staticmethod
     def create_sc4model(fshgen_script: str, files: list[str], name: str, gid: str, nightmode: NightMode):
         import subprocess
         tgi = tgi_formatter(gid, 0, 0, 0, is_model=True, prefix=True)
-        sc4model_path = get_relative_path_for(f"{name}-{tgi}.SC4Model" if nightmode == NightMode.DAY else f"{name}-{tgi}-{nightmode.label()}.SC4Model")
+        fn = f"{name}-{tgi}.SC4Model" if nightmode == NightMode.DAY else f"{name}-{tgi}-{nightmode.label()}.SC4Model"
+        sc4model_path = get_relative_path_for(fn)
+        scratch_path = scratch_path_for(fn, gid)
         print(f"Using fshgen to create SC4Model: {sc4model_path}")
         try:
-            result = subprocess.run([
-                fshgen_script, "import",
-                "--output", sc4model_path,
-                "--force",
-                "--with-BAT-models",
-                "--format", "Dxt1",
-                "--gid", f"0x{gid}",
-            ], input="\n".join(files).encode())
+            with Profiling.span("create_sc4model"):
+                result = subprocess.run([
+                    fshgen_script, "import",
+                    "--output", scratch_path,
+                    "--force",
+                    "--with-BAT-models",
+                    "--format", "Dxt1",
+                    "--gid", f"0x{gid}",
+                ], input="\n".join(files).encode())
         except OSError as err:
             raise BAT4BlenderUserError(f"""Failed to create SC4Model using "fshgen". Make sure "fshgen" is installed and configured under BAT4Blender Post-Processing, or disable Post-Processing.\n({type(err).__name__} {err})""")
         if result.returncode != 0:
             raise BAT4BlenderUserError("""Failed to create SC4Model using "fshgen". Check console output for error messages, or disable Post-Processing.""")
+        commit_output(scratch_path, sc4model_path)
 
     @staticmethod
-    def downsample_image(magick_exe: str, input_path: str, output_path: str, filter_name: str):
+    def downsample_image(magick_exe: str, input_path: str, output_path: str, filter_name: str, width: int, height: int):
         import subprocess
-        print(f"""Using ImageMagick filter "{filter_name}" to downsample rendering: {input_path}""")
+        print(f"""Using ImageMagick filter "{filter_name}" to downsample rendering to {width}×{height}: {input_path}""")
         try:
             result = subprocess.run([
                 magick_exe,
                 input_path,
                 "-colorspace", "RGB",  # switch to linear space
-                "-filter", filter_name, "-resize", "50%",
+                "-filter", filter_name, "-resize", f"{width}x{height}!",  # exact size, also for non-integer factors
                 "-colorspace", "sRGB",  # switch back to gamma space
                 output_path,
             ])
@@ -309,14 +517,36 @@ rf"""<?xml version="1.0" encoding="UTF-8"?>
 
 @dataclass
 class SuperSampling:
+    r"""Rendering at `factor` times the canvas resolution, followed by down-sampling.
+    As the canvas dimensions are multiples of 4 px, the factor is rounded to a
+    multiple of 0.25, so that the rendered image has whole pixel dimensions.
+    A factor of 1 disables super-sampling.
+    """
     enabled: bool
     magick_exe: str | None = None
     downsampling_filter: str | None = None
-    factor: int = field(init=False)
+    factor: float = 2.0
 
     def __post_init__(self):
-        self.factor = 2 if self.enabled else 1
+        self.factor = max(1.0, round(self.factor * 4) / 4) if self.enabled else 1.0
+        self.enabled = self.factor > 1
+
+    def scaled(self, px: int) -> int:
+        return round(px * self.factor)
+
+    @staticmethod
+    def factor_for(context, zoom: Zoom) -> float:
+        return context.scene.b4b.supersampling_factors[zoom.value]
 
     @staticmethod
     def for_preview(context):
-        return SuperSampling(enabled=(context.scene.b4b.supersampling_enabled and context.scene.b4b.supersampling_preview != 'no_supersampling'))
+        return SuperSampling(enabled=(context.scene.b4b.supersampling_enabled and context.scene.b4b.supersampling_preview != 'no_supersampling'),
+                             factor=SuperSampling.factor_for(context, Zoom[context.scene.b4b.zoom]))
+
+
+@dataclass
+class SliceResult:
+    r"""The outcome of slicing the LOD for one view, which does not depend on the nightmode."""
+    tile_indices_nonempty: list[(int, int)]
+    instance_ids: list[int]
+    obj_path: str | None  # only set if the sliced LOD has been exported
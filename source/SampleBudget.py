@@ -0,0 +1,102 @@
+r"""Automatic sample budgeting of each view from low-sample pre-passes.
+
+Before the full rendering of a view, it is rendered twice at reduced resolution
+with a few samples, different seeds and without denoising or compositing. From the noise of the
+stored tiles, the number of samples and the adaptive threshold that reach the
+target noise level are chosen (see `core.SampleBudget`). With super-sampling,
+the noise is reduced by the down-sampling, as each stored pixel averages
+`factor²` rendered pixels.
+"""
+import math
+import time
+from pathlib import Path
+import bpy
+from .Utils import scratch_path_for
+from .core.SampleBudget import Budget, shipped_mask, sample_variances, choose
+from . import Profiling
+
+PREPASS_PERCENTAGE = 50  # resolution of the pre-passes in percent, unless limited by banded rendering
+
+_SETTINGS = ('samples', 'adaptive_threshold', 'use_adaptive_sampling')
+
+
+def save_settings(scene) -> dict:
+    return {attr: getattr(scene.cycles, attr) for attr in _SETTINGS}
+
+
+def restore_settings(scene, saved: dict):
+    for attr, value in saved.items():
+        setattr(scene.cycles, attr, value)
+
+
+def apply(scene, budget: Budget):
+    scene.cycles.samples = budget.samples
+    scene.cycles.use_adaptive_sampling = True
+    scene.cycles.adaptive_threshold = budget.adaptive_threshold
+
+
+def _load_pixels(path: str):
+    import numpy as np
+    img = bpy.data.images.load(path)
+    try:
+        arr = np.empty(img.size[0] * img.size[1] * img.channels, dtype=np.float32)
+        img.pixels.foreach_get(arr)
+        return arr.reshape((img.size[1], img.size[0], img.channels))
+    finally:
+        bpy.data.images.remove(img)
+
+
+def prepass_percentage(bands: list[tuple[int, int, int, int]] | None) -> int:
+    r"""The resolution of the pre-passes in percent. With banded rendering, the
+    pre-passes are rendered at a resolution with no more pixels than the largest band.
+    """
+    if bands is None:
+        return PREPASS_PERCENTAGE
+    height = bands[-1][1]
+    largest = max(bottom - top for top, bottom, _, _ in bands)
+    return max(1, min(PREPASS_PERCENTAGE, int(100 * math.sqrt(largest / height))))
+
+
+def prepass(scene, canvas, tile_indices_nonempty, gid: str, render, max_samples: int, supersampling_factor: float = 1.0,
+            cancelled=lambda: False, percentage: int = PREPASS_PERCENTAGE) -> tuple[Budget, float] | None:
+    r"""Render the pre-passes of the current view by calling `render` and choose its budget.
+    Also returns a rough estimate of the render time per sample of the full view in seconds,
+    which includes the scene synchronization and BVH build of the pre-passes.
+    Returns None if `cancelled()` becomes true after the first pre-pass.
+    The render settings are restored afterwards.
+    """
+    b4b = scene.b4b
+    n = b4b.auto_samples_prepass
+    saved_render = {attr: getattr(scene.render, attr) for attr in ('filepath', 'resolution_percentage', 'use_border', 'use_compositing')}
+    saved_cycles = {attr: getattr(scene.cycles, attr) for attr in ('samples', 'seed', 'use_animated_seed', 'use_adaptive_sampling', 'use_denoising')}
+    paths = [scratch_path_for(f"b4b_prepass{i}.tmp.png", gid) for i in range(2)]
+    try:
+        scene.render.resolution_percentage = percentage
+        scene.render.use_border = False
+        scene.render.use_compositing = False  # the compositing setup depends on the passes of the denoiser, and its output is not the raw noisy image
+        scene.cycles.samples = n
+        scene.cycles.use_animated_seed = False
+        scene.cycles.use_adaptive_sampling = False
+        scene.cycles.use_denoising = False  # the denoiser would hide the noise
+        start = time.perf_counter()
+        with Profiling.span("sample prepass"):
+            for seed, path in enumerate(paths):
+                scene.cycles.seed = saved_cycles['seed'] + 1 + seed
+                scene.render.filepath = path
+                render()
+                if cancelled():
+                    return None
+        seconds = time.perf_counter() - start
+        a, b = (_load_pixels(path) for path in paths)
+    finally:
+        for attr, value in saved_render.items():
+            setattr(scene.render, attr, value)
+        for attr, value in saved_cycles.items():
+            setattr(scene.cycles, attr, value)
+        for path in paths:
+            Path(path).unlink(missing_ok=True)
+    height, width = a.shape[:2]
+    variances = sample_variances(a, b, n, shipped_mask(canvas, tile_indices_nonempty, height, width)) / supersampling_factor ** 2  # of the down-sampled pixels
+    budget = choose(variances, b4b.auto_samples_noise_target, min_samples=n, max_samples=max_samples)
+    seconds_per_sample = seconds / (2 * n) * (100 / percentage) ** 2  # render time scales with the number of pixels
+    return budget, seconds_per_sample
@@ -0,0 +1,120 @@
+r"""Rendering of models that exceed 1024 slices per view as several sub-models.
+
+`split` decides from the render plan of zoom 5 whether the model needs to be
+split, and `Activation` temporarily replaces the LODs and the Group ID of the
+scene by those of a single sub-model, so that the regular render steps produce
+the outputs of that sub-model.
+"""
+import bpy
+from .Config import LODZ_NAME
+from .Enums import Zoom, Rotation, NightMode
+from .Utils import b4b_collection, find_object, BAT4BlenderUserError
+from .core.Submodels import MAX_SLICES_PER_VIEW, Split, grid_size, grid_regions, merge_incomplete, overlaps
+
+_split_cache = {}  # the split of the last model, as it is requested again by each sub-model job
+_MAX_GRID = 16
+_ZOOM5_STEPS = [(Zoom.FIVE, v, NightMode.DAY) for v in Rotation]  # zoom 5 has the most slices
+
+
+def split(context) -> Split | None:
+    r"""The sub-models of the scene, or None if the model fits into a single model.
+    The scene is not modified, so the LODs must exist.
+    """
+    import numpy as np
+    from .LOD import LOD
+    from .RenderPlan import RenderPlan
+    b4b = context.scene.b4b
+    coll = b4b_collection()
+    lods = [find_object(coll, name) for name in LODZ_NAME]
+    if any(lod is None for lod in lods):
+        return None  # missing LODs are reported by the render plan, and fitted before rendering
+    key = (tuple(LOD.version(lod) for lod in lods), b4b.hd, b4b.submodel_grid, b4b.group_id)
+    if key in _split_cache:
+        return _split_cache[key]
+
+    if b4b.submodel_grid > 0:
+        grid = b4b.submodel_grid
+    else:
+        plan = RenderPlan.build(context, _ZOOM5_STEPS)
+        grid = grid_size(max(len(s.tiles_nonempty) for s in plan.steps))
+    result = None
+    if grid > 1:
+        geometry = [LOD.world_triangles(lod) for lod in lods]
+        xy = np.concatenate([verts[:, :2] for verts, _ in geometry])
+        (x_min, y_min), (x_max, y_max) = xy.min(axis=0), xy.max(axis=0)
+        bounds = [(verts[tris].min(axis=1)[:, :2], verts[tris].max(axis=1)[:, :2]) for verts, tris in geometry]
+        while True:
+            regions = _merged_regions(grid_regions(x_min, x_max, y_min, y_max, grid), bounds, grid)
+            if b4b.submodel_grid > 0:
+                break  # the slices of a configured grid are checked by the pre-flight check of each sub-model
+            # the grid size is only an estimate from the area, and merged regions have more slices, so check the plan of every part
+            slices = max(len(s.tiles_nonempty) for region in regions for s in RenderPlan.build(context, _ZOOM5_STEPS, region=region).steps)
+            if slices < MAX_SLICES_PER_VIEW:
+                break
+            if grid >= _MAX_GRID:
+                raise BAT4BlenderUserError(f"A part of the {grid}×{grid} sub-model grid still has {slices} slices in a view, which exceeds the limit of {MAX_SLICES_PER_VIEW}. "
+                                           "Simplify the LODs or set a Sub-Model Grid.")
+            print(f"A part of the {grid}×{grid} sub-model grid has {slices} slices in a view, so the grid is refined")
+            grid += 1
+        result = Split(gid=b4b.group_id, grid=grid, regions=regions)
+    _split_cache.clear()
+    _split_cache[key] = result
+    return result
+
+
+def _merged_regions(regions: list[tuple[float, float, float, float]], bounds, grid: int) -> list[tuple[float, float, float, float]]:
+    r"""The regions in which any LOD has geometry, where regions in which some
+    LOD is empty are merged into a neighbour, as every zoom needs a non-empty LOD.
+    """
+    def complete(region):
+        return all(overlaps(region, tri_min, tri_max) for tri_min, tri_max in bounds)
+    regions = [region for region in regions if any(overlaps(region, tri_min, tri_max) for tri_min, tri_max in bounds)]
+    incomplete = sum(1 for region in regions if not complete(region))
+    merged = merge_incomplete(regions, complete)
+    if merged is None:
+        raise BAT4BlenderUserError(f"Some LODs have no geometry in {incomplete} parts of the {grid}×{grid} sub-model grid, "
+                                   "and these parts cannot be merged with a neighbour. Choose a different Sub-Model Grid or adjust the LODs.")
+    if len(merged) < len(regions):
+        print(f"Merged {incomplete} sub-model regions in which some LODs are empty into their neighbours")
+    return merged
+
+
+def describe(s: Split) -> str:
+    return (f"Model is split into {s.count()} sub-models ({s.grid}×{s.grid} grid) to stay below 1024 slices per view: "
+            + ", ".join(f"{i} (Group ID {s.gid_of(i)})" for i in range(s.count())))
+
+
+class Activation:
+    r"""Replaces the LODs by their clipped copies and the Group ID by the one of the sub-model, until `restore` is called."""
+
+    def __init__(self, context, s: Split, index: int):
+        from .LOD import LOD
+        if not 0 <= index < s.count():
+            raise BAT4BlenderUserError(f"Sub-model {index} does not exist, as the model is split into {s.count()} sub-models (0 to {s.count() - 1}).")
+        self._scene = context.scene
+        self._orig_gid = context.scene.b4b.group_id
+        self._orig_meshes = []
+        coll = b4b_collection()
+        try:
+            for name in LODZ_NAME:
+                lod = find_object(coll, name)
+                mesh = LOD.clipped_mesh(lod, s.regions[index])
+                self._orig_meshes.append((lod, lod.data))
+                lod.data = mesh
+                if not mesh.polygons:
+                    raise BAT4BlenderUserError(f"LOD {name} of sub-model {index} is empty. Choose a different sub-model grid.")
+        except BaseException:
+            self.restore()
+            raise
+        context.scene.b4b.group_id = s.gid_of(index)
+        bpy.context.view_layer.update()
+        print(f"Sub-model {index} of {s.count()} (0 to {s.count() - 1}) with Group ID {s.gid_of(index)}")
+
+    def restore(self):
+        for lod, mesh in self._orig_meshes:
+            clipped = lod.data
+            lod.data = mesh
+            bpy.data.meshes.remove(clipped)
+        self._orig_meshes = []
+        self._scene.b4b.group_id = self._orig_gid
+        bpy.context.view_layer.update()
@@ -0,0 +1,170 @@
+r"""Persistent per-run render telemetry as JSON lines, and the comparison of runs.
+
+Each finished (or cancelled) render appends one record to the telemetry file.
+The comparison functions do not depend on `bpy`, so the file can also be
+analyzed outside of Blender, see `benchmarks/compare_telemetry.py`.
+"""
+import json
+import time
+from statistics import median
+
+TELEMETRY_FILE_NAME = "b4b_telemetry.jsonl"
+
+
+def _process_peak_memory_mb():
+    r"""The peak resident memory of the Blender process so far, not of a single step."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    import sys
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1 << 20) if sys.platform == 'darwin' else rss / (1 << 10)  # bytes on macOS, KiB on Linux
+
+
+class Run:
+    r"""Collects the telemetry of one render operator run."""
+
+    def __init__(self, context, log_path: str):
+        import bpy
+        import sys
+        scene = context.scene
+        addon = sys.modules.get(__package__)
+        self.log_path = log_path
+        self.start = time.perf_counter()
+        self.record = {
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'blend_file': bpy.data.filepath,
+            'scene': scene.name,
+            'addon_version': ".".join(map(str, addon.bl_info['version'])) if hasattr(addon, 'bl_info') else None,
+            'blender_version': bpy.app.version_string,
+            'settings': {
+                'engine': scene.render.engine,
+                'samples': scene.cycles.samples if scene.render.engine == 'CYCLES' else getattr(scene.eevee, 'taa_render_samples', None),
+                'adaptive_threshold': scene.cycles.adaptive_threshold if scene.render.engine == 'CYCLES' and scene.cycles.use_adaptive_sampling else None,
+                'denoising': scene.cycles.use_denoising if scene.render.engine == 'CYCLES' else None,
+                'supersampling': scene.b4b.supersampling_enabled,
+                'supersampling_factors': list(scene.b4b.supersampling_factors),
+                'hd': scene.b4b.hd == 'HD',
+                'export_lods_only': scene.b4b.export_lods_only,
+            },
+            'steps': [],
+        }
+        self._step_start = None
+        self._finished = False
+
+    def begin_step(self):
+        self._step_start = time.perf_counter()
+
+    def end_step(self, label: str, canvas, tile_indices_nonempty, supersampling_factor, rendered: bool):
+        if self._step_start is None:
+            return
+        self.record['steps'].append({
+            'label': label,
+            'seconds': time.perf_counter() - self._step_start,
+            'width_px': canvas.width_px,
+            'height_px': canvas.height_px,
+            'rendered_pixels': round(canvas.width_px * supersampling_factor) * round(canvas.height_px * supersampling_factor) if rendered else 0,
+            'tiles': canvas.num_columns * canvas.num_rows,
+            'tiles_nonempty': len(tile_indices_nonempty),
+            'process_peak_memory_mb': _process_peak_memory_mb(),
+        })
+        self._step_start = None
+
+    def finish(self, cancelled: bool):
+        r"""Append the record to the telemetry file (only once)."""
+        if self._finished:
+            return
+        self._finished = True
+        self.record.update(
+            total_seconds=time.perf_counter() - self.start,
+            process_peak_memory_mb=_process_peak_memory_mb(),
+            cancelled=cancelled,
+        )
+        try:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(self.record) + "\n")
+            print(f"Appended render telemetry: {self.log_path}")
+        except OSError as err:
+            print(f"Failed to write render telemetry: {err}")
+
+
+def log_path(directory: str) -> str:
+    r"""The telemetry file in the given folder, or next to the outputs if the folder is empty."""
+    import bpy
+    import os
+    folder = bpy.path.abspath(directory) if directory else os.path.dirname(bpy.data.filepath)
+    return os.path.join(folder, TELEMETRY_FILE_NAME)
+
+
+def load_records(path: str) -> list[dict]:
+    records = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    pass  # ignore truncated lines of interrupted runs
+    return records
+
+
+def _step_seconds(record: dict) -> dict:
+    return {s['label']: s['seconds'] for s in record.get('steps', [])}
+
+
+def comparable(records: list[dict], record: dict) -> list[dict]:
+    r"""The completed earlier records of the same .blend file and scene."""
+    return [r for r in records if r is not record and not r.get('cancelled') and
+            r.get('blend_file') == record.get('blend_file') and r.get('scene') == record.get('scene')]
+
+
+def compare(record: dict, references: list[dict], threshold: float) -> list[tuple]:
+    r"""Compare the step timings of a record against the median of the reference
+    records (a single reference compares two runs). Returns a list of
+    (label, reference seconds, seconds, relative change, is regression) for all
+    steps of the record that occur in a reference.
+    """
+    current = _step_seconds(record)
+    ref_steps = [_step_seconds(r) for r in references]
+    rows = []
+    for label, seconds in current.items():
+        ref_values = [s[label] for s in ref_steps if label in s]
+        if not ref_values:
+            continue
+        ref = median(ref_values)
+        change = seconds / ref - 1 if ref > 0 else 0.0
+        rows.append((label, ref, seconds, change, change > threshold + 1e-9))
+    totals = [r['total_seconds'] for r in references if 'total_seconds' in r]
+    if totals and 'total_seconds' in record:
+        ref = median(totals)
+        change = record['total_seconds'] / ref - 1 if ref > 0 else 0.0
+        rows.append(("Total", ref, record['total_seconds'], change, change > threshold + 1e-9))
+    return rows
+
+
+def format_comparison(rows: list[tuple], threshold: float) -> str:
+    lines = [f"{'Step':<16} {'Reference [s]':>14} {'Current [s]':>12} {'Change':>8}"]
+    for label, ref, seconds, change, regression in rows:
+        lines.append(f"{label:<16} {ref:>14.2f} {seconds:>12.2f} {100 * change:>+7.1f}%" + ("  SLOWER" if regression else ""))
+    slower = sum(1 for row in rows if row[4])
+    lines.append(f"{slower} of {len(rows)} entries got slower by more than {100 * threshold:.0f}%")
+    return "\n".join(lines)
+
+
+def latest_completed(records: list[dict]) -> int | None:
+    r"""The index of the latest record of a run that was not cancelled."""
+    return next((i for i in reversed(range(len(records))) if not records[i].get('cancelled')), None)
+
+
+def compare_latest(records: list[dict], window: int, threshold: float) -> tuple[list[tuple], int]:
+    r"""Compare the latest completed record against the rolling median of up to `window`
+    earlier comparable records. Returns the comparison rows and the number of reference records.
+    """
+    index = latest_completed(records)
+    if index is None:
+        return [], 0
+    latest = records[index]
+    references = comparable(records[:index], latest)[-window:]
+    return compare(latest, references, threshold), len(references)
@@ -1,40 +1,120 @@
 import bpy
+from bpy.app.handlers import persistent
 import os
+import errno
+import time
+from .core.Tgi import tid_fsh, tid_s3d, tid_xml, instance_id, tgi_formatter  # noqa: F401
 
-tid_fsh = "7ab50e44"
-tid_s3d = "5ad0e817"
-tid_xml = "88777601"
 
+def get_relative_path_for(fn):
+    fp = bpy.data.filepath
+    folder = os.path.dirname(fp)
+    path = os.path.join(folder, fn)
+    return path
 
-def instance_id(z, v, count, is_night=False):
-    # This mapping should allow for more than 16 anim groups (for slicing of large BAT models).
-    # Available bits for sliced tile IDs:
-    # digit 8: 4 bits
-    # digit 7: 2 bits (2 bits rotation)
-    # digit 6: 1 bit (3 bits zoom)
-    # digit 5: (1 bit nightlight) 3 bits
-    assert count >= 0 and count < (1 << (4 + 2 + 1 + 3)), "This building is huge! It's just not going to work!"
-    offset = ((count & 0x0380) << (3 + 2)) | ((count & 0x0040) << (3 + 2)) | ((count & 0x0030) << 2) | (count & 0x000f)
-    iid = 0x30000 + (0x8000 if is_night else 0) + z * 0x100 + v * 0x10 + offset
-    return iid
 
+_SCRATCH_PREFIX = "b4b_scratch_"
+_STALE_SCRATCH_SECONDS = 24 * 3600  # scratch folders of other models are only removed after a day without changes, as they may be in use by another rendering
 
-def tgi_formatter(gid: str, z, v, count, is_model=False, prefix=False, is_night=False, is_xml=False, separator="_"):
-    iid = instance_id(z, v, count, is_night=is_night)
-    return separator.join(f"0x{i}" if prefix else i for i in [
-        (tid_s3d if is_model else tid_xml if is_xml else tid_fsh),
-        gid,
-        f"{iid:08x}",
-    ])
 
+def scratch_folder(gid: str) -> str:
+    r"""The folder for intermediate files of a model, inside the scratch directory
+    of the preferences if configured, otherwise next to the .blend file.
+    """
+    addon = bpy.context.preferences.addons.get(__package__)
+    root = bpy.path.abspath(addon.preferences.scratch_dir) if addon is not None and addon.preferences.scratch_dir else os.path.dirname(bpy.data.filepath)
+    return os.path.join(root, f"{_SCRATCH_PREFIX}{gid}")
 
-def get_relative_path_for(fn):
-    fp = bpy.data.filepath
-    folder = os.path.dirname(fp)
-    path = os.path.join(folder, fn)
+
+def scratch_path_for(fn: str, gid: str) -> str:
+    folder = scratch_folder(gid)
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, fn)
+
+
+def _last_modified(folder: str) -> float:
+    mtime = os.stat(folder).st_mtime
+    for dirpath, _, filenames in os.walk(folder):
+        for fn in filenames:
+            try:
+                mtime = max(mtime, os.stat(os.path.join(dirpath, fn)).st_mtime)
+            except OSError:
+                pass  # removed in the meantime
+    return mtime
+
+
+def clear_scratch(gid: str):
+    r"""Remove the intermediate files of a model, such as those left behind by an interrupted rendering.
+    Stale scratch folders of other models in the same scratch directory, for
+    example of renamed models or other group IDs, are removed as well.
+    """
+    import shutil
+    folder = scratch_folder(gid)
+    if os.path.isdir(folder):
+        shutil.rmtree(folder, ignore_errors=True)
+    root = os.path.dirname(folder) or os.curdir
+    try:
+        names = os.listdir(root)
+    except OSError:
+        return
+    now = time.time()
+    for name in names:
+        other = os.path.join(root, name)
+        if not name.startswith(_SCRATCH_PREFIX) or not os.path.isdir(other):
+            continue
+        try:
+            stale = now - _last_modified(other) > _STALE_SCRATCH_SECONDS
+        except OSError:
+            continue
+        if stale:
+            print(f"Removing stale scratch folder {other!r}")
+            shutil.rmtree(other, ignore_errors=True)
+
+
+def commit_output(scratch_path: str, path: str) -> str:
+    r"""Move a completed file from the scratch folder to its destination, so that
+    it appears there atomically. Across file systems, the file is copied next to
+    the destination under a temporary name first.
+    """
+    import shutil
+    try:
+        os.replace(scratch_path, path)
+    except OSError as err:
+        if err.errno != errno.EXDEV:  # the scratch folder is on a different device
+            raise
+        partial_path = path + ".partial"
+        try:
+            shutil.copyfile(scratch_path, partial_path)
+            os.replace(partial_path, path)
+        finally:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+        os.remove(scratch_path)
     return path
 
 
+def _same_value(a, b) -> bool:
+    if isinstance(a, float) or isinstance(b, float):
+        return abs(a - b) <= 1e-6 * max(1.0, abs(a), abs(b))  # properties are stored in single precision
+    if isinstance(a, str) or isinstance(b, str):
+        return a == b
+    try:
+        return len(a) == len(b) and all(_same_value(x, y) for x, y in zip(a, b))
+    except TypeError:  # not a sequence
+        return a == b
+
+
+def set_if_changed(owner, attr: str, value) -> bool:
+    r"""Assign a property only if its value differs. Every assignment tags the
+    datablock for an update, even with an unchanged value, which makes Cycles
+    discard its scene data between renderings.
+    """
+    if _same_value(getattr(owner, attr), value):
+        return False
+    setattr(owner, attr, value)
+    return True
+
+
 def translate(value, left_min, left_max, right_min, right_max):
     # Figure out how 'wide' each range is
     left_span = left_max - left_min
@@ -51,31 +131,96 @@ def clip(value: float, min: float, max: float) -> float:
     return min if value < min else max if value > max else value
 
 
+_handles = {}  # maps (pointer of scene or collection, name prefix) to the name of the resolved collection or object
+handle_stats = {'hits': 0, 'misses': 0}
+
+
+def _cached_handle(items, key, prefix: str):
+    r"""The cached item, if it is still in `items` under a name with the prefix.
+    This also covers renamed or removed items, so the cache does not need to be
+    cleared on every update.
+    """
+    cached = _handles.get(key)
+    if cached is not None:
+        try:
+            item = items.get(cached)
+            valid = item is not None and item.name.startswith(prefix)
+        except ReferenceError:  # the scene or collection of the key was removed
+            valid = False
+        if valid:
+            handle_stats['hits'] += 1
+            return item
+        del _handles[key]
+    handle_stats['misses'] += 1
+    return None
+
+
 def find_object(collection, name: str):
     r"""Look up an object in a collection by name. The name is treated as
     prefix to handle duplicate names such as `name.001`, for example when
     working with multiple scenes.
+    The result of the prefix search is cached.
     """
     if name in collection.objects:
         return collection.objects[name]
+    key = (collection.as_pointer(), name)
+    ob = _cached_handle(collection.objects, key, name)
+    if ob is not None:
+        return ob
     for ob in collection.objects:
         if ob.name.startswith(name):
+            _handles[key] = ob.name
             return ob
     return None
 
 
 def b4b_collection(create=True):
     from .Config import COLLECTION_NAME
-    for coll in bpy.context.scene.collection.children:
+    children = bpy.context.scene.collection.children
+    key = (bpy.context.scene.as_pointer(), COLLECTION_NAME)
+    coll = _cached_handle(children, key, COLLECTION_NAME)
+    if coll is not None:
+        return coll
+    for coll in children:
         if coll.name.startswith(COLLECTION_NAME):
+            _handles[key] = coll.name
             return coll
     if not create:
         return None
     coll = bpy.data.collections.new(COLLECTION_NAME)
     bpy.context.scene.collection.children.link(coll)
+    _handles[key] = coll.name
     return coll
 
 
+def invalidate_handles():
+    _handles.clear()
+
+
+@persistent
+def _depsgraph_update_post(scene, depsgraph):
+    if _handles and depsgraph.id_type_updated('COLLECTION'):
+        invalidate_handles()  # collections or objects might have been relinked, which changes the first match of a prefix
+
+
+@persistent
+def _load_post(*args):
+    invalidate_handles()  # pointers are not valid across files
+
+
+def register_handlers():
+    bpy.app.handlers.depsgraph_update_post.append(_depsgraph_update_post)
+    bpy.app.handlers.load_post.append(_load_post)
+
+
+def unregister_handlers():
+    for handlers, f in [(bpy.app.handlers.depsgraph_update_post, _depsgraph_update_post),
+                        (bpy.app.handlers.load_post, _load_post)]:
+        if f in handlers:
+            handlers.remove(f)
+    invalidate_handles()
+
+
 def blend_file_name():
     return bpy.path.display_name_from_filepath(bpy.context.blend_data.filepath)
 
@@ -12,21 +12,89 @@ def _ensure_cycles(context):
         context.scene.render.engine = 'CYCLES'
 
 
+_asset_index = None  # persisted map of asset .blend files to their mtime, size and datablock names
+_asset_files = {}  # maps (assets folder, its mtime) to the .blend files found in it
+_loaded_mtimes = {}  # maps (coll_name, name, blend file) to the mtime of the blend file when the datablock was last linked
+
+
+def _asset_index_path() -> Path:
+    return Path(bpy.utils.user_resource('CONFIG', path="BAT4Blender", create=True)) / "asset_index.json"
+
+
+def _scan_blend_file(blend_file: Path) -> dict:
+    with bpy.data.libraries.load(str(blend_file), link=True, assets_only=True) as (data_src, _):
+        return {attr: list(names) for attr in dir(data_src)
+                if isinstance(names := getattr(data_src, attr), list) and names}
+
+
+def _indexed_assets(library_path: Path) -> dict:
+    r"""Return the index entries of all .blend files in the assets folder, in
+    the order of discovery. Only files whose mtime or size changed are rescanned.
+    """
+    import json
+    global _asset_index
+    if _asset_index is None:
+        try:
+            with open(_asset_index_path(), encoding='utf-8') as f:
+                _asset_index = json.load(f)
+        except (OSError, ValueError):
+            _asset_index = {}
+    key = (str(library_path), library_path.stat().st_mtime if library_path.exists() else None)
+    if key not in _asset_files:
+        _asset_files[key] = [fp for fp in library_path.rglob("*.blend") if fp.is_file()]
+    entries = {}
+    changed = False
+    for fp in _asset_files[key]:
+        st = fp.stat()
+        entry = _asset_index.get(str(fp))
+        if entry is None or entry['mtime'] != st.st_mtime or entry['size'] != st.st_size:
+            print(f"Indexing BAT4Blender assets in '{fp}'")
+            entry = {'mtime': st.st_mtime, 'size': st.st_size, 'datablocks': _scan_blend_file(fp)}
+            _asset_index[str(fp)] = entry
+            changed = True
+        entries[str(fp)] = entry
+    if changed:
+        try:
+            with open(_asset_index_path(), 'w', encoding='utf-8') as f:
+                json.dump(_asset_index, f, indent=1)
+        except OSError as err:
+            print(f"Failed to save BAT4Blender asset index: {err}")
+    return entries
+
+
+def _same_file(p1: str, p2: str) -> bool:
+    import os
+    return os.path.normcase(os.path.realpath(p1)) == os.path.normcase(os.path.realpath(p2))
+
+
 def _load_asset(coll_name, name, *, debug_label="Asset"):
-    data_coll = getattr(bpy.data, coll_name)
-    if name in data_coll:
-        data_coll.remove(data_coll[name], do_unlink=True)
     import BAT4Blender
     library_path = Path(BAT4Blender.__file__).with_name("assets")
-    print(f"Loading BAT4Blender assets from '{library_path}'")
-    blend_files = [fp for fp in library_path.rglob("*.blend") if fp.is_file()]
-    for blend_file in reversed(blend_files):
-        with bpy.data.libraries.load(str(blend_file), link=True, assets_only=True) as (data_src, b4b_asset_lib):
-            setattr(b4b_asset_lib, coll_name, [s for s in getattr(data_src, coll_name) if s == name][:1])
-        lib_coll = getattr(b4b_asset_lib, coll_name)
-        if lib_coll:
-            return lib_coll[0]
-    raise BAT4BlenderUserError(f"{debug_label} {name!r} not found in assets '{library_path}'")
+    entries = _indexed_assets(library_path)
+    candidates = [fp for fp, entry in entries.items() if name in entry['datablocks'].get(coll_name, [])]
+    if not candidates:
+        raise BAT4BlenderUserError(f"{debug_label} {name!r} not found in assets '{library_path}'")
+    blend_file = candidates[-1]  # later files take precedence
+    mtime = entries[blend_file]['mtime']
+
+    data_coll = getattr(bpy.data, coll_name)
+    existing = data_coll.get(name)
+    if (existing is not None and existing.library is not None and
+            _same_file(bpy.path.abspath(existing.library.filepath), blend_file) and
+            _loaded_mtimes.get((coll_name, name, blend_file)) == mtime):
+        print(f"{debug_label} {name!r} is already linked from '{blend_file}'")
+        return existing
+    if existing is not None:
+        data_coll.remove(existing, do_unlink=True)
+    print(f"Loading BAT4Blender assets from '{blend_file}'")
+    with bpy.data.libraries.load(blend_file, link=True, assets_only=True) as (data_src, b4b_asset_lib):
+        setattr(b4b_asset_lib, coll_name, [name])
+    lib_coll = getattr(b4b_asset_lib, coll_name)
+    if not lib_coll or lib_coll[0] is None:
+        _asset_index.pop(blend_file, None)  # index is outdated, so rescan next time
+        raise BAT4BlenderUserError(f"{debug_label} {name!r} could not be loaded from '{blend_file}'")
+    _loaded_mtimes[(coll_name, name, blend_file)] = mtime
+    return lib_coll[0]
 
 
 def setup_world(context, world_name=WORLD_NAME):
@@ -37,7 +105,7 @@ def setup_world(context, world_name=WORLD_NAME):
 
 def setup_compositing(context):
     _ensure_cycles(context)
-    b4b_compositing = _load_asset('node_groups', name=COMPOSITING_NAME, debug_label="Node group")  # removes previous group_node.node_tree if it existed
+    b4b_compositing = _load_asset('node_groups', name=COMPOSITING_NAME, debug_label="Node group")  # removes previous group_node.node_tree if it was outdated
     if bpy.app.version >= (5, 0, 0):  # Blender 5.0+
         for g in bpy.data.node_groups:
             if g.name == COMPOSITING_NODETREE_NAME:
@@ -55,7 +123,7 @@ def setup_compositing(context):
     rlayers_node = tree.nodes.get('Render Layers') or tree.nodes.new(type='CompositorNodeRLayers')
 
     for node in tree.nodes:  # remove previous group_node if it existed
-        if isinstance(node, bpy.types.CompositorNodeGroup) and node.node_tree is None:
+        if isinstance(node, bpy.types.CompositorNodeGroup) and node.node_tree in (None, b4b_compositing):
             tree.nodes.remove(node)
     group_node = tree.nodes.new(type='CompositorNodeGroup')
     group_node.node_tree = b4b_compositing
@@ -1,6 +1,11 @@
-import bpy
-from .GUI import B4BWmProps, B4BSceneProps, MainPanel, SuperSamplingPanel, PostProcessPanel, AdvancedPanel, B4BPreferences, DayNightSelectMenu
-from . import GUI_ops
+import time
+_import_start = time.perf_counter()
+import bpy  # noqa: E402
+from .GUI import B4BQueueEntry, B4BWmProps, B4BSceneProps, MainPanel, SuperSamplingPanel, PostProcessPanel, AdvancedPanel, RenderQueuePanel, B4B_UL_RenderQueue, B4BPreferences, DayNightSelectMenu  # noqa: E402
+from . import GUI_ops  # noqa: E402
+from . import DayNight  # noqa: E402
+from . import Utils  # noqa: E402
+_import_duration = time.perf_counter() - _import_start
 
 bl_info = {
     "name": "BAT4Blender",
@@ -15,8 +20,11 @@ bl_info = {
 
 
 # note: registering is order dependent! i.e. registering layout before vars will throw errors
+# The heavy modules (rendering, slicing, NumPy, bmesh) are only imported by the operators on first use.
 def register():
     print("Registering addon BAT4Blender.")
+    start = time.perf_counter()
+    bpy.utils.register_class(B4BQueueEntry)
     bpy.utils.register_class(B4BWmProps)
     bpy.types.WindowManager.b4b = bpy.props.PointerProperty(type=B4BWmProps)
     bpy.utils.register_class(B4BSceneProps)
@@ -27,10 +35,14 @@ def register():
     bpy.utils.register_class(SuperSamplingPanel)
     bpy.utils.register_class(PostProcessPanel)
     bpy.utils.register_class(AdvancedPanel)
+    bpy.utils.register_class(RenderQueuePanel)
+    bpy.utils.register_class(B4B_UL_RenderQueue)
     bpy.utils.register_class(DayNightSelectMenu)
     bpy.utils.register_class(GUI_ops.B4BPreview)
     bpy.utils.register_class(GUI_ops.B4BPreviewDownSampling)
     bpy.utils.register_class(GUI_ops.B4BRender)
+    bpy.utils.register_class(GUI_ops.B4BRenderPlan)
+    bpy.utils.register_class(GUI_ops.B4BTelemetryCompare)
     bpy.utils.register_class(GUI_ops.B4BLODFitZoom)
     bpy.utils.register_class(GUI_ops.B4BLODAdd)
     bpy.utils.register_class(GUI_ops.B4BLODDelete)
@@ -39,25 +51,42 @@ def register():
     bpy.utils.register_class(GUI_ops.B4BWorldSetup)
     bpy.utils.register_class(GUI_ops.B4BCompositingSetup)
     bpy.utils.register_class(GUI_ops.B4BGidRandomize)
+    bpy.utils.register_class(GUI_ops.B4BQueueAdd)
+    bpy.utils.register_class(GUI_ops.B4BQueueRemove)
+    bpy.utils.register_class(GUI_ops.B4BQueueMove)
+    bpy.utils.register_class(GUI_ops.B4BQueueClear)
+    bpy.utils.register_class(GUI_ops.B4BQueueRun)
+    bpy.utils.register_class(GUI_ops.B4BQueueCancel)
     bpy.utils.register_class(GUI_ops.OkOperator)
     bpy.utils.register_class(GUI_ops.MessageOperator)
+    DayNight.register()
+    Utils.register_handlers()
+    print(f"Registered addon BAT4Blender in {1000 * (time.perf_counter() - start):.1f} ms "
+          f"(module import {1000 * _import_duration:.1f} ms).")
 
 
 def unregister():
     print("Unregistering addon BAT4Blender.")
+    DayNight.unregister()
+    Utils.unregister_handlers()
     del bpy.types.WindowManager.b4b
     del bpy.types.Scene.b4b
     bpy.utils.unregister_class(B4BWmProps)
+    bpy.utils.unregister_class(B4BQueueEntry)
     bpy.utils.unregister_class(B4BSceneProps)
     bpy.utils.unregister_class(B4BPreferences)
     bpy.utils.unregister_class(MainPanel)
     bpy.utils.unregister_class(SuperSamplingPanel)
     bpy.utils.unregister_class(PostProcessPanel)
     bpy.utils.unregister_class(AdvancedPanel)
+    bpy.utils.unregister_class(RenderQueuePanel)
+    bpy.utils.unregister_class(B4B_UL_RenderQueue)
     bpy.utils.unregister_class(DayNightSelectMenu)
     bpy.utils.unregister_class(GUI_ops.B4BPreview)
     bpy.utils.unregister_class(GUI_ops.B4BPreviewDownSampling)
     bpy.utils.unregister_class(GUI_ops.B4BRender)
+    bpy.utils.unregister_class(GUI_ops.B4BRenderPlan)
+    bpy.utils.unregister_class(GUI_ops.B4BTelemetryCompare)
     bpy.utils.unregister_class(GUI_ops.B4BLODFitZoom)
     bpy.utils.unregister_class(GUI_ops.B4BLODAdd)
     bpy.utils.unregister_class(GUI_ops.B4BLODDelete)
@@ -66,5 +95,11 @@ def unregister():
     bpy.utils.unregister_class(GUI_ops.B4BWorldSetup)
     bpy.utils.unregister_class(GUI_ops.B4BCompositingSetup)
     bpy.utils.unregister_class(GUI_ops.B4BGidRandomize)
+    bpy.utils.unregister_class(GUI_ops.B4BQueueAdd)
+    bpy.utils.unregister_class(GUI_ops.B4BQueueRemove)
+    bpy.utils.unregister_class(GUI_ops.B4BQueueMove)
+    bpy.utils.unregister_class(GUI_ops.B4BQueueClear)
+    bpy.utils.unregister_class(GUI_ops.B4BQueueRun)
+    bpy.utils.unregister_class(GUI_ops.B4BQueueCancel)
     bpy.utils.unregister_class(GUI_ops.OkOperator)
     bpy.utils.unregister_class(GUI_ops.MessageOperator)
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from math import radians, sin, cos
+from .Canvas import Canvas
+from .Enums import Rotation
+
+camera_range = 190  # (initial) distance of camera from origin
+angle_zoom = [radians(60), radians(55), radians(50), radians(45)]
+angle_rotation = [radians(-67.5), radians(22.5), radians(112.5), radians(202.5)]
+zoom_sizes = [8, 16, 32, 73, 146]  # from SFCameraRigHD.ms (horizontal extent of 16×16 cell in pixels)
+zoom_sizes_hd = [8, 16, 32, 73, 292]
+extra_camera_offset = 80  # distance to keep between camera and lod
+
+
+@dataclass
+class CameraSolution:
+    r"""Camera placement and canvas size for one view, see `solve_views`."""
+    ortho_scale: float
+    shift_x: float
+    shift_y: float
+    location: tuple[float, float, float]
+    rotation_euler: tuple[float, float, float]
+    width_px: int
+    height_px: int
+
+    def axes(self):
+        r"""The right, up and backward axes of the camera in world coordinates (as NumPy arrays)."""
+        import numpy as np
+        pitch, _, yaw90 = self.rotation_euler
+        right = np.array([cos(yaw90), sin(yaw90), 0.0])
+        up = np.array([-sin(yaw90) * cos(pitch), cos(yaw90) * cos(pitch), sin(pitch)])
+        back = np.array([sin(yaw90) * sin(pitch), -cos(yaw90) * sin(pitch), cos(pitch)])
+        return right, up, back
+
+    def project_px(self, coords):
+        r"""Map world coordinates of shape (n, 3) to pixel coordinates on the
+        canvas (origin at the top left) and to the distance from the camera.
+        """
+        import numpy as np
+        right, up, back = self.axes()
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 3)
+        dim = max(self.width_px, self.height_px)
+        px_per_m = dim / self.ortho_scale
+        left = self.shift_x * self.ortho_scale - self.width_px / 2 / px_per_m
+        top = self.shift_y * self.ortho_scale + self.height_px / 2 / px_per_m
+        x = (coords @ right - left) * px_per_m
+        y = (top - coords @ up) * px_per_m
+        depth = np.dot(self.location, back) - coords @ back
+        return np.stack([x, y], axis=-1), depth
+
+
+def location_and_rotation(rotation: Rotation, zoom) -> tuple:
+    r"""The initial location and rotation (Euler angles) of the camera for a view."""
+    pitch = angle_zoom[min(zoom.value, len(angle_zoom) - 1)]  # zoom 4, 5 & 6 all use the same camera angle
+    yaw = angle_rotation[rotation.value]
+
+    x = camera_range * sin(pitch) * cos(yaw)
+    y = camera_range * sin(pitch) * sin(yaw)
+    z = camera_range * cos(pitch)
+    loc = (x, y, z)
+    rot = (pitch, 0, yaw + radians(90))  # need to add 90 for proper camera location in scene
+    return loc, rot
+
+
+def solve_views(lod_vertices: dict, hd: bool, margin: int, rotations=tuple(Rotation)) -> dict:
+    r"""Compute the camera placement and canvas size for all given zooms and
+    rotations at once, without evaluating the depsgraph.
+
+    The `lod_vertices` map each zoom to an array of shape (n, 3) of the LOD
+    vertices in world coordinates. The result maps (zoom, rotation) to a `CameraSolution`.
+
+    This is the closed form of fitting the camera to the 16×16 reference cell
+    and to the LOD (as with `cam.camera_fit_coords` at a square resolution),
+    creating the canvas with slop margin and offsetting the camera so that
+    the LOD is aligned with the top left corner of the canvas.
+    """
+    import numpy as np
+    zooms = list(lod_vertices)
+    n = max(len(lod_vertices[z]) for z in zooms)
+    verts = np.full((len(zooms), n, 3), np.nan)  # padded with NaN, as LODs differ in size
+    for i, z in enumerate(zooms):
+        verts[i, :len(lod_vertices[z])] = lod_vertices[z]
+
+    pitch = np.array([angle_zoom[min(z.value, len(angle_zoom) - 1)] for z in zooms])[:, None]  # zoom 4, 5 & 6 all use the same camera angle
+    yaw = np.array([angle_rotation[v.value] for v in rotations])[None, :]
+    pitch, yaw = np.broadcast_arrays(pitch, yaw)  # shape (zooms, rotations)
+    # axes of the camera coordinate system for rotation_euler = (pitch, 0, yaw + 90°)
+    right = np.stack([-np.sin(yaw), np.cos(yaw), np.zeros_like(yaw)], axis=-1)
+    up = np.stack([-np.cos(yaw) * np.cos(pitch), -np.sin(yaw) * np.cos(pitch), np.sin(pitch)], axis=-1)
+    back = np.stack([np.cos(yaw) * np.sin(pitch), np.sin(yaw) * np.sin(pitch), np.cos(pitch)], axis=-1)
+
+    # We use a 16m × 16m cell centered at origin as reference.
+    # Its rendered (horizontal) dimension is zoom_sizes[zoom.value] in pixels.
+    cell = np.array([[-8, -8, 0], [-8, 8, 0], [8, -8, 0], [8, 8, 0]], dtype=np.float64)
+    cell_x = np.einsum('zrk,ck->zrc', right, cell)
+    cell_y = np.einsum('zrk,ck->zrc', up, cell)
+    os_reference = np.maximum(np.ptp(cell_x, axis=-1), np.ptp(cell_y, axis=-1))
+    sizes = np.array([(zoom_sizes_hd if hd else zoom_sizes)[z.value] for z in zooms], dtype=np.float64)[:, None]
+    px_per_m = sizes / os_reference
+
+    lod_x = np.einsum('zrk,znk->zrn', right, verts)
+    lod_y = np.einsum('zrk,znk->zrn', up, verts)
+    lod_depth = np.einsum('zrk,znk->zrn', back, verts)
+    x_min, x_max = np.nanmin(lod_x, axis=-1), np.nanmax(lod_x, axis=-1)
+    y_min, y_max = np.nanmin(lod_y, axis=-1), np.nanmax(lod_y, axis=-1)
+    cam_range = np.nanmax(lod_depth, axis=-1) + extra_camera_offset
+
+    solutions = {}
+    for i, z in enumerate(zooms):
+        for j, v in enumerate(rotations):
+            ppm = px_per_m[i, j]
+            w = Canvas._round_up_to_fsh_chunk((x_max[i, j] - x_min[i, j]) * ppm + 2 * margin)
+            h = Canvas._round_up_to_fsh_chunk((y_max[i, j] - y_min[i, j]) * ppm + 2 * margin)
+            dim = max(w, h)
+            # the LOD is aligned with the top and left edges of the image, accounting for the slop margin
+            x_left = x_min[i, j] * ppm + w / 2
+            y_top = y_max[i, j] * ppm + h / 2
+            solutions[(z, v)] = CameraSolution(
+                ortho_scale=float(dim / ppm),
+                shift_x=float((x_left - margin) / dim),
+                shift_y=float((y_top - (h - margin)) / dim),
+                location=tuple(float(c) for c in back[i, j] * cam_range[i, j]),
+                rotation_euler=(float(pitch[i, j]), 0.0, float(yaw[i, j]) + radians(90)),
+                width_px=w,
+                height_px=h,
+            )
+    return solutions
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from math import ceil
+
+_MAX_TILE_SIZE_PX = 256
+_MIN_TILE_SIZE_PX = 4
+
+
+class Canvas:
+    r"""A 2D rendering canvas, divided into tiles of size at most 256 px.
+    """
+    width_px: int
+    height_px: int
+    num_columns: int
+    num_rows: int
+
+    def __init__(self, width_px: int, height_px: int):
+        assert width_px % _MIN_TILE_SIZE_PX == 0 and height_px % _MIN_TILE_SIZE_PX == 0, "FSH dimensions must be multiple of 4"
+        self.width_px = width_px
+        self.height_px = height_px
+        self.num_columns = ceil(width_px / _MAX_TILE_SIZE_PX)
+        self.num_rows = ceil(height_px / _MAX_TILE_SIZE_PX)
+
+    @staticmethod
+    def _round_up_to_fsh_chunk(f) -> int:
+        cnt, rem = divmod(ceil(f), _MAX_TILE_SIZE_PX)
+        result = cnt * _MAX_TILE_SIZE_PX + (0 if rem == 0 else
+                                            8 if rem <= 8 else
+                                            16 if rem <= 16 else
+                                            32 if rem <= 32 else
+                                            64 if rem <= 64 else
+                                            128 if rem <= 128 else
+                                            _MAX_TILE_SIZE_PX)
+        return result
+
+    def tile_dimensions_px(self, row: int, col: int) -> (int, int):
+        assert 0 <= row and row < self.num_rows
+        assert 0 <= col and col < self.num_columns
+        w = self.width_px - col * _MAX_TILE_SIZE_PX if col == self.num_columns - 1 else _MAX_TILE_SIZE_PX
+        h = self.height_px - row * _MAX_TILE_SIZE_PX if row == self.num_rows - 1 else _MAX_TILE_SIZE_PX
+        return w, h
+
+    def tiles(self) -> Iterator[(int, int)]:
+        for row in range(self.num_rows):
+            for col in range(self.num_columns):
+                yield row, col
+
+    def tile_border_px_LRTB(self, row: int, col: int) -> (int, int, int, int):
+        l = col * _MAX_TILE_SIZE_PX
+        r = min((col + 1) * _MAX_TILE_SIZE_PX, self.width_px)
+        t = row * _MAX_TILE_SIZE_PX
+        b = min((row + 1) * _MAX_TILE_SIZE_PX, self.height_px)
+        return l, r, t, b
+
+    def tile_border_fractional_LRTB(self, row: int, col: int) -> (float, float, float, float):
+        l, r, t, b = self.tile_border_px_LRTB(row=row, col=col)
+        return l / self.width_px, r / self.width_px, t / self.height_px, b / self.height_px
+
+    def bands(self, rows_per_band: int, overlap_px: int, scale: float = 1) -> list[tuple[int, int, int, int]]:
+        r"""Split the canvas into horizontal bands of whole tile rows for banded
+        rendering, in pixel rows from the top at `scale` times the canvas resolution.
+        Returns tuples (render_top, render_bottom, keep_top, keep_bottom) of the
+        rendered rows, which overlap the neighbouring bands, and the rows kept from them.
+        """
+        height = round(self.height_px * scale)
+        band_px = round(rows_per_band * _MAX_TILE_SIZE_PX * scale)
+        overlap = round(overlap_px * scale)
+        return [(max(top - overlap, 0), min(top + band_px + overlap, height), top, min(top + band_px, height))
+                for top in range(0, height, band_px)]
+
+
+def bilinear(top_l, top_r, bot_l, bot_r, sx: float, sy: float) -> tuple:
+    r"""Interpolate between the four corners of a frame (given as coordinate
+    tuples), where (sx, sy) = (0, 0) is the top left and (1, 1) the bottom right.
+    """
+    return tuple((tl * (1-sy) + bl * sy) * (1-sx) + (tr * (1-sy) + br * sy) * sx
+                 for tl, tr, bl, br in zip(top_l, top_r, bot_l, bot_r))
@@ -0,0 +1,31 @@
+from enum import Enum
+
+
+class Rotation(Enum):
+    SOUTH = 0
+    EAST = 1
+    NORTH = 2
+    WEST = 3
+
+    def compass_name(self) -> str:
+        return self.name[0]
+
+
+class Zoom(Enum):
+    ONE = 0
+    TWO = 1
+    THREE = 2
+    FOUR = 3
+    FIVE = 4
+
+
+class NightMode(Enum):
+    DAY = 0
+    MAXIS_NIGHT = 1
+    DARK_NIGHT = 2
+
+    def label(self) -> str:
+        match self:
+            case NightMode.DAY: return "Day"
+            case NightMode.MAXIS_NIGHT: return "MN"
+            case NightMode.DARK_NIGHT: return "DN"
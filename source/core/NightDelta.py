@@ -0,0 +1,21 @@
+r"""Comparison of night tiles with their Day counterparts.
+
+If a night texture is missing, the game displays the Day texture with its own
+night tint. A night tile therefore only needs to be stored if it differs from
+the tinted Day tile, for example because it contains lit windows.
+"""
+import numpy as np
+
+
+def is_unlit(night, day, tint, color_tolerance: float, alpha_tolerance: float) -> bool:
+    r"""Whether the night tile matches the Day tile after applying the night tint.
+    The tiles are float arrays of shape (height, width, 4) with values in [0, 1].
+    Colors are compared with premultiplied alpha, so fully transparent pixels
+    do not matter.
+    """
+    if night.shape != day.shape or night.shape[-1] < 4:
+        return False
+    if np.abs(night[..., 3] - day[..., 3]).max(initial=0.0) > alpha_tolerance:
+        return False
+    tinted_day = day[..., :3] * np.asarray(tint, dtype=np.float32) * day[..., 3:4]
+    return np.abs(night[..., :3] * night[..., 3:4] - tinted_day).max(initial=0.0) <= color_tolerance
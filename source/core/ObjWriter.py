@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+from .Enums import Rotation
+
+
+@dataclass
+class ObjMesh:
+    r"""Triangulated mesh data of a LOD slice in Blender world coordinates,
+    with one uv coordinate per vertex.
+    """
+    name: str
+    material: str
+    vertices: list[tuple[float, float, float]]
+    uvs: list[tuple[float, float]]
+    triangles: list[tuple[int, int, int]]
+
+
+def _axis_converter(rotation: Rotation):
+    r"""Map Blender coordinates (forward Y, up Z) to the OBJ coordinates with up
+    axis Y and a forward axis depending on the view rotation, matching the axes
+    previously passed to the OBJ export operators.
+    """
+    match rotation:
+        case Rotation.SOUTH: return lambda x, y, z: (x, z, -y)  # forward -Z
+        case Rotation.EAST:  return lambda x, y, z: (y, z, x)  # forward X
+        case Rotation.NORTH: return lambda x, y, z: (-x, z, y)  # forward Z
+        case Rotation.WEST:  return lambda x, y, z: (-y, z, -x)  # forward -X
+
+
+def _name_compat(name: str) -> str:
+    return name.replace(' ', '_')  # like the Blender exporters
+
+
+def write_obj(filepath: str, meshes: Iterable[ObjMesh], rotation: Rotation):
+    r"""Stream the meshes as a single .obj file without a .mtl material library.
+    Only the `usemtl` material names are written, as these encode the instance IDs of the slices.
+    """
+    convert = _axis_converter(rotation)
+    offset = 1  # OBJ indices are 1-based and global for the whole file
+    with open(filepath, 'w', encoding='utf-8', newline='\n') as f:
+        f.write("# BAT4Blender\n")
+        for mesh in meshes:
+            f.write(f"o {_name_compat(mesh.name)}\n")
+            for co in mesh.vertices:
+                x, y, z = convert(*co)
+                f.write(f"v {x:.6f} {y:.6f} {z:.6f}\n")
+            for u, v in mesh.uvs:
+                f.write(f"vt {u:.6f} {v:.6f}\n")
+            f.write("s 0\n")
+            f.write(f"usemtl {_name_compat(mesh.material)}\n")
+            for tri in mesh.triangles:
+                a, b, c = (i + offset for i in tri)
+                f.write(f"f {a}/{a} {b}/{b} {c}/{c}\n")
+            offset += len(mesh.vertices)
@@ -0,0 +1,62 @@
+import numpy as np
+
+
+def _edge(u, v, px, py):
+    return (v[0] - u[0]) * (py - u[1]) - (v[1] - u[1]) * (px - u[0])
+
+
+def _rasterize(xy, depth, tri, width: int, height: int):
+    r"""Return the pixel window, the coverage mask of the pixel centers and the
+    interpolated depth of a single triangle, or None if no pixel center is covered.
+    """
+    p = xy[tri]
+    x0 = max(int(np.floor(p[:, 0].min())), 0)
+    x1 = min(int(np.ceil(p[:, 0].max())), width)
+    y0 = max(int(np.floor(p[:, 1].min())), 0)
+    y1 = min(int(np.ceil(p[:, 1].max())), height)
+    if x0 >= x1 or y0 >= y1:
+        return None
+    a, b, c = p
+    area = _edge(a, b, c[0], c[1])
+    if abs(area) < 1e-12:
+        return None  # degenerate triangle seen edge-on
+    px, py = np.meshgrid(np.arange(x0, x1) + 0.5, np.arange(y0, y1) + 0.5)
+    w0 = _edge(b, c, px, py) / area
+    w1 = _edge(c, a, px, py) / area
+    w2 = _edge(a, b, px, py) / area
+    inside = (w0 >= -1e-9) & (w1 >= -1e-9) & (w2 >= -1e-9)
+    if not inside.any():
+        return None
+    d = depth[tri]
+    z = w0 * d[0] + w1 * d[1] + w2 * d[2]
+    return (y0, y1, x0, x1), inside, z
+
+
+def occluded_triangles(xy, depth, triangles, width: int, height: int, eps: float):
+    r"""Determine which triangles are fully occluded by other triangles.
+
+    The vertex coordinates `xy` are given in pixels with the origin at the top left
+    of the canvas, and `depth` is the distance from the camera (larger is farther).
+    A triangle counts as occluded if it covers at least one pixel center and is
+    behind the nearest depth (by more than `eps`) at all of them. Triangles that do
+    not cover any pixel center are never reported as occluded, to stay conservative.
+    """
+    xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+    depth = np.asarray(depth, dtype=np.float64).reshape(-1)
+    zbuf = np.full((height, width), np.inf)
+    rasterized = []
+    for tri in np.asarray(triangles, dtype=np.int64).reshape(-1, 3):
+        r = _rasterize(xy, depth, tri, width, height)
+        rasterized.append(r)
+        if r is not None:
+            (y0, y1, x0, x1), inside, z = r
+            window = zbuf[y0:y1, x0:x1]
+            np.minimum(window, np.where(inside, z, np.inf), out=window)
+
+    occluded = np.zeros(len(rasterized), dtype=bool)
+    for i, r in enumerate(rasterized):
+        if r is not None:
+            (y0, y1, x0, x1), inside, z = r
+            occluded[i] = not np.any(z[inside] <= zbuf[y0:y1, x0:x1][inside] + eps)
+    return occluded
+
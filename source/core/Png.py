@@ -0,0 +1,67 @@
+r"""A streaming PNG writer for images that are assembled row by row.
+
+The rows are compressed as they are written, so only the rows passed to a
+single `write_rows` call are held in memory, not the whole image.
+"""
+import struct
+import zlib
+import numpy as np
+
+_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+_COLOR_TYPES = {1: 0, 2: 4, 3: 2, 4: 6}  # maps channels to grayscale, grayscale with alpha, RGB and RGBA
+_IDAT_SIZE = 1 << 20
+
+
+class PngWriter:
+    def __init__(self, path: str, width: int, height: int, channels: int, bit_depth: int):
+        assert bit_depth in (8, 16), "Only 8 and 16 bits per channel are supported"
+        self._f = open(path, 'wb')
+        self._width, self._height, self._channels, self._bit_depth = width, height, channels, bit_depth
+        self._rows_written = 0
+        self._compressor = zlib.compressobj()
+        self._pending = b''
+        self._f.write(_SIGNATURE)
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, bit_depth, _COLOR_TYPES[channels], 0, 0, 0))
+
+    def _chunk(self, kind: bytes, data: bytes):
+        self._f.write(struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+    def _flush_idat(self, final: bool = False):
+        while len(self._pending) >= _IDAT_SIZE or (final and self._pending):
+            self._chunk(b'IDAT', self._pending[:_IDAT_SIZE])
+            self._pending = self._pending[_IDAT_SIZE:]
+
+    def write_rows(self, rows):
+        r"""Append rows from top to bottom, given as integer array of shape (n, width, channels)
+        with values in the range of the bit depth.
+        """
+        rows = np.asarray(rows)
+        assert rows.shape[1:] == (self._width, self._channels), f"Unexpected shape of rows: {rows.shape}"
+        data = rows.astype('>u2' if self._bit_depth == 16 else np.uint8).reshape(rows.shape[0], -1).view(np.uint8)
+        filtered = np.zeros((rows.shape[0], data.shape[1] + 1), dtype=np.uint8)  # filter type 0 (None) at the start of each row
+        filtered[:, 1:] = data
+        self._pending += self._compressor.compress(filtered.tobytes())
+        self._rows_written += rows.shape[0]
+        self._flush_idat()
+
+    def close(self):
+        try:
+            assert self._rows_written == self._height, f"{self._rows_written} rows written instead of {self._height}"
+            self._pending += self._compressor.flush()
+            self._flush_idat(final=True)
+            self._chunk(b'IEND', b'')
+        finally:
+            self._f.close()
+
+    def abort(self):
+        r"""Close the file without completing the image."""
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
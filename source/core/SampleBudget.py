@@ -0,0 +1,63 @@
+r"""Choice of the sample count of a view from the noise of low-sample pre-passes.
+
+Two pre-passes with different seeds and `n` samples each give independent
+estimates of every pixel. Their difference has a variance of `2 σ² / n`, where
+σ² is the variance of a single sample of the pixel, so `σ² / t²` samples are
+needed to reach the noise level `t`. Only the pixels of the tiles that are
+stored are taken into account.
+"""
+from dataclasses import dataclass
+import math
+import numpy as np
+
+NOISE_PERCENTILE = 95  # the noisiest pixels are left to adaptive sampling
+
+
+@dataclass
+class Budget:
+    samples: int
+    adaptive_threshold: float
+    noise: float  # standard deviation of a single sample at NOISE_PERCENTILE
+
+    def seconds_saved(self, seconds_per_sample: float, base_samples: int) -> float:
+        r"""Estimated render time saved compared to the configured number of samples (negative if more samples are used)."""
+        return (base_samples - self.samples) * seconds_per_sample
+
+
+def shipped_mask(canvas, tile_indices_nonempty, height: int, width: int):
+    r"""A boolean mask of the pixels of an image of the given size (rows from bottom to top)
+    that cover the non-empty tiles of the canvas, for images rendered at a different scale.
+    """
+    mask = np.zeros((height, width), dtype=bool)
+    sy, sx = height / canvas.height_px, width / canvas.width_px
+    for row, col in tile_indices_nonempty:
+        left, right, top0, bottom0 = canvas.tile_border_px_LRTB(row, col)
+        top = canvas.height_px - top0
+        bottom = canvas.height_px - bottom0
+        mask[int(bottom * sy):math.ceil(top * sy), int(left * sx):math.ceil(right * sx)] = True
+    return mask
+
+
+def sample_variances(a, b, prepass_samples: int, mask):
+    r"""The single-sample variances of the visible pixels in the mask, estimated
+    from two independent pre-passes of shape (height, width, channels).
+    Colors are compared with premultiplied alpha.
+    """
+    if a.shape[-1] >= 4:
+        visible = mask & ((a[..., 3] > 0) | (b[..., 3] > 0))
+        diff = a[..., :3] * a[..., 3:4] - b[..., :3] * b[..., 3:4]
+    else:
+        visible = mask
+        diff = a - b
+    return prepass_samples * np.mean(np.square(diff[visible]), axis=-1) / 2
+
+
+def choose(variances, noise_target: float, min_samples: int, max_samples: int) -> Budget:
+    r"""The number of samples for which the noise of most pixels stays below the target,
+    with adaptive sampling stopping early in the smoother regions.
+    """
+    if variances.size == 0:
+        return Budget(samples=min_samples, adaptive_threshold=noise_target, noise=0.0)
+    variance = float(np.percentile(variances, NOISE_PERCENTILE))
+    samples = math.ceil(variance / noise_target ** 2)
+    return Budget(samples=max(min_samples, min(max_samples, samples)), adaptive_threshold=noise_target, noise=math.sqrt(variance))
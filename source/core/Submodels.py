@@ -0,0 +1,97 @@
+r"""Partitioning of models that exceed the instance ID space into sub-models.
+
+The instance IDs of the slices of a view have 10 bits (see `Tgi.instance_id`),
+so a view can have at most 1024 slices. Larger models are split along the X and
+Y axes into a grid of parts. Each part is a separate model with its own LODs,
+textures and Group ID, so the parts can be rendered as independent jobs.
+"""
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass
+
+MAX_SLICES_PER_VIEW = 1 << 10
+
+
+def grid_size(max_slices: int, headroom: float = 0.8) -> int:
+    r"""The number of parts along each axis, such that every part is expected
+    to stay below the slice limit with some headroom. The number of slices
+    scales with the footprint area, so a grid of k×k parts has about 1/k² of the
+    slices per part.
+    """
+    k = 1
+    while max_slices > MAX_SLICES_PER_VIEW * headroom * k * k:
+        k += 1
+    return k
+
+
+def grid_regions(x_min: float, x_max: float, y_min: float, y_max: float, grid: int) -> list[tuple[float, float, float, float]]:
+    r"""Split the footprint into grid×grid regions (x_min, x_max, y_min, y_max).
+    The outer borders are unbounded, so that nothing is cut off at the edges.
+    """
+    inf = float('inf')
+    xs = [-inf] + [x_min + (x_max - x_min) * i / grid for i in range(1, grid)] + [inf]
+    ys = [-inf] + [y_min + (y_max - y_min) * j / grid for j in range(1, grid)] + [inf]
+    return [(xs[i], xs[i+1], ys[j], ys[j+1]) for j in range(grid) for i in range(grid)]
+
+
+def overlaps(region: tuple[float, float, float, float], tri_min_xy, tri_max_xy, eps: float = 1e-4) -> bool:
+    r"""Whether any triangle (given by the NumPy arrays of the minimum and
+    maximum xy-coordinates of its bounding box) reaches into the interior of the region.
+    """
+    x0, x1, y0, y1 = region
+    return bool(((tri_min_xy[:, 0] < x1 - eps) & (tri_max_xy[:, 0] > x0 + eps) &
+                 (tri_min_xy[:, 1] < y1 - eps) & (tri_max_xy[:, 1] > y0 + eps)).any())
+
+
+def _shares_edge(a: tuple[float, float, float, float], b: tuple[float, float, float, float]) -> bool:
+    ax0, ax1, ay0, ay1 = a
+    bx0, bx1, by0, by1 = b
+    return ((ay0, ay1) == (by0, by1) and (ax1 == bx0 or bx1 == ax0)) or ((ax0, ax1) == (bx0, bx1) and (ay1 == by0 or by1 == ay0))
+
+
+def merge_incomplete(regions: list[tuple[float, float, float, float]], complete) -> list[tuple[float, float, float, float]] | None:
+    r"""Merge each region for which `complete(region)` is False (for example
+    because one of the LODs has no geometry in it) with a neighbouring region
+    that shares a whole edge, so that the merged region is a rectangle again.
+    Returns None if an incomplete region has no such neighbour.
+    """
+    regions = list(regions)
+    while True:
+        incomplete = next((r for r in regions if not complete(r)), None)
+        if incomplete is None:
+            return regions
+        neighbours = [r for r in regions if r != incomplete and _shares_edge(r, incomplete)]
+        if not neighbours:
+            return None
+        neighbour = neighbours[0]
+        merged = (min(incomplete[0], neighbour[0]), max(incomplete[1], neighbour[1]),
+                  min(incomplete[2], neighbour[2]), max(incomplete[3], neighbour[3]))
+        index = min(regions.index(incomplete), regions.index(neighbour))
+        regions = [r for r in regions if r != incomplete and r != neighbour]
+        regions.insert(index, merged)
+
+
+def submodel_gid(gid: str, index: int) -> str:
+    r"""A Group ID for the sub-model, derived deterministically from the Group ID
+    of the whole model, so that independent jobs agree on it.
+    """
+    digest = hashlib.sha1(f"{gid.lower()}:{index}".encode()).digest()
+    return f"{int.from_bytes(digest[:4], 'big') or 1:08x}"
+
+
+@dataclass
+class Split:
+    r"""The non-empty parts of a model that is split into sub-models."""
+    gid: str  # Group ID of the whole model
+    grid: int
+    regions: list[tuple[float, float, float, float]]
+
+    def count(self) -> int:
+        return len(self.regions)
+
+    def gid_of(self, index: int) -> str:
+        return submodel_gid(self.gid, index)
+
+    def name_suffix(self, index: int) -> str:
+        return f"_part{index+1}"
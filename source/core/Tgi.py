@@ -0,0 +1,25 @@
+tid_fsh = "7ab50e44"
+tid_s3d = "5ad0e817"
+tid_xml = "88777601"
+
+
+def instance_id(z, v, count, is_night=False):
+    # This mapping should allow for more than 16 anim groups (for slicing of large BAT models).
+    # Available bits for sliced tile IDs:
+    # digit 8: 4 bits
+    # digit 7: 2 bits (2 bits rotation)
+    # digit 6: 1 bit (3 bits zoom)
+    # digit 5: (1 bit nightlight) 3 bits
+    assert count >= 0 and count < (1 << (4 + 2 + 1 + 3)), "This building is huge! It's just not going to work!"
+    offset = ((count & 0x0380) << (3 + 2)) | ((count & 0x0040) << (3 + 2)) | ((count & 0x0030) << 2) | (count & 0x000f)
+    iid = 0x30000 + (0x8000 if is_night else 0) + z * 0x100 + v * 0x10 + offset
+    return iid
+
+
+def tgi_formatter(gid: str, z, v, count, is_model=False, prefix=False, is_night=False, is_xml=False, separator="_"):
+    iid = instance_id(z, v, count, is_night=is_night)
+    return separator.join(f"0x{i}" if prefix else i for i in [
+        (tid_s3d if is_model else tid_xml if is_xml else tid_fsh),
+        gid,
+        f"{iid:08x}",
+    ])
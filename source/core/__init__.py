@@ -0,0 +1,8 @@
+r"""Pure computations of BAT4Blender (canvas tiling, TGI numbering, camera
+placement, occlusion, OBJ export, sub-model partitioning, night tile
+comparison and sample budgeting) without any dependency on `bpy`.
+
+The modules of this package only import each other relatively, so the package
+can also be imported standalone as `core` (with the add-on folder on `sys.path`),
+e.g. by post-processing worker processes or in plain CPython.
+"""